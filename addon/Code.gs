@@ -14,6 +14,14 @@ function showSidebar() {
   DocumentApp.getUi().showSidebar(html);
 }
 
+function getDocTitle() {
+  return DocumentApp.getActiveDocument().getName();
+}
+
+function convertDocument() {
+  return sendToBackend(extractDocContent().paragraphs);
+}
+
 function extractDocContent() {
   var doc = DocumentApp.getActiveDocument();
   var body = doc.getBody();
@@ -39,7 +47,7 @@ function extractDocContent() {
 }
 
 function extractParagraph(para) {
-  var text = para.getText().trim();
+  var text = markHighlights(para).trim();
   var images = extractImagesFromParagraph(para);
 
   if (!text && images.length === 0) return null;
@@ -127,6 +135,34 @@ function isEntirelyBold(paragraph) {
   return true;
 }
 
+// Wrap highlighted runs in ==...== so the backend can turn them into cloze deletions.
+// Whitespace at either end of a run stays outside the markers, which must hug the text.
+function markHighlights(paragraph) {
+  var text = paragraph.editAsText();
+  var content = paragraph.getText();
+  if (!content) return content;
+
+  var indices = text.getTextAttributeIndices();
+  var out = '';
+  var run = '';
+  for (var k = 0; k < indices.length; k++) {
+    var start = indices[k];
+    var end = k + 1 < indices.length ? indices[k + 1] : content.length;
+    if (text.getBackgroundColor(start)) {
+      run += content.substring(start, end);
+    } else {
+      out += wrapHighlight(run) + content.substring(start, end);
+      run = '';
+    }
+  }
+  return out + wrapHighlight(run);
+}
+
+function wrapHighlight(run) {
+  var match = run.match(/^(\s*)([\s\S]*?)(\s*)$/);
+  return match[2] ? match[1] + '==' + match[2] + '==' + match[3] : run;
+}
+
 function getTextColor(paragraph) {
   var text = paragraph.editAsText();
   var content = paragraph.getText();
@@ -148,15 +184,64 @@ function escapeHtml(text) {
     .replace(/>/g, '&gt;');
 }
 
+// Compact columnar payload for /api/extract/compact (see backend/wire_format.py):
+// a string table, per-paragraph flag bits, and each distinct image sent once.
+var FLAG_BOLD = 1;
+var FLAG_HEADING = 2;
+var FLAG_TABLE = 4;
+
+function encodeParagraphs(paragraphs) {
+  var strings = [];
+  var stringIndex = {};
+  var blobs = [];
+  var blobIndex = {};
+  var doc = { v: 1, text: [], flags: [], color: [], table: [], image_counts: [], image_refs: [] };
+
+  function intern(value) {
+    if (value == null) return -1;
+    var key = '$' + value;
+    if (!(key in stringIndex)) {
+      stringIndex[key] = strings.length;
+      strings.push(value);
+    }
+    return stringIndex[key];
+  }
+
+  function internImage(b64) {
+    var digest = Utilities.base64Encode(Utilities.computeDigest(Utilities.DigestAlgorithm.SHA_256, b64));
+    if (!(digest in blobIndex)) {
+      blobIndex[digest] = blobs.length;
+      blobs.push(b64);
+    }
+    return blobIndex[digest];
+  }
+
+  for (var i = 0; i < paragraphs.length; i++) {
+    var p = paragraphs[i];
+    doc.text.push(intern(p.text));
+    doc.flags.push((p.is_bold ? FLAG_BOLD : 0) | (p.is_heading ? FLAG_HEADING : 0) | (p.is_table ? FLAG_TABLE : 0));
+    doc.color.push(intern(p.text_color));
+    doc.table.push(intern(p.table_html));
+    doc.image_counts.push(p.images.length);
+    for (var j = 0; j < p.images.length; j++) {
+      doc.image_refs.push(internImage(p.images[j]));
+    }
+  }
+
+  doc.strings = strings;
+  doc.blobs = blobs;
+  return Utilities.gzip(Utilities.newBlob(JSON.stringify(doc), 'application/json'));
+}
+
 function sendToBackend(paragraphs) {
   var options = {
     method: 'post',
-    contentType: 'application/json',
-    payload: JSON.stringify({ paragraphs: paragraphs }),
+    contentType: 'application/gzip',
+    payload: encodeParagraphs(paragraphs).getBytes(),
     muteHttpExceptions: true
   };
 
-  var response = UrlFetchApp.fetch(BACKEND_URL + '/api/extract', options);
+  var response = UrlFetchApp.fetch(BACKEND_URL + '/api/extract/compact', options);
 
   if (response.getResponseCode() !== 200) {
     throw new Error('Backend error: ' + response.getContentText());
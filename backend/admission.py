@@ -0,0 +1,151 @@
+"""Admission control for the heavy endpoints.
+
+``RateLimiter`` keeps a token bucket per client; each request spends tokens
+in proportion to its cost (upload size, paragraphs, images). Admitted
+requests then wait for one of a fixed number of CPU slots in
+``FairScheduler``, which hands freed slots to waiting clients round-robin so
+one client's backlog cannot starve everyone else.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+RATE_LIMIT_CAPACITY = float(os.environ.get("RATE_LIMIT_CAPACITY", "200"))
+RATE_LIMIT_REFILL = float(os.environ.get("RATE_LIMIT_REFILL", "2"))
+# Proxies in front of the app that each append the address they saw to X-Forwarded-For.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", "0"))
+MAX_TRACKED_CLIENTS = 10_000
+
+
+def client_key(headers, client_host: str | None, trusted_hops: int | None = None) -> str:
+    """Identify the caller.
+
+    Only the last ``trusted_hops`` X-Forwarded-For entries were written by our
+    own proxies; anything before them is whatever the client sent, so the
+    caller is the entry the outermost trusted proxy appended. Without trusted
+    proxies the header is ignored and the peer address is used.
+    """
+    if trusted_hops is None:
+        trusted_hops = TRUSTED_PROXY_HOPS
+    if trusted_hops > 0:
+        hops = [h.strip() for h in headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if len(hops) >= trusted_hops:
+            return hops[-trusted_hops]
+    return client_host or "unknown"
+
+
+def request_cost(size_bytes: int = 0, paragraphs: int = 0, images: int = 0) -> float:
+    """Token cost of a request: 1 plus 1 per MB uploaded, per 500 paragraphs/cards and per 10 images."""
+    return 1 + size_bytes / (1024 * 1024) + paragraphs / 500 + images / 10
+
+
+class RateLimiter:
+    """Per-client token buckets, refilled continuously and evicted least-recently-used."""
+
+    def __init__(self, capacity: float = RATE_LIMIT_CAPACITY, refill_per_second: float = RATE_LIMIT_REFILL) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, client: str, cost: float) -> float:
+        """Spend ``cost`` tokens; returns 0 if admitted, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+            cost = min(cost, self.capacity)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0.0
+            else:
+                retry_after = (cost - tokens) / self.refill_per_second
+                self.rejected += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class FairScheduler:
+    """A fixed number of slots for CPU-bound work, granted round-robin across clients."""
+
+    def __init__(self, slots: int) -> None:
+        self.slots = slots
+        self._free = slots
+        self._waiting: "OrderedDict[str, deque[asyncio.Future]]" = OrderedDict()
+        self.admitted = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    async def _acquire(self, client: str) -> None:
+        if self._free > 0 and not self._waiting:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                self._discard(client, future)
+            raise
+
+    def _discard(self, client: str, future: asyncio.Future) -> None:
+        queue = self._waiting.get(client)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[client]
+
+    def _release(self) -> None:
+        """Hand the slot to the next client in turn, or return it to the pool."""
+        while self._waiting:
+            client, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            del self._waiting[client]
+            if queue:
+                self._waiting[client] = queue
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        """Hold one slot for the duration of the block."""
+        start = time.monotonic()
+        await self._acquire(client)
+        wait = time.monotonic() - start
+        self.admitted += 1
+        if wait > 0.001:
+            self.waited += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def metrics(self) -> dict:
+        return {
+            "slots": self.slots,
+            "slots_free": self._free,
+            "queued": self.queued(),
+            "clients_waiting": len(self._waiting),
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "mean_wait_ms": round(1000 * self.total_wait / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 2),
+        }
@@ -3,10 +3,13 @@ import hashlib
 import os
 import re
 import tempfile
+from typing import Mapping, Optional
 
 import genanki
 
 from models import ExtractedCard
+from note_types import BASIC, BASIC_MODEL_ID, get_model, resolve_note_type
+from stable_ids import NoteIndex, assign_guids, note_checksum, stable_id
 
 CARD_CSS = """
 .card {
@@ -47,25 +50,12 @@ li {
 }
 """
 
-MODEL = genanki.Model(
-    1607392319,
-    "Docs to Anki - Basic",
-    fields=[{"name": "Front"}, {"name": "Back"}],
-    templates=[
-        {
-            "name": "Card 1",
-            "qfmt": "{{Front}}",
-            "afmt": '{{FrontSide}}<hr id="answer">{{Back}}',
-        }
-    ],
-    css=CARD_CSS,
-)
+MODEL = get_model(BASIC, CARD_CSS)
 
 
 def _stable_note_id(text: str) -> int:
-    """Generate a deterministic note ID from question text."""
-    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
-    return int(digest[:8], 16)
+    """Generate a deterministic 63-bit ID from text (used for deck IDs)."""
+    return stable_id(text)
 
 
 _UL_RE = re.compile(r"^[-•·–—]\s+(.*)")
@@ -131,43 +121,111 @@ def _tag_to_subdeck(tag: str) -> str:
     return "::".join(part.replace("-", " ") for part in tag.split("::"))
 
 
-def build_deck(cards: list[ExtractedCard], deck_name: str = "My Deck") -> bytes:
-    """Build an .apkg file from a list of extracted cards, using tags as subdecks."""
+def _media_filename(img_b64: str) -> str:
+    """Name a media file after its content so unchanged images keep their name across builds."""
+    return f"img_{hashlib.md5(img_b64.encode()).hexdigest()[:16]}.png"
+
+
+def _card_deck_name(card: ExtractedCard, deck_name: str) -> str:
+    """Return the full (sub)deck name a card belongs in, based on its first tag."""
+    if card.tags:
+        return f"{deck_name}::{_tag_to_subdeck(card.tags[0])}"
+    return deck_name
+
+
+def _render_fields(card: ExtractedCard) -> tuple[list[str], list[tuple[str, str]]]:
+    """Render a card's note fields to HTML and list the (filename, base64) media it references."""
+    back_html = _text_to_html(card.back)
+    media = []
+    for img_b64 in card.images:
+        filename = _media_filename(img_b64)
+        media.append((filename, img_b64))
+        back_html += f'<br><img src="{filename}">'
+    return [_text_to_html(card.front), back_html], media
+
+
+def _write_media(directory: str, filename: str, img_b64: str) -> str:
+    """Decode a base64 image into ``directory`` unless it is already there; return its path."""
+    filepath = os.path.join(directory, filename)
+    if not os.path.exists(filepath):
+        with open(filepath, "wb") as f:
+            f.write(base64.b64decode(img_b64))
+    return filepath
+
+
+def _make_note(card: ExtractedCard, fields: list[str], guid: str, model: genanki.Model = MODEL) -> genanki.Note:
+    """Create the genanki note for a card from its rendered fields."""
+    return genanki.Note(
+        model=model,
+        fields=fields,
+        tags=card.tags,
+        guid=guid,
+    )
+
+
+def _card_model(card: ExtractedCard, note_type: str) -> genanki.Model:
+    """Return the model for a card, given the deck's default note type."""
+    if card.note_type is None and note_type == BASIC:
+        return MODEL
+    return get_model(resolve_note_type(card.note_type, note_type, card.front), CARD_CSS)
+
+
+def index_cards(cards: list[ExtractedCard], deck_name: str = "My Deck", note_type: str = BASIC) -> NoteIndex:
+    """Render every card and index it by GUID.
+
+    Each payload is ``(card, full_deck_name, fields, media, model)`` so builds
+    can reuse the rendering for the notes a diff says they need to write.
+    ``note_type`` is the default for cards that do not set their own.
+    """
+    index = NoteIndex()
+    for card, guid in zip(cards, assign_guids(cards)):
+        full_name = _card_deck_name(card, deck_name)
+        fields, media = _render_fields(card)
+        model = _card_model(card, note_type)
+        model_id = None if model.model_id == BASIC_MODEL_ID else model.model_id
+        index.add(
+            guid, note_checksum(fields, card.tags, model_id), (card, full_name, fields, media, model), card.front
+        )
+    return index
+
+
+def build_deck(
+    cards: list[ExtractedCard],
+    deck_name: str = "My Deck",
+    manifest: Optional[Mapping[str, str]] = None,
+    note_type: str = BASIC,
+) -> bytes:
+    """Build an .apkg file from a list of extracted cards, using tags as subdecks.
+
+    With a ``manifest`` (GUID → checksum of a previous export) only new and
+    changed notes are packaged, producing a delta deck for re-import.
+    ``note_type`` is the default note type for cards that do not set one.
+    """
     decks: dict[str, genanki.Deck] = {}
-    media_files = []
+    media_files: dict[str, str] = {}
     tmpdir = tempfile.mkdtemp()
 
-    for card in cards:
-        if card.tags:
-            subdeck_suffix = _tag_to_subdeck(card.tags[0])
-            full_name = f"{deck_name}::{subdeck_suffix}"
-        else:
-            full_name = deck_name
+    index = index_cards(cards, deck_name, note_type)
+    guids = list(index.payloads)
+    if manifest is not None:
+        diff = index.diff(manifest)
+        wanted = set(diff.added) | set(diff.changed)
+        guids = [guid for guid in guids if guid in wanted]
 
+    for guid in guids:
+        card, full_name, fields, media, model = index.payloads[guid]
         if full_name not in decks:
             decks[full_name] = genanki.Deck(_stable_note_id(full_name), full_name)
 
-        back_html = _text_to_html(card.back)
-
-        for i, img_b64 in enumerate(card.images):
-            filename = f"img_{hashlib.md5(img_b64[:100].encode()).hexdigest()[:12]}_{i}.png"
-            filepath = os.path.join(tmpdir, filename)
-            with open(filepath, "wb") as f:
-                f.write(base64.b64decode(img_b64))
-            media_files.append(filepath)
-            back_html += f'<br><img src="{filename}">'
-
-        note = genanki.Note(
-            model=MODEL,
-            fields=[_text_to_html(card.front), back_html],
-            tags=card.tags,
-            guid=genanki.guid_for(card.front),
-        )
-        decks[full_name].add_note(note)
+        for filename, img_b64 in media:
+            if filename not in media_files:
+                media_files[filename] = _write_media(tmpdir, filename, img_b64)
+
+        decks[full_name].add_note(_make_note(card, fields, guid, model))
 
     package = genanki.Package(list(decks.values()))
     if media_files:
-        package.media_files = media_files
+        package.media_files = list(media_files.values())
 
     with tempfile.NamedTemporaryFile(suffix=".apkg", delete=False) as tmp:
         package.write_to_file(tmp.name)
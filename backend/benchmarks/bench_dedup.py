@@ -0,0 +1,49 @@
+"""Benchmark near-duplicate detection on large synthetic decks.
+
+Run from backend/:  python benchmarks/bench_dedup.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dedup import DEDUP_THRESHOLD, _jaccard, _shingles, find_near_duplicates
+from fixtures import near_duplicate_questions
+
+
+def _recall(groups: list[list[int]], planted: set[tuple[int, int]]) -> float:
+    group_of = {i: g[0] for g in groups for i in g}
+    found = sum(1 for a, b in planted if a in group_of and group_of.get(a) == group_of.get(b))
+    return found / len(planted) if planted else 1.0
+
+
+def _all_pairs(questions: list[str], threshold: float) -> int:
+    """Quadratic baseline: count similar pairs by comparing every pair."""
+    shingles = [_shingles(q) for q in questions]
+    return sum(
+        1
+        for i in range(len(shingles))
+        for j in range(i + 1, len(shingles))
+        if _jaccard(shingles[i], shingles[j]) >= threshold
+    )
+
+
+def main() -> None:
+    print(f"threshold {DEDUP_THRESHOLD}")
+    for n in (1000, 10000, 50000):
+        questions, planted = near_duplicate_questions(n)
+        start = time.perf_counter()
+        groups = find_near_duplicates(questions)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"  {n:6d} cards  {ms:9.1f} ms  {len(groups):5d} groups  recall {_recall(groups, planted):.3f}")
+
+    questions, _ = near_duplicate_questions(2000)
+    start = time.perf_counter()
+    _all_pairs(questions, DEDUP_THRESHOLD)
+    print(f"  all-pairs baseline, 2000 cards: {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
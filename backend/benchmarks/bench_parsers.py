@@ -0,0 +1,46 @@
+"""Benchmark the PDF, .docx, Markdown and HTML parsers on the same synthetic notes.
+
+Run from backend/:  python benchmarks/bench_parsers.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from docx_parser import parse_docx
+from fixtures import notes_docx, notes_html, notes_markdown, notes_pdf
+from markup_parser import parse_html, parse_markdown
+from pdf_parser import parse_pdf
+from qa_parser import extract_cards
+
+
+def _time(fn, repeat: int = 3) -> tuple[float, int]:
+    """Return (best wall time in ms, cards extracted) over ``repeat`` runs."""
+    best = float("inf")
+    cards = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cards = len(extract_cards(fn()))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, cards
+
+
+def main() -> None:
+    for cards in (400, 4000):
+        pages = cards // 8
+        inputs = {
+            "pdf": (notes_pdf(pages=pages), parse_pdf),
+            "docx": (notes_docx(cards), parse_docx),
+            "markdown": (notes_markdown(cards), parse_markdown),
+            "html": (notes_html(cards), parse_html),
+        }
+        print(f"{cards} cards")
+        for name, (data, parser) in inputs.items():
+            ms, extracted = _time(lambda: parser(data))
+            print(f"  {name:9s} {len(data) // 1024:6d} KB  {ms:9.1f} ms  ({extracted} cards)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark column detection/reading order and its share of parse_pdf time.
+
+Run from backend/:  python benchmarks/bench_reading_order.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fixtures import PAGE_WIDTH, column_boxes, notes_pdf
+from layout import reading_order
+from pdf_parser import parse_pdf
+
+
+def _time(fn, repeat: int) -> float:
+    """Return the best wall time in milliseconds over ``repeat`` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    print("reading_order on synthetic pages")
+    for columns in (1, 2, 3):
+        for n in (50, 500, 5000):
+            boxes = column_boxes(n, columns)
+            ms = _time(lambda: reading_order(boxes, PAGE_WIDTH), repeat=20)
+            print(f"  columns={columns} boxes={n:5d}  {ms:8.3f} ms")
+
+    print("parse_pdf on 50-page notes")
+    for columns in (1, 2):
+        pdf_bytes = notes_pdf(pages=50, columns=columns)
+        ms = _time(lambda: parse_pdf(pdf_bytes), repeat=3)
+        print(f"  columns={columns}  {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Synthetic inputs shared by the benchmark scripts."""
+
+import base64
+import io
+import random
+import zipfile
+
+import fitz
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+
+def column_boxes(n: int, columns: int, seed: int = 0) -> list[tuple[float, float, float, float]]:
+    """Line boxes for a page with ``columns`` columns, interleaved by y like a content stream."""
+    rng = random.Random(seed)
+    gutter = 24
+    width = (PAGE_WIDTH - 144 - gutter * (columns - 1)) / columns
+    boxes = []
+    for i in range(n):
+        col = i % columns
+        row = i // columns
+        x0 = 72 + col * (width + gutter) + rng.uniform(0, 12)
+        y0 = 72 + row * 14
+        boxes.append((x0, y0, x0 + rng.uniform(width * 0.4, width - 12), y0 + 12))
+    return boxes
+
+
+def notes_pdf(pages: int, columns: int = 1, cards_per_column: int = 8) -> bytes:
+    """A PDF of bold-question/plain-answer notes laid out in ``columns`` columns."""
+    doc = fitz.open()
+    width = (PAGE_WIDTH - 144) / columns
+    for p in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        for row in range(cards_per_column):
+            y = 72 + row * 40
+            for col in range(columns):
+                x = 72 + col * width
+                n = (p * cards_per_column + row) * columns + col
+                page.insert_text(fitz.Point(x, y), f"Question {n}?", fontname="hebo", fontsize=11)
+                page.insert_text(fitz.Point(x, y + 14), f"- answer to {n}", fontname="helv", fontsize=11)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def notes_markdown(cards: int) -> str:
+    """Markdown notes with a heading every 20 cards."""
+    lines = []
+    for n in range(cards):
+        if n % 20 == 0:
+            lines.append(f"# Topic {n // 20}")
+        lines += [f"**Question {n}?**", f"- answer to {n}", f"- more detail about {n}"]
+    return "\n".join(lines)
+
+
+def notes_html(cards: int) -> str:
+    """HTML notes with a heading every 20 cards."""
+    parts = ["<html><body>"]
+    for n in range(cards):
+        if n % 20 == 0:
+            parts.append(f"<h1>Topic {n // 20}</h1>")
+        parts.append(f"<p><b>Question {n}?</b></p><ul><li>answer to {n}</li><li>more detail about {n}</li></ul>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def notes_docx(cards: int) -> bytes:
+    """A minimal .docx with a Heading 1 every 20 cards."""
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+    def para(text, bold=False, style=None):
+        ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        rpr = "<w:rPr><w:b/></w:rPr>" if bold else ""
+        return f"<w:p>{ppr}<w:r>{rpr}<w:t>{text}</w:t></w:r></w:p>"
+
+    body = []
+    for n in range(cards):
+        if n % 20 == 0:
+            body.append(para(f"Topic {n // 20}", style="Heading1"))
+        body += [para(f"Question {n}?", bold=True), para(f"- answer to {n}"), para(f"- more detail about {n}")]
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{ns}"><w:body>{"".join(body)}</w:body></w:document>')
+        z.writestr("word/styles.xml", (
+            f'<w:styles xmlns:w="{ns}"><w:style w:type="paragraph" w:styleId="Heading1">'
+            '<w:name w:val="heading 1"/></w:style></w:styles>'
+        ))
+    return buf.getvalue()
+
+
+def _vocabulary(size: int, seed: int) -> list[str]:
+    """Pseudo-words built from syllables, so questions share about as much text as real notes."""
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    return ["".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+def near_duplicate_questions(n: int, duplicate_fraction: float = 0.1, seed: int = 0) -> tuple[list[str], set[tuple[int, int]]]:
+    """``n`` synthetic questions, some of which are reworded copies of earlier ones.
+
+    Returns the questions and the planted (original, copy) index pairs.
+    """
+    rng = random.Random(seed)
+    words_pool = _vocabulary(5000, seed)
+    questions: list[str] = []
+    planted: set[tuple[int, int]] = set()
+    for i in range(n):
+        if questions and rng.random() < duplicate_fraction:
+            original = rng.randrange(len(questions))
+            words = questions[original].rstrip("?").split()
+            # One small edit: drop, swap or insert a word.
+            edit = rng.randrange(3)
+            pos = rng.randrange(len(words))
+            if edit == 0 and len(words) > 4:
+                del words[pos]
+            elif edit == 1:
+                words[pos] = rng.choice(words_pool)
+            else:
+                words.insert(pos, "the")
+            questions.append(" ".join(words) + "?")
+            planted.add((original, i))
+        else:
+            questions.append("What is the " + " ".join(rng.choices(words_pool, k=rng.randint(4, 8))) + "?")
+    return questions, planted
+
+
+def _png_b64(seed: int) -> str:
+    """A small solid-colour PNG, base64-encoded."""
+    rng = random.Random(seed)
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+    pix.set_rect(pix.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return base64.b64encode(pix.tobytes("png")).decode("ascii")
+
+
+def notes_paragraphs(cards: int, image_every: int = 0) -> list[dict]:
+    """An /api/extract payload's paragraphs, as the Docs add-on sends them, with a heading every 20 cards."""
+    paragraphs = []
+    for n in range(cards):
+        if n % 20 == 0:
+            paragraphs.append({"text": f"Topic {n // 20}", "is_heading": True, "heading_level": 1})
+        paragraphs.append({"text": f"Question {n}?", "is_bold": True})
+        answer = {"text": f"- answer to {n}"}
+        if image_every and n % image_every == 0:
+            answer["images"] = [_png_b64(n)]
+        paragraphs += [answer, {"text": f"- more detail about {n}"}]
+    return paragraphs
+
+
+def notes_cards(cards: int, image_every: int = 0) -> list[dict]:
+    """Approved cards for an /api/generate payload."""
+    return [
+        {
+            "front": f"Question {n}?",
+            "back": f"answer to {n}<br>more detail about {n}",
+            "tags": [f"Topic-{n // 20}"],
+            "images": [_png_b64(n)] if image_every and n % image_every == 0 else [],
+        }
+        for n in range(cards)
+    ]
@@ -0,0 +1,312 @@
+"""Load-test the API as deployed: uvicorn in a subprocess, replaying a mix of synthetic requests.
+
+Starts the app the way the Dockerfile does, then sends PDF uploads, extract
+calls and generate calls from ``--concurrency`` concurrent clients and
+reports throughput, p50/p95/p99 latency per endpoint and the server's peak
+memory (summed over its processes). Run several concurrency levels in one
+go to see where p99 turns up:
+
+Run from backend/:  python benchmarks/load_test.py --concurrency 1,4,16 --requests 200
+
+Needs httpx (a dev dependency). Rate limiting is relaxed on the test server
+so the numbers measure capacity rather than the limiter; ``--keep-rate-limit``
+leaves it on. The shared result cache is off too, since the small synthetic
+corpus would otherwise be served almost entirely from it; ``--result-cache``
+measures the cached path instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fixtures import notes_cards, notes_paragraphs, notes_pdf
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+DEFAULT_MIX = "pdf=2,extract=5,generate=3"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class MemorySampler(threading.Thread):
+    """Polls /proc for the resident memory of a process and its descendants, keeping the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.1) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_bytes = 0
+        self._done = threading.Event()
+
+    @staticmethod
+    def supported() -> bool:
+        return os.path.exists("/proc/self/status")
+
+    def _tree(self) -> list[int]:
+        children: dict[int, list[int]] = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(name))
+        pids, frontier = [], [self.pid]
+        while frontier:
+            pid = frontier.pop()
+            pids.append(pid)
+            frontier += children.get(pid, [])
+        return pids
+
+    @staticmethod
+    def _rss(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def sample(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, sum(self._rss(pid) for pid in self._tree()))
+
+    def reset(self) -> None:
+        self.peak_bytes = 0
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> None:
+        self._done.set()
+
+
+def start_server(
+    port: int, workers: int | None, keep_rate_limit: bool, state_dir: str, result_cache: bool
+) -> subprocess.Popen:
+    """Start the server as the Dockerfile does (server.py), on a local port, and wait until it answers."""
+    env = dict(
+        os.environ,
+        HOST="127.0.0.1",
+        LOG_LEVEL="warning",
+        PORT=str(port),
+        DECK_STORE_PATH=os.path.join(state_dir, "decks.sqlite3"),
+        BUILD_CACHE_DIR=os.path.join(state_dir, "builds"),
+        RESULT_CACHE_PATH=os.path.join(state_dir, "results.sqlite3"),
+        RESULT_CACHE_ENABLED="1" if result_cache else "0",
+    )
+    env.pop("PROFILE_TOKEN", None)
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    if not keep_rate_limit:
+        env.update(RATE_LIMIT_CAPACITY="1e12", RATE_LIMIT_REFILL="1e12")
+    server = subprocess.Popen(
+        [sys.executable, "server.py"], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 30 s")
+
+
+def build_corpus(args: argparse.Namespace) -> dict[str, list]:
+    """Synthetic request bodies of a few sizes for each endpoint."""
+    return {
+        "pdf": [notes_pdf(pages) for pages in args.pdf_pages],
+        "extract": [{"paragraphs": notes_paragraphs(n, image_every=25)} for n in args.cards],
+        "generate": [{"cards": notes_cards(n, image_every=25), "deck_name": "Load test"} for n in args.cards],
+    }
+
+
+async def _send(client: httpx.AsyncClient, kind: str, body) -> httpx.Response:
+    if kind == "pdf":
+        return await client.post("/api/pdf-upload", files={"file": ("notes.pdf", body, "application/pdf")})
+    if kind == "extract":
+        return await client.post("/api/extract", json=body)
+    return await client.post("/api/generate", json=body)
+
+
+async def run_level(
+    base_url: str, corpus: dict[str, list], mix: dict[str, int], concurrency: int, total: int, seed: int
+) -> tuple[float, dict[str, dict]]:
+    """Send ``total`` requests drawn from ``mix`` with ``concurrency`` clients; returns (seconds, stats)."""
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+    schedule = [(kind, rng.choice(corpus[kind])) for kind in (rng.choice(kinds) for _ in range(total))]
+    queue = iter(schedule)
+    results: dict[str, dict] = {kind: {"latencies": [], "errors": 0, "throttled": 0} for kind in mix}
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for kind, body in queue:
+            start = time.perf_counter()
+            try:
+                response = await _send(client, kind, body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            elapsed = time.perf_counter() - start
+            if status == 429:
+                results[kind]["throttled"] += 1
+            elif status is None or status >= 400:
+                results[kind]["errors"] += 1
+            else:
+                results[kind]["latencies"].append(elapsed)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, results
+
+
+def summarize(elapsed: float, results: dict[str, dict]) -> dict[str, dict]:
+    summary = {}
+    everything = [t for r in results.values() for t in r["latencies"]]
+    for kind, r in list(results.items()) + [("all", {
+        "latencies": everything,
+        "errors": sum(r["errors"] for r in results.values()),
+        "throttled": sum(r["throttled"] for r in results.values()),
+    })]:
+        latencies = r["latencies"]
+        summary[kind] = {
+            "ok": len(latencies),
+            "errors": r["errors"],
+            "throttled": r["throttled"],
+            "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
+    return summary
+
+
+def _parse_mix(spec: str) -> dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in ("pdf", "extract", "generate"):
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}")
+        if int(weight or 1) > 0:
+            mix[kind.strip()] = int(weight or 1)
+    if not mix:
+        raise argparse.ArgumentTypeError("the mix needs at least one request kind")
+    return mix
+
+
+def _int_list(spec: str) -> list[int]:
+    return [int(x) for x in spec.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16],
+                        help="comma-separated concurrency levels (default 1,4,16)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                        help=f"relative weights of request kinds (default {DEFAULT_MIX})")
+    parser.add_argument("--workers", type=int, help="uvicorn worker processes (default: one per CPU)")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="leave the shared result cache on (repeated synthetic inputs would mostly hit it)")
+    parser.add_argument("--pdf-pages", type=_int_list, default=[2, 10, 40], help="sizes of synthetic PDFs")
+    parser.add_argument("--cards", type=_int_list, default=[50, 300, 1000],
+                        help="sizes of synthetic extract/generate payloads")
+    parser.add_argument("--url", help="test an already running server instead of starting one "
+                                      "(memory is not measured)")
+    parser.add_argument("--keep-rate-limit", action="store_true", help="leave the server's rate limiter on")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("building synthetic corpus...")
+    corpus = build_corpus(args)
+
+    server = sampler = None
+    state_dir = tempfile.TemporaryDirectory()
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        port = _free_port()
+        server = start_server(port, args.workers, args.keep_rate_limit, state_dir.name, args.result_cache)
+        base_url = f"http://127.0.0.1:{port}"
+        if MemorySampler.supported():
+            sampler = MemorySampler(server.pid)
+            sampler.start()
+
+    report = {"workers": args.workers, "mix": args.mix, "levels": []}
+    try:
+        if sampler is not None:
+            sampler.sample()
+            report["idle_rss_mb"] = round(sampler.peak_bytes / 2**20, 1)
+        for concurrency in args.concurrency:
+            if sampler is not None:
+                sampler.reset()
+            elapsed, results = asyncio.run(
+                run_level(base_url, corpus, args.mix, concurrency, args.requests, args.seed)
+            )
+            level = {"concurrency": concurrency, "seconds": round(elapsed, 2), "endpoints": summarize(elapsed, results)}
+            if sampler is not None:
+                sampler.sample()
+                level["peak_rss_mb"] = round(sampler.peak_bytes / 2**20, 1)
+            report["levels"].append(level)
+            _print_level(level)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        state_dir.cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def _print_level(level: dict) -> None:
+    peak = f"  peak RSS {level['peak_rss_mb']:.1f} MB" if "peak_rss_mb" in level else ""
+    print(f"\nconcurrency {level['concurrency']}  ({level['seconds']:.1f} s){peak}")
+    print(f"  {'endpoint':9s} {'ok':>6s} {'err':>5s} {'429':>5s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for kind, s in level["endpoints"].items():
+        print(f"  {kind:9s} {s['ok']:6d} {s['errors']:5d} {s['throttled']:5d} {s['rps']:8.2f} "
+              f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
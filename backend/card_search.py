@@ -0,0 +1,130 @@
+"""Server-side search over extracted cards, so previews can fetch one page at a time.
+
+Each extraction result gets an in-memory inverted index (word → card
+positions) kept in an LRU bounded by the amount of card text. Queries match
+every word by prefix, and can be narrowed to a tag path (including its
+subtags) or to cards with an empty answer. Only the cards' text is kept:
+images are dropped, and just counted. The text is also written to the
+shared result cache, so another worker process can rebuild the index when
+a later page request reaches it.
+"""
+
+import os
+import re
+import threading
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Optional
+
+import result_cache
+from models import ExtractedCard
+from qa_parser import tag_matches
+
+MAX_INDEXED_CHARS = int(os.environ.get("MAX_INDEXED_CHARS", str(32 * 1024 * 1024)))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class ResultNotFoundError(LookupError):
+    """Raised when an extraction result has expired or never existed."""
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+class CardIndex:
+    """Inverted index over one extraction result's cards, without their images.
+
+    ``image_counts`` is how many images each card had; it is counted from
+    ``cards`` when not given.
+    """
+
+    def __init__(self, cards: list[ExtractedCard], image_counts: Optional[list[int]] = None) -> None:
+        if image_counts is None:
+            image_counts = [len(card.images) for card in cards]
+            cards = [card.model_copy(update={"images": []}) if card.images else card for card in cards]
+        self.cards = cards
+        self.image_counts = image_counts
+        self.chars = sum(len(c.front) + len(c.back) + sum(len(t) for t in c.tags) for c in cards)
+        postings: dict[str, set[int]] = {}
+        for position, card in enumerate(cards):
+            for word in set(_words(card.front) + _words(card.back)):
+                postings.setdefault(word, set()).add(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def _matching(self, prefix: str) -> set[int]:
+        """Positions of cards containing a word that starts with ``prefix``."""
+        matches: set[int] = set()
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            matches |= self._postings[self._vocabulary[i]]
+            i += 1
+        return matches
+
+    def search(
+        self, query: str = "", tag: Optional[str] = None, empty_answer: Optional[bool] = None
+    ) -> list[int]:
+        """Return the positions of matching cards, in document order."""
+        positions: Optional[set[int]] = None
+        for word in sorted(set(_words(query)), key=len, reverse=True):
+            matches = self._matching(word)
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return []
+        candidates = sorted(positions) if positions is not None else range(len(self.cards))
+
+        result = []
+        for position in candidates:
+            card = self.cards[position]
+            if tag and not any(tag_matches(t, tag) for t in card.tags):
+                continue
+            empty = not card.back.strip() and not self.image_counts[position]
+            if empty_answer is not None and empty != empty_answer:
+                continue
+            result.append(position)
+        return result
+
+
+_results: "OrderedDict[str, CardIndex]" = OrderedDict()
+_results_chars = 0
+_results_lock = threading.Lock()
+
+
+def index_result(cards: list[ExtractedCard]) -> str:
+    """Index an extraction result and return its ID."""
+    result_id = uuid.uuid4().hex
+    index = CardIndex(cards)
+    _remember(result_id, index)
+    result_cache.put_cards(result_id, index.cards, index.image_counts)
+    return result_id
+
+
+def _remember(result_id: str, index: CardIndex) -> None:
+    """Keep ``index``, evicting the least recently used ones past ``MAX_INDEXED_CHARS`` (never the newest)."""
+    global _results_chars
+    with _results_lock:
+        previous = _results.pop(result_id, None)
+        if previous is not None:
+            _results_chars -= previous.chars
+        _results[result_id] = index
+        _results_chars += index.chars
+        while _results_chars > MAX_INDEXED_CHARS and len(_results) > 1:
+            _, evicted = _results.popitem(last=False)
+            _results_chars -= evicted.chars
+
+
+def get_result(result_id: str) -> CardIndex:
+    with _results_lock:
+        index = _results.get(result_id)
+        if index is not None:
+            _results.move_to_end(result_id)
+            return index
+    stored = result_cache.get_cards(result_id)
+    if stored is None:
+        raise ResultNotFoundError(f"Extraction result {result_id} not found")
+    index = CardIndex(*stored)
+    _remember(result_id, index)
+    return index
@@ -0,0 +1,272 @@
+"""Incremental .apkg builds that patch the previous build of the same deck.
+
+Each deck name and build key (the extraction result or stored deck the cards
+came from) keeps a server-side build artifact: the collection SQLite
+database, its decoded media files, and a checksum per note. A rebuild only
+deletes, rewrites or adds the notes whose content changed and only decodes
+images that are not already on disk.
+
+Artifacts live in a directory per process under ``BUILD_CACHE_DIR``, removed
+when the process exits. Each process holds a lock on its directory, and
+directories whose lock is free, left by a process that was killed, are
+swept when the next process starts building.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import genanki
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+from anki_builder import MODEL, _make_note, _stable_note_id, _write_media, index_cards
+from models import ExtractedCard
+from note_types import BASIC
+from stable_ids import NoteIndex
+
+BUILD_CACHE_DIR = os.environ.get(
+    "BUILD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "anki-scribe-builds")
+)
+MAX_CACHED_DECKS = 32
+# A directory without a lock file is still being created, or predates them.
+_UNLOCKED_DIR_GRACE = 3600
+
+
+@dataclass
+class _DeckArtifact:
+    """The on-disk state of the last build of one deck."""
+    directory: str
+    card_set_hash: str = ""
+    checksums: dict[str, str] = field(default_factory=dict)
+    media: dict[str, list[str]] = field(default_factory=dict)
+    deck_ids: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Set, under ``lock``, once the directory is deleted; a build that gets the lock later starts over.
+    removed: bool = False
+
+    @property
+    def db_path(self) -> str:
+        return os.path.join(self.directory, "collection.anki2")
+
+    @property
+    def media_dir(self) -> str:
+        return os.path.join(self.directory, "media")
+
+    @property
+    def apkg_path(self) -> str:
+        return os.path.join(self.directory, "deck.apkg")
+
+
+_artifacts: "OrderedDict[tuple[str, str], _DeckArtifact]" = OrderedDict()
+_artifacts_lock = threading.Lock()
+
+_process_dir: tuple[int, str] | None = None
+_process_dir_lock = None
+
+
+def _sweep_stale_dirs() -> None:
+    """Delete build directories whose owning process has exited (their lock is free)."""
+    for entry in os.scandir(BUILD_CACHE_DIR):
+        if not entry.is_dir():
+            continue
+        try:
+            fd = os.open(os.path.join(entry.path, ".lock"), os.O_RDWR)
+        except FileNotFoundError:
+            try:
+                if time.time() - entry.stat().st_mtime > _UNLOCKED_DIR_GRACE:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+            continue
+        except OSError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            continue  # its process is alive
+        else:
+            shutil.rmtree(entry.path, ignore_errors=True)
+        finally:
+            os.close(fd)
+
+
+def _build_dir() -> str:
+    """This process's build directory, created (after a sweep of stale ones) on first use."""
+    global _process_dir, _process_dir_lock
+    if _process_dir is None or _process_dir[0] != os.getpid():
+        os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+        _sweep_stale_dirs()
+        directory = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=BUILD_CACHE_DIR)
+        lock_file = open(os.path.join(directory, ".lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        atexit.register(shutil.rmtree, directory, True)
+        _process_dir, _process_dir_lock = (os.getpid(), directory), lock_file
+    return _process_dir[1]
+
+
+def _remove(artifact: _DeckArtifact) -> None:
+    """Delete an evicted artifact's directory once no build is using it."""
+    with artifact.lock:
+        artifact.removed = True
+        shutil.rmtree(artifact.directory, ignore_errors=True)
+
+
+def _get_artifact(deck_name: str, build_key: str = "") -> _DeckArtifact:
+    """Return the artifact for a deck, creating it and evicting the oldest if needed."""
+    name = (build_key, deck_name)
+    evicted = []
+    with _artifacts_lock:
+        artifact = _artifacts.get(name)
+        if artifact is not None:
+            _artifacts.move_to_end(name)
+            return artifact
+
+        key = hashlib.sha1(f"{build_key}\0{deck_name}".encode("utf-8")).hexdigest()[:16]
+        directory = os.path.join(_build_dir(), key)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(os.path.join(directory, "media"))
+        artifact = _DeckArtifact(directory=directory)
+
+        conn = sqlite3.connect(artifact.db_path)
+        conn.executescript(APKG_SCHEMA)
+        conn.executescript(APKG_COL)
+        conn.commit()
+        conn.close()
+
+        _artifacts[name] = artifact
+        while len(_artifacts) > MAX_CACHED_DECKS:
+            evicted.append(_artifacts.popitem(last=False)[1])
+    # Outside the registry lock: waiting for a running build must not block other decks.
+    for old in evicted:
+        _remove(old)
+    return artifact
+
+
+def _sync_decks(cursor: sqlite3.Cursor, artifact: _DeckArtifact, wanted: set[str],
+                timestamp: float, id_gen) -> None:
+    """Add newly used subdecks to the collection and drop ones with no notes left."""
+    for full_name in sorted(wanted - artifact.deck_ids.keys()):
+        deck = genanki.Deck(_stable_note_id(full_name), full_name)
+        deck.add_model(MODEL)
+        deck.write_to_db(cursor, timestamp, id_gen)
+        artifact.deck_ids[full_name] = deck.deck_id
+
+    stale = artifact.deck_ids.keys() - wanted
+    if stale:
+        decks_json, = cursor.execute("SELECT decks FROM col").fetchone()
+        decks = json.loads(decks_json)
+        for full_name in stale:
+            decks.pop(str(artifact.deck_ids.pop(full_name)), None)
+        cursor.execute("UPDATE col SET decks = ?", (json.dumps(decks),))
+
+
+def _sync_models(cursor: sqlite3.Cursor, models: list[genanki.Model], timestamp: float,
+                 deck_id: int | None) -> None:
+    """Add note types that notes are about to use to the collection if it lacks them."""
+    models_json, = cursor.execute("SELECT models FROM col").fetchone()
+    existing = json.loads(models_json)
+    missing = [model for model in models if str(model.model_id) not in existing]
+    if missing:
+        existing.update({str(model.model_id): model.to_json(timestamp, deck_id) for model in missing})
+        cursor.execute("UPDATE col SET models = ?", (json.dumps(existing),))
+
+
+def _discard(name: tuple[str, str], artifact: _DeckArtifact) -> None:
+    """Forget a deck artifact whose on-disk state can no longer be trusted; the caller holds its lock."""
+    with _artifacts_lock:
+        if _artifacts.get(name) is artifact:
+            del _artifacts[name]
+    artifact.removed = True
+    shutil.rmtree(artifact.directory, ignore_errors=True)
+
+
+def _apply_changes(cursor: sqlite3.Cursor, artifact: _DeckArtifact, index: NoteIndex) -> None:
+    """Delete stale notes and write fresh ones into the artifact's collection."""
+    diff = index.diff(artifact.checksums)
+    timestamp = time.time()
+    max_id, = cursor.execute(
+        "SELECT max(m) FROM (SELECT max(id) AS m FROM notes UNION ALL SELECT max(id) FROM cards)"
+    ).fetchone()
+    id_gen = itertools.count(max(int(timestamp * 1000), (max_id or 0) + 1))
+
+    for guid in diff.removed + diff.changed:
+        cursor.execute("DELETE FROM cards WHERE nid IN (SELECT id FROM notes WHERE guid = ?)", (guid,))
+        cursor.execute("DELETE FROM notes WHERE guid = ?", (guid,))
+        del artifact.checksums[guid]
+        del artifact.media[guid]
+
+    _sync_decks(cursor, artifact, {payload[1] for payload in index.payloads.values()}, timestamp, id_gen)
+    writes = diff.added + diff.changed
+    models = {index.payloads[guid][4].model_id: index.payloads[guid][4] for guid in writes}
+    _sync_models(cursor, list(models.values()), timestamp, next(iter(artifact.deck_ids.values()), None))
+
+    for guid in writes:
+        card, full_name, fields, media, model = index.payloads[guid]
+        for filename, img_b64 in media:
+            _write_media(artifact.media_dir, filename, img_b64)
+        note = _make_note(card, fields, guid, model)
+        note.write_to_db(cursor, timestamp, artifact.deck_ids[full_name], id_gen)
+        artifact.checksums[guid] = index.checksums[guid]
+        artifact.media[guid] = [filename for filename, _ in media]
+
+
+def _write_package(artifact: _DeckArtifact) -> bytes:
+    """Zip the collection and the media referenced by current notes into an .apkg."""
+    referenced = sorted({name for media in artifact.media.values() for name in media})
+    for name in set(os.listdir(artifact.media_dir)) - set(referenced):
+        os.remove(os.path.join(artifact.media_dir, name))
+
+    with zipfile.ZipFile(artifact.apkg_path, "w") as outzip:
+        outzip.write(artifact.db_path, "collection.anki2")
+        outzip.writestr("media", json.dumps({str(i): name for i, name in enumerate(referenced)}))
+        for i, name in enumerate(referenced):
+            outzip.write(os.path.join(artifact.media_dir, name), str(i))
+
+    with open(artifact.apkg_path, "rb") as f:
+        return f.read()
+
+
+def build_deck_incremental(
+    cards: list[ExtractedCard], deck_name: str = "My Deck", note_type: str = BASIC, build_key: str = ""
+) -> bytes:
+    """Build an .apkg like ``build_deck``, patching the previous build of this deck in place.
+
+    ``build_key`` keeps different users' decks of the same name apart, e.g.
+    the ID of the extraction result or stored deck the cards came from.
+    """
+    index = index_cards(cards, deck_name, note_type)
+    card_set_hash = index.digest()
+
+    while True:
+        artifact = _get_artifact(deck_name, build_key)
+        with artifact.lock:
+            if artifact.removed:
+                continue  # evicted while waiting for the lock
+            if artifact.card_set_hash == card_set_hash and os.path.exists(artifact.apkg_path):
+                with open(artifact.apkg_path, "rb") as f:
+                    return f.read()
+
+            conn = sqlite3.connect(artifact.db_path)
+            try:
+                _apply_changes(conn.cursor(), artifact, index)
+                conn.commit()
+            except Exception:
+                _discard((build_key, deck_name), artifact)
+                raise
+            finally:
+                conn.close()
+
+            artifact.card_set_hash = card_set_hash
+            return _write_package(artifact)
@@ -0,0 +1,88 @@
+"""Compare new cards against a previously exported deck for re-import planning."""
+
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+import zlib
+from typing import Mapping
+
+from anki_builder import index_cards
+from models import DiffResponse, ExtractedCard
+from note_types import BASIC, BASIC_MODEL_ID
+from stable_ids import note_checksum
+
+
+# Largest collection database we will unpack from an .apkg; the zip itself is capped separately.
+MAX_COLLECTION_BYTES = int(os.environ.get("MAX_COLLECTION_BYTES", str(512 * 1024 * 1024)))
+
+
+class InvalidPackageError(ValueError):
+    """Raised when uploaded bytes are not a readable .apkg file."""
+
+
+class PackageTooLargeError(InvalidPackageError):
+    """Raised when an .apkg's collection would unpack to more than ``MAX_COLLECTION_BYTES``."""
+
+
+def read_manifest(apkg_bytes: bytes | memoryview) -> dict[str, str]:
+    """Read the GUID → checksum manifest of every note in an .apkg file.
+
+    Packages in Anki's newer format (``collection.anki21b``, zstd-compressed)
+    are rejected: their ``collection.anki2`` is only a placeholder telling old
+    clients to upgrade, so reading it would give an empty or wrong manifest.
+    """
+    try:
+        z = zipfile.ZipFile(io.BytesIO(apkg_bytes))
+        names = set(z.namelist())
+        collection = "collection.anki21" if "collection.anki21" in names else "collection.anki2"
+        info = z.getinfo(collection)
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise InvalidPackageError("Not a valid .apkg file") from e
+    if "collection.anki21b" in names:
+        raise InvalidPackageError(
+            "Package uses the newer Anki export format; re-export it with \"Support older Anki versions\" ticked"
+        )
+    if info.file_size > MAX_COLLECTION_BYTES:
+        raise PackageTooLargeError(f"Collection unpacks to more than {MAX_COLLECTION_BYTES // (1024 * 1024)} MB")
+
+    fd, path = tempfile.mkstemp(suffix=".anki2")
+    try:
+        # ZipExtFile stops at the declared size, so the check above bounds what is written.
+        try:
+            with os.fdopen(fd, "wb") as f, z.open(info) as src:
+                shutil.copyfileobj(src, f)
+        except (zipfile.BadZipFile, zlib.error) as e:
+            raise InvalidPackageError("Not a valid .apkg file") from e
+
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute("SELECT guid, flds, tags, mid FROM notes").fetchall()
+        except sqlite3.DatabaseError as e:
+            raise InvalidPackageError("Not a valid Anki collection") from e
+        finally:
+            conn.close()
+    finally:
+        os.remove(path)
+
+    return {
+        guid: note_checksum(flds.split("\x1f"), tags.split(), None if mid == BASIC_MODEL_ID else mid)
+        for guid, flds, tags, mid in rows
+    }
+
+
+def diff_cards(
+    cards: list[ExtractedCard], deck_name: str, manifest: Mapping[str, str], note_type: str = BASIC
+) -> DiffResponse:
+    """Classify cards as new, changed or unchanged relative to a manifest."""
+    index = index_cards(cards, deck_name, note_type)
+    diff = index.diff(manifest)
+    position = {guid: i for i, guid in enumerate(index.payloads)}
+    return DiffResponse(
+        new=[position[guid] for guid in diff.added],
+        changed=[position[guid] for guid in diff.changed],
+        unchanged=len(diff.unchanged),
+        removed=diff.removed,
+    )
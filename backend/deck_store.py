@@ -0,0 +1,324 @@
+"""Persistent deck store: decks as versioned snapshots of content-addressed cards.
+
+Cards and images are stored once each, keyed by a hash of their content, so
+a new version that changes a few cards only writes those cards. A version is
+the ordered list of card hashes, which lets clients send unchanged cards as
+hash references instead of resending them (and their images).
+
+Disk use is bounded by a per-client cap on decks, a cap on versions kept
+per deck, and a periodic collection that drops decks not saved for
+``DECK_RETENTION_DAYS`` together with cards and images no version refers to.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional
+
+from models import ExtractedCard
+
+DECK_STORE_PATH = os.environ.get(
+    "DECK_STORE_PATH", os.path.join(tempfile.gettempdir(), "anki-scribe-decks.sqlite3")
+)
+MAX_DECKS_PER_CLIENT = int(os.environ.get("MAX_DECKS_PER_CLIENT", "100"))
+MAX_DECK_VERSIONS = int(os.environ.get("MAX_DECK_VERSIONS", "50"))
+DECK_RETENTION_DAYS = float(os.environ.get("DECK_RETENTION_DAYS", "90"))
+DECK_GC_INTERVAL = float(os.environ.get("DECK_GC_INTERVAL", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    owner TEXT
+);
+CREATE TABLE IF NOT EXISTS cards (
+    hash TEXT PRIMARY KEY,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    note_type TEXT,
+    media TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS media (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    deck_id TEXT NOT NULL REFERENCES decks(id),
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    card_hashes TEXT NOT NULL,
+    PRIMARY KEY (deck_id, version)
+);
+"""
+
+# SQLite's default limit on host parameters in one statement is 999 on older builds.
+_QUERY_CHUNK = 500
+
+_initialised: set[str] = set()
+_init_lock = threading.Lock()
+_last_gc: dict[str, float] = {}
+
+
+class DeckNotFoundError(LookupError):
+    """Raised when a deck ID or version does not exist."""
+
+
+class UnknownCardError(ValueError):
+    """Raised when a version references a card hash that is not in the store."""
+
+
+class InvalidImageError(ValueError):
+    """Raised when a card's image is not valid base64."""
+
+
+class DeckQuotaError(ValueError):
+    """Raised when a client already owns ``MAX_DECKS_PER_CLIENT`` decks."""
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the store, creating its schema the first time a path is used."""
+    path = DECK_STORE_PATH
+    conn = sqlite3.connect(path, timeout=30)
+    with _init_lock:
+        if path not in _initialised:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Stores created before decks had owners.
+            if "owner" not in {row[1] for row in conn.execute("PRAGMA table_info(decks)")}:
+                conn.execute("ALTER TABLE decks ADD COLUMN owner TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS decks_owner ON decks (owner)")
+            _initialised.add(path)
+    return conn
+
+
+def _media_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def card_hash(card: ExtractedCard, media_hashes: list[str]) -> str:
+    """Content hash of a card: its text, tags, note type and image hashes."""
+    payload = json.dumps([card.front, card.back, card.tags, card.note_type, media_hashes])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _existing_cards(conn: sqlite3.Connection, hashes: set[str]) -> set[str]:
+    found: set[str] = set()
+    hashes = list(hashes)
+    for i in range(0, len(hashes), _QUERY_CHUNK):
+        chunk = hashes[i:i + _QUERY_CHUNK]
+        rows = conn.execute(
+            f"SELECT hash FROM cards WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        found.update(h for h, in rows)
+    return found
+
+
+def _delete_in(conn: sqlite3.Connection, table: str, column: str, values: list) -> None:
+    for i in range(0, len(values), _QUERY_CHUNK):
+        chunk = values[i:i + _QUERY_CHUNK]
+        conn.execute(f"DELETE FROM {table} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk)
+
+
+def save_version(
+    cards: list[ExtractedCard | str],
+    deck_name: str = "My Deck",
+    deck_id: Optional[str] = None,
+    client: str = "",
+) -> tuple[str, int, list[str]]:
+    """Store a snapshot of a deck; returns ``(deck_id, version, card_hashes)``.
+
+    ``cards`` may mix full cards with hashes of cards already in the store.
+    Without ``deck_id`` a new deck is created, owned by ``client``. Saving the
+    same cards as the latest version returns that version instead of adding
+    another; only the newest ``MAX_DECK_VERSIONS`` versions are kept.
+    """
+    rows = []
+    media_rows = []
+    hashes = []
+    for card in cards:
+        if isinstance(card, str):
+            hashes.append(card)
+            continue
+        media_hashes = []
+        for img_b64 in card.images:
+            try:
+                data = base64.b64decode(img_b64, validate=True)
+            except binascii.Error as e:
+                raise InvalidImageError("Card image is not valid base64") from e
+            media_hashes.append(_media_hash(data))
+            media_rows.append((media_hashes[-1], data))
+        h = card_hash(card, media_hashes)
+        rows.append((h, card.front, card.back, json.dumps(card.tags), card.note_type, json.dumps(media_hashes)))
+        hashes.append(h)
+
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            # Take the write lock up front so concurrent saves to one deck get consecutive versions.
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR IGNORE INTO media (hash, data) VALUES (?, ?)", media_rows)
+            conn.executemany(
+                "INSERT OR IGNORE INTO cards (hash, front, back, tags, note_type, media) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            referenced = set(hashes) - {row[0] for row in rows}
+            missing = referenced - _existing_cards(conn, referenced)
+            if missing:
+                raise UnknownCardError(f"Unknown card hash: {sorted(missing)[0]}")
+
+            if deck_id is None:
+                owned = conn.execute("SELECT COUNT(*) FROM decks WHERE owner = ?", (client,)).fetchone()[0]
+                if owned >= MAX_DECKS_PER_CLIENT:
+                    raise DeckQuotaError(f"At most {MAX_DECKS_PER_CLIENT} saved decks per client")
+                deck_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO decks (id, name, created, owner) VALUES (?, ?, ?, ?)",
+                    (deck_id, deck_name, now, client),
+                )
+                latest = None
+            else:
+                if conn.execute("SELECT 1 FROM decks WHERE id = ?", (deck_id,)).fetchone() is None:
+                    raise DeckNotFoundError(f"Deck {deck_id} not found")
+                conn.execute("UPDATE decks SET name = ? WHERE id = ?", (deck_name, deck_id))
+                latest = conn.execute(
+                    "SELECT version, card_hashes FROM versions WHERE deck_id = ? ORDER BY version DESC LIMIT 1",
+                    (deck_id,),
+                ).fetchone()
+
+            card_hashes = json.dumps(hashes)
+            if latest is not None and latest[1] == card_hashes:
+                return deck_id, latest[0], hashes
+            version = latest[0] + 1 if latest is not None else 1
+            conn.execute(
+                "INSERT INTO versions (deck_id, version, created, card_hashes) VALUES (?, ?, ?, ?)",
+                (deck_id, version, now, card_hashes),
+            )
+            conn.execute(
+                "DELETE FROM versions WHERE deck_id = ? AND version <= ?", (deck_id, version - MAX_DECK_VERSIONS)
+            )
+    finally:
+        conn.close()
+    _maybe_collect_garbage(now)
+    return deck_id, version, hashes
+
+
+def collect_garbage(now: Optional[float] = None) -> int:
+    """Delete decks not saved for ``DECK_RETENTION_DAYS``, then the cards and
+    images no remaining version refers to. Returns the number of decks deleted."""
+    cutoff = (time.time() if now is None else now) - DECK_RETENTION_DAYS * 86400
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            stale = [deck_id for deck_id, in conn.execute(
+                "SELECT id FROM decks WHERE id NOT IN (SELECT deck_id FROM versions WHERE created >= ?)", (cutoff,)
+            )]
+            _delete_in(conn, "versions", "deck_id", stale)
+            _delete_in(conn, "decks", "id", stale)
+
+            referenced: set[str] = set()
+            for hashes, in conn.execute("SELECT card_hashes FROM versions"):
+                referenced.update(json.loads(hashes))
+            dead_cards = []
+            live_media: set[str] = set()
+            for h, media in conn.execute("SELECT hash, media FROM cards"):
+                if h in referenced:
+                    live_media.update(json.loads(media))
+                else:
+                    dead_cards.append(h)
+            _delete_in(conn, "cards", "hash", dead_cards)
+            dead_media = [h for h, in conn.execute("SELECT hash FROM media") if h not in live_media]
+            _delete_in(conn, "media", "hash", dead_media)
+    finally:
+        conn.close()
+    return len(stale)
+
+
+def _maybe_collect_garbage(now: float) -> None:
+    """Run ``collect_garbage`` at most once per ``DECK_GC_INTERVAL`` per store in this process."""
+    path = DECK_STORE_PATH
+    with _init_lock:
+        if now - _last_gc.get(path, 0.0) < DECK_GC_INTERVAL:
+            return
+        _last_gc[path] = now
+    collect_garbage(now)
+
+
+def load_version(deck_id: str, version: Optional[int] = None) -> tuple[str, int, list[ExtractedCard], list[str]]:
+    """Load a deck snapshot (the latest if ``version`` is None): ``(name, version, cards, hashes)``."""
+    conn = _connect()
+    try:
+        deck = conn.execute("SELECT name FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        if version is None:
+            row = conn.execute(
+                "SELECT version, card_hashes FROM versions WHERE deck_id = ? ORDER BY version DESC LIMIT 1",
+                (deck_id,),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT version, card_hashes FROM versions WHERE deck_id = ? AND version = ?",
+                (deck_id, version),
+            ).fetchone()
+        if deck is None or row is None:
+            raise DeckNotFoundError(f"Deck {deck_id} version {version or 'latest'} not found")
+
+        hashes = json.loads(row[1])
+        card_rows: dict[str, tuple] = {}
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), _QUERY_CHUNK):
+            chunk = unique[i:i + _QUERY_CHUNK]
+            for r in conn.execute(
+                f"SELECT hash, front, back, tags, note_type, media FROM cards "
+                f"WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                card_rows[r[0]] = r
+
+        media_hashes = list({m for r in card_rows.values() for m in json.loads(r[5])})
+        media: dict[str, str] = {}
+        for i in range(0, len(media_hashes), _QUERY_CHUNK):
+            chunk = media_hashes[i:i + _QUERY_CHUNK]
+            for h, data in conn.execute(
+                f"SELECT hash, data FROM media WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                media[h] = base64.b64encode(data).decode("ascii")
+    finally:
+        conn.close()
+
+    cards = []
+    for h in hashes:
+        _, front, back, tags, note_type, media_json = card_rows[h]
+        cards.append(ExtractedCard(
+            front=front,
+            back=back,
+            tags=json.loads(tags),
+            images=[media[m] for m in json.loads(media_json)],
+            note_type=note_type,
+        ))
+    return deck[0], row[0], cards, hashes
+
+
+def list_versions(deck_id: str) -> tuple[str, list[tuple[int, float, int]]]:
+    """Return a deck's name and its ``(version, created, card_count)`` history."""
+    conn = _connect()
+    try:
+        deck = conn.execute("SELECT name FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        if deck is None:
+            raise DeckNotFoundError(f"Deck {deck_id} not found")
+        rows = conn.execute(
+            "SELECT version, created, card_hashes FROM versions WHERE deck_id = ? ORDER BY version",
+            (deck_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return deck[0], [(version, created, len(json.loads(hashes))) for version, created, hashes in rows]
@@ -0,0 +1,181 @@
+"""Near-duplicate question detection with MinHash and locality-sensitive hashing.
+
+Each question is reduced to character shingles and a MinHash signature
+(one-permutation hashing: one hash per shingle, binned, so cost is linear in
+the text). Signatures are split into LSH bands; only cards that share a band
+bucket are compared, by exact Jaccard similarity of their shingles, so a
+deck of tens of thousands of cards needs a tiny fraction of all pairwise
+comparisons (see benchmarks/bench_dedup.py).
+"""
+
+import re
+import zlib
+from collections import Counter
+from typing import Optional
+
+from models import ExtractedCard
+
+# Short templated questions ("What is the function of the liver?" / "...kidney?") reach
+# about 0.7 on character shingles, so the default sits well above that.
+DEDUP_THRESHOLD = 0.8
+# Merging deletes cards, so it is refused below this threshold; flagging is not.
+MIN_MERGE_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_SIZE = 4
+
+# Shingles in more than this fraction of questions (e.g. "what is the") are left out of
+# signatures so they do not put every question in the same LSH buckets.
+COMMON_SHINGLE_FRACTION = 0.01
+# Buckets larger than this are compared against their first member only.
+_MAX_PAIRWISE_BUCKET = 50
+_HASH_BITS = 32 - (NUM_PERM - 1).bit_length()
+_EMPTY = 1 << _HASH_BITS
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+class UnsafeMergeError(ValueError):
+    """Raised when merging is asked for below ``MIN_MERGE_THRESHOLD``."""
+
+
+def _shingles(text: str) -> set[int]:
+    """Hashed character shingles of normalised text (case, punctuation and spacing ignored)."""
+    data = _NON_WORD_RE.sub(" ", text.lower()).strip().encode("utf-8")
+    if len(data) <= SHINGLE_SIZE:
+        return {zlib.crc32(data)}
+    return {zlib.crc32(data[i:i + SHINGLE_SIZE]) for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+
+def _signature(shingles: set[int]) -> list[int]:
+    """One-permutation MinHash: the minimum hash per bin, empty bins filled from the next one."""
+    bins = [_EMPTY] * NUM_PERM
+    for h in shingles:
+        b = h % NUM_PERM
+        v = h // NUM_PERM
+        if v < bins[b]:
+            bins[b] = v
+    # Rotation densification keeps signatures of short texts comparable: an empty bin
+    # takes the value of the nearest non-empty bin to its right, offset by the distance.
+    signature = bins[:]
+    carry = None
+    step = 0
+    for i in range(2 * NUM_PERM - 1, -1, -1):
+        j = i % NUM_PERM
+        if bins[j] != _EMPTY:
+            carry, step = bins[j], 0
+            continue
+        step += 1
+        if i < NUM_PERM and carry is not None:
+            signature[j] = carry + step * _EMPTY
+    return signature
+
+
+def lsh_params(threshold: float) -> tuple[int, int]:
+    """Pick (bands, rows) whose LSH threshold (1/b)^(1/r) is closest to ``threshold``."""
+    return min(
+        ((NUM_PERM // rows, rows) for rows in range(1, NUM_PERM + 1)),
+        key=lambda p: abs((1 / p[0]) ** (1 / p[1]) - threshold),
+    )
+
+
+def _jaccard(a: set[int], b: set[int]) -> float:
+    common = len(a & b)
+    return common / (len(a) + len(b) - common) if a or b else 1.0
+
+
+def find_near_duplicates(questions: list[str], threshold: float = DEDUP_THRESHOLD) -> list[list[int]]:
+    """Group indices of questions whose shingle Jaccard similarity is at least ``threshold``.
+
+    Groups are transitive (A~B and B~C puts A, B, C together), sorted, and
+    only returned when they have more than one member.
+    """
+    shingle_sets = [_shingles(q) for q in questions]
+    frequency = Counter(h for shingles in shingle_sets for h in shingles)
+    limit = max(20, int(len(questions) * COMMON_SHINGLE_FRACTION))
+    common = {h for h, count in frequency.items() if count > limit}
+    bands, rows = lsh_params(threshold)
+    parent = list(range(len(questions)))
+    checked: set[tuple[int, int]] = set()
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union_if_similar(i: int, j: int) -> None:
+        ri, rj = find(i), find(j)
+        if ri == rj or (i, j) in checked:
+            return
+        # The same pair often shares several bands; verify it only once.
+        checked.add((i, j))
+        if _jaccard(shingle_sets[i], shingle_sets[j]) >= threshold:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    signatures = [_signature((s - common) or s) for s in shingle_sets]
+    for band in range(bands):
+        start = band * rows
+        buckets: dict[tuple, list[int]] = {}
+        for i, sig in enumerate(signatures):
+            buckets.setdefault(tuple(sig[start:start + rows]), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) <= _MAX_PAIRWISE_BUCKET:
+                for a in range(len(members)):
+                    for b in range(a + 1, len(members)):
+                        union_if_similar(members[a], members[b])
+            else:
+                for other in members[1:]:
+                    union_if_similar(members[0], other)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(questions)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def flag_duplicates(cards: list[ExtractedCard], threshold: float = DEDUP_THRESHOLD) -> list[ExtractedCard]:
+    """Mark each near-duplicate with ``duplicate_of``, the index of the first card in its group."""
+    for group in find_near_duplicates([c.front for c in cards], threshold):
+        for i in group[1:]:
+            cards[i].duplicate_of = group[0]
+    return cards
+
+
+def _merge_into(keep: ExtractedCard, other: ExtractedCard) -> None:
+    """Add the other card's answer lines, tags and images that ``keep`` lacks."""
+    lines = keep.back.split("\n") if keep.back else []
+    seen = {line.strip() for line in lines}
+    for line in other.back.split("\n"):
+        if line.strip() and line.strip() not in seen:
+            lines.append(line)
+            seen.add(line.strip())
+    keep.back = "\n".join(lines)
+    keep.tags += [t for t in other.tags if t not in keep.tags]
+    keep.images += [img for img in other.images if img not in keep.images]
+
+
+def merge_duplicates(cards: list[ExtractedCard], threshold: float = DEDUP_THRESHOLD) -> list[ExtractedCard]:
+    """Collapse each group of near-duplicates into its first card, combining their answers."""
+    dropped: set[int] = set()
+    for group in find_near_duplicates([c.front for c in cards], threshold):
+        for i in group[1:]:
+            _merge_into(cards[group[0]], cards[i])
+            dropped.add(i)
+    return [card for i, card in enumerate(cards) if i not in dropped]
+
+
+def deduplicate(cards: list[ExtractedCard], mode: Optional[str], threshold: float = DEDUP_THRESHOLD) -> list[ExtractedCard]:
+    """Apply ``mode`` ("flag", "merge" or None to leave cards as they are).
+
+    "merge" below ``MIN_MERGE_THRESHOLD`` raises ``UnsafeMergeError``: at low
+    thresholds distinct cards group together and would be deleted.
+    """
+    if mode == "flag":
+        return flag_duplicates(cards, threshold)
+    if mode == "merge":
+        if threshold < MIN_MERGE_THRESHOLD:
+            raise UnsafeMergeError(f"dedup_threshold must be at least {MIN_MERGE_THRESHOLD} to merge")
+        return merge_duplicates(cards, threshold)
+    return cards
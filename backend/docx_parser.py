@@ -0,0 +1,187 @@
+"""Parse .docx files into Paragraph objects by streaming word/document.xml."""
+
+import base64
+import io
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from models import Paragraph
+from question_detectors import bold_prefix_length
+from tables import table_to_paragraph
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_HEADING_STYLE_RE = re.compile(r"^(?:heading\s*(\d)|title)$", re.IGNORECASE)
+
+
+class InvalidDocxError(ValueError):
+    """Raised when uploaded bytes are not a readable .docx file."""
+
+
+def _is_on(el: ET.Element | None) -> bool:
+    """Word toggle properties (e.g. <w:b/>) are on unless w:val says otherwise."""
+    if el is None:
+        return False
+    return el.get(f"{_W}val", "true").lower() not in ("0", "false", "none")
+
+
+def _read_relationships(z: zipfile.ZipFile) -> dict[str, str]:
+    """Map relationship IDs to zip paths of their targets (used for images)."""
+    try:
+        root = ET.fromstring(z.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return {}
+    return {
+        rel.get("Id"): posixpath.normpath(posixpath.join("word", rel.get("Target", "")))
+        for rel in root.iter(f"{_REL}Relationship")
+    }
+
+
+def _read_heading_styles(z: zipfile.ZipFile) -> dict[str, int]:
+    """Map paragraph style IDs named 'Title'/'heading N' to heading levels 1 or 2."""
+    try:
+        root = ET.fromstring(z.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    levels = {}
+    for style in root.iter(f"{_W}style"):
+        name = style.find(f"{_W}name")
+        m = _HEADING_STYLE_RE.match(name.get(f"{_W}val", "")) if name is not None else None
+        if m:
+            levels[style.get(f"{_W}styleId")] = 1 if not m.group(1) or m.group(1) == "1" else 2
+    return levels
+
+
+def _paragraph_text(p: ET.Element) -> str:
+    """Concatenate the text of a paragraph, turning breaks and tabs into whitespace."""
+    parts = []
+    for el in p.iter():
+        if el.tag == f"{_W}t" and el.text:
+            parts.append(el.text)
+        elif el.tag == f"{_W}tab":
+            parts.append(" ")
+        elif el.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _convert_paragraph(
+    p: ET.Element, z: zipfile.ZipFile, rels: dict[str, str], heading_styles: dict[str, int]
+) -> Paragraph | None:
+    """Convert a <w:p> element into a Paragraph with bold, colour, heading and images."""
+    all_bold = True
+    text_color = None
+    has_text = False
+    runs = []
+    font_size = None
+
+    for run in p.iter(f"{_W}r"):
+        run_text = "".join(t.text or "" for t in run.iter(f"{_W}t"))
+        if not run_text.strip():
+            continue
+        has_text = True
+        props = run.find(f"{_W}rPr")
+        bold = props is not None and _is_on(props.find(f"{_W}b"))
+        runs.append((run_text, bold))
+        if not bold:
+            all_bold = False
+        size = props.find(f"{_W}sz") if props is not None else None
+        if size is not None and size.get(f"{_W}val", "").isdigit():
+            # w:sz is in half-points.
+            font_size = max(font_size or 0.0, int(size.get(f"{_W}val")) / 2)
+        if text_color is None and props is not None:
+            color = props.find(f"{_W}color")
+            value = color.get(f"{_W}val", "") if color is not None else ""
+            if value and value.lower() not in ("auto", "000000"):
+                text_color = f"#{value.lower()}"
+
+    images = []
+    for blip in p.iter(f"{_A}blip"):
+        target = rels.get(blip.get(f"{_R}embed"))
+        if target:
+            try:
+                images.append(base64.b64encode(z.read(target)).decode("ascii"))
+            except KeyError:
+                continue
+
+    text = _paragraph_text(p).strip()
+    if not text and not images:
+        return None
+
+    heading_level = None
+    style = p.find(f"{_W}pPr/{_W}pStyle")
+    if style is not None:
+        heading_level = heading_styles.get(style.get(f"{_W}val"))
+
+    is_bold = has_text and all_bold and heading_level is None
+    return Paragraph(
+        text=text,
+        is_bold=is_bold,
+        bold_prefix=bold_prefix_length(runs, text) if not is_bold and heading_level is None else 0,
+        font_size=font_size,
+        is_heading=heading_level is not None,
+        text_color=text_color,
+        heading_level=heading_level,
+        images=images,
+    )
+
+
+def _convert_table(tbl: ET.Element) -> Paragraph:
+    """Convert a <w:tbl> element into a table Paragraph."""
+    rows = []
+    for tr in tbl.findall(f"{_W}tr"):
+        rows.append([
+            " ".join(_paragraph_text(p).strip() for p in tc.findall(f"{_W}p")).strip()
+            for tc in tr.findall(f"{_W}tc")
+        ])
+    return table_to_paragraph(rows)
+
+
+def parse_docx(docx_bytes: bytes | memoryview) -> list[Paragraph]:
+    """Parse a .docx file into a list of Paragraph objects with formatting metadata.
+
+    The document body is streamed with iterparse and each top-level paragraph
+    or table is discarded once converted, so memory stays flat on long files.
+    """
+    try:
+        z = zipfile.ZipFile(io.BytesIO(docx_bytes))
+        document = z.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise InvalidDocxError("Not a valid .docx file") from e
+
+    rels = _read_relationships(z)
+    heading_styles = _read_heading_styles(z)
+    paragraphs: list[Paragraph] = []
+    table_depth = 0
+    body = None
+
+    try:
+        for event, el in ET.iterparse(document, events=("start", "end")):
+            if event == "start":
+                if el.tag == f"{_W}body":
+                    body = el
+                elif el.tag == f"{_W}tbl":
+                    table_depth += 1
+                continue
+
+            if el.tag == f"{_W}tbl":
+                table_depth -= 1
+                if table_depth == 0:
+                    paragraphs.append(_convert_table(el))
+                    if body is not None and el in body:
+                        body.remove(el)
+            elif el.tag == f"{_W}p" and table_depth == 0:
+                para = _convert_paragraph(el, z, rels, heading_styles)
+                if para:
+                    paragraphs.append(para)
+                if body is not None and el in body:
+                    body.remove(el)
+    except ET.ParseError as e:
+        raise InvalidDocxError("Malformed document.xml") from e
+
+    return paragraphs
@@ -0,0 +1,98 @@
+"""Column detection and reading order for blocks on a PDF page."""
+
+from bisect import bisect_right
+
+# Blocks wider than this fraction of the page (titles, full-width figures) span all columns.
+SPANNING_FRACTION = 0.6
+# Horizontal slack (in points) before two blocks are considered to overlap.
+GUTTER_TOLERANCE = 2.0
+# A column needs this many boxes with text beside them; fewer is a figure or a stray header.
+MIN_COLUMN_BOXES = 2
+
+Box = tuple[float, float, float, float]
+
+
+def _side_by_side(boxes: list[Box], candidates: list[int]) -> set[int]:
+    """Candidates that share a row with another candidate clear of them horizontally."""
+    paired: set[int] = set()
+    by_top = sorted(candidates, key=lambda i: boxes[i][1])
+    for n, i in enumerate(by_top):
+        ax0, _, ax1, ay1 = boxes[i]
+        for j in by_top[n + 1:]:
+            bx0, by0, bx1, _ = boxes[j]
+            if by0 >= ay1:
+                break
+            if ax1 + GUTTER_TOLERANCE <= bx0 or bx1 + GUTTER_TOLERANCE <= ax0:
+                paired.update((i, j))
+    return paired
+
+
+def _merge_spans(spans: list[tuple[float, float]]) -> list[list]:
+    """Merge overlapping x-ranges into ``[x0, x1, count]`` runs, left to right."""
+    merged: list[list] = []
+    for x0, x1 in sorted(spans):
+        if merged and x0 < merged[-1][1] + GUTTER_TOLERANCE:
+            merged[-1][1] = max(merged[-1][1], x1)
+            merged[-1][2] += 1
+        else:
+            merged.append([x0, x1, 1])
+    return merged
+
+
+def detect_columns(boxes: list[Box], page_width: float) -> list[int]:
+    """Assign each box a column index, or -1 for boxes spanning the page width.
+
+    Columns are only found where text really runs side by side: the x-ranges
+    of boxes that share a row with a box clear of them are merged, and each
+    run holding at least ``MIN_COLUMN_BOXES`` of them is a column. A box
+    overlapping exactly one column belongs to it; boxes crossing or sitting
+    between columns (centred headings) span. A page with fewer than two
+    columns (a centred heading, a right-aligned header, a figure beside a
+    few lines) is one column.
+    """
+    candidates = [i for i, b in enumerate(boxes) if b[2] - b[0] <= page_width * SPANNING_FRACTION]
+    columns = [-1] * len(boxes)
+    paired = _side_by_side(boxes, candidates)
+    runs = [
+        (x0, x1) for x0, x1, count in _merge_spans([(boxes[i][0], boxes[i][2]) for i in paired])
+        if count >= MIN_COLUMN_BOXES
+    ]
+    if len(runs) < 2:
+        for i in candidates:
+            columns[i] = 0
+        return columns
+
+    for i in candidates:
+        x0, _, x1, _ = boxes[i]
+        hits = [
+            c for c, (rx0, rx1) in enumerate(runs)
+            if x0 < rx1 - GUTTER_TOLERANCE and x1 > rx0 + GUTTER_TOLERANCE
+        ]
+        if len(hits) == 1:
+            columns[i] = hits[0]
+    return columns
+
+
+def reading_order(boxes: list[Box], page_width: float) -> list[int]:
+    """Return box indices in reading order: down each column, left to right.
+
+    Spanning boxes split the page into horizontal bands, each band read
+    column by column. Single-column pages keep their original order.
+    """
+    if len(boxes) < 2:
+        return list(range(len(boxes)))
+
+    columns = detect_columns(boxes, page_width)
+    if max(columns) <= 0:
+        return list(range(len(boxes)))
+
+    spanning_tops = sorted(boxes[i][1] for i, c in enumerate(columns) if c == -1)
+
+    def key(i: int) -> tuple:
+        x0, y0, _, _ = boxes[i]
+        band = bisect_right(spanning_tops, y0)
+        if columns[i] == -1:
+            return (band, -1, y0, x0)
+        return (band, columns[i], y0, x0)
+
+    return sorted(range(len(boxes)), key=key)
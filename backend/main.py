@@ -1,17 +1,98 @@
+import asyncio
 import json
 import logging
+import math
+import os
+import shutil
 import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
 
-from fastapi import FastAPI, UploadFile, HTTPException
+from fastapi import FastAPI, Form, Query, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from models import ExtractRequest, ExtractResponse, GenerateRequest
-from qa_parser import extract_cards
+from models import (
+    CardPage,
+    CardRef,
+    DeckInfo,
+    DeckVersion,
+    DeckVersionResponse,
+    DedupMode,
+    DetectorName,
+    DiffRequest,
+    DiffResponse,
+    ExtractRequest,
+    ExtractResponse,
+    GenerateRequest,
+    ManifestResponse,
+    NoteChecksum,
+    SaveDeckRequest,
+    SaveDeckResponse,
+)
+from qa_parser import extract_cards, filter_by_tags, prefix_tags, sanitize_tag
+from dedup import DEDUP_THRESHOLD, UnsafeMergeError, deduplicate
 from anki_builder import build_deck
-from pdf_parser import parse_pdf
+from deck_cache import build_deck_incremental
+from deck_diff import InvalidPackageError, PackageTooLargeError, diff_cards, read_manifest
+from card_search import ResultNotFoundError, get_result, index_result
+from deck_store import (
+    DeckNotFoundError,
+    DeckQuotaError,
+    InvalidImageError,
+    UnknownCardError,
+    list_versions,
+    load_version,
+    save_version,
+)
+from pdf_parser import InvalidPageRangeError, parse_pdf
+from result_cache import build_deck_cached, parse_pdf_cached
+from docx_parser import InvalidDocxError, parse_docx
+from markup_parser import parse_html, parse_markdown
+from question_detectors import InvalidDetectorError, compile_detector
+import profiling
+from workers import WORKER_PROCESSES, pdf_file_to_cards, run_in_worker
+from admission import FairScheduler, RateLimiter, client_key, request_cost
+from payload_guard import PayloadGuardMiddleware, PayloadLimits, PayloadTooLargeError
+from wire_format import InvalidWireFormatError, decode_paragraphs
+from uploads import (
+    MULTIPART_OVERHEAD,
+    BodySizeLimitMiddleware,
+    UploadTooLargeError,
+    save_upload,
+    spool_upload,
+)
 
 MAX_PDF_SIZE = 20 * 1024 * 1024  # 20 MB
+MAX_APKG_SIZE = 100 * 1024 * 1024  # 100 MB
+MAX_BATCH_SIZE = 100 * 1024 * 1024  # 100 MB across all files in one batch
+MAX_PAGE_SIZE = 500
+
+
+def _from_utf8(parse):
+    """Adapt a parser of text to take the raw upload bytes, decoded as UTF-8."""
+    return lambda data: parse(bytes(data).decode("utf-8", errors="replace"))
+
+
+# File extension -> (source name, parser taking the raw upload bytes).
+FILE_PARSERS = {
+    ".pdf": ("pdf", parse_pdf_cached),
+    ".docx": ("docx", parse_docx),
+    ".md": ("markdown", _from_utf8(parse_markdown)),
+    ".markdown": ("markdown", _from_utf8(parse_markdown)),
+    ".html": ("html", _from_utf8(parse_html)),
+    ".htm": ("html", _from_utf8(parse_html)),
+}
+
+# Per-endpoint caps on JSON bodies, enforced while the body streams in.
+PAYLOAD_LIMITS = {
+    "/api/extract": PayloadLimits(items_key="paragraphs"),
+    "/api/generate": PayloadLimits(items_key="cards"),
+    "/api/diff": PayloadLimits(items_key="cards"),
+    "/api/decks": PayloadLimits(items_key="cards"),
+}
 
 
 class JSONFormatter(logging.Formatter):
@@ -30,6 +111,17 @@ logger.addHandler(handler)
 
 app = FastAPI(title="Docs to Anki")
 
+app.add_middleware(BodySizeLimitMiddleware, limits={
+    "/api/pdf-upload": MAX_PDF_SIZE + MULTIPART_OVERHEAD,
+    "/api/file-upload": MAX_PDF_SIZE + MULTIPART_OVERHEAD,
+    "/api/pdf-upload-batch": MAX_BATCH_SIZE + MULTIPART_OVERHEAD,
+    "/api/manifest": MAX_APKG_SIZE + MULTIPART_OVERHEAD,
+    "/api/extract/compact": PAYLOAD_LIMITS["/api/extract"].max_body_bytes,
+})
+
+app.add_middleware(PayloadGuardMiddleware, limits=PAYLOAD_LIMITS)
+
+# Added last so it is outermost: 413s from the size guards still get CORS headers.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -44,24 +136,157 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+rate_limiter = RateLimiter()
+scheduler = FairScheduler(int(os.environ.get("SCHEDULER_SLOTS", str(WORKER_PROCESSES))))
+
+
+def _admit(http_request: Request, cost: float) -> str:
+    """Charge the caller's rate-limit bucket, raising 429 with Retry-After when it is empty."""
+    client = client_key(http_request.headers, http_request.client.host if http_request.client else None)
+    retry_after = rate_limiter.acquire(client, cost)
+    if retry_after:
+        logger.info("rate_limited", extra={"event_data": {
+            "event": "rate_limited",
+            "path": http_request.url.path,
+            "cost": round(cost, 2),
+            "retry_after": round(retry_after, 2),
+        }})
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return client
+
+
+def _extract(
+    paragraphs: list,
+    dedup: Optional[str],
+    dedup_threshold: Optional[float],
+    tags: List[str] = (),
+    detectors: List[str] = (),
+    question_prefixes: List[str] = (),
+) -> list:
+    """Extract cards, keep those under the requested tags, and apply near-duplicate handling.
+
+    The question detector is compiled once here, for the whole request.
+    """
+    detector = compile_detector(detectors, paragraphs, question_prefixes)
+    cards = extract_cards(paragraphs, detector)
+    if tags:
+        cards = filter_by_tags(cards, tags)
+    return deduplicate(cards, dedup, dedup_threshold or DEDUP_THRESHOLD)
+
+
+def _require_admin(http_request: Request) -> None:
+    """Gate profiling endpoints: 404 while profiling is disabled, 403 without the admin token."""
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_admin(http_request.headers.get(profiling.PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+async def _save_profile(profile: Optional[profiling.RequestProfile], response: Response) -> None:
+    if profile is not None:
+        response.headers["X-Profile-Id"] = await run_in_threadpool(profile.save)
+
+
+async def _extract_response(cards: list, page_size: Optional[int]) -> ExtractResponse:
+    """Index extracted cards for search and return them, or only their first page."""
+    result_id = await run_in_threadpool(index_result, cards)
+    page = cards if page_size is None else cards[:page_size]
+    return ExtractResponse(cards=page, result_id=result_id, total=len(cards))
+
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+def metrics():
+    """Scheduler queue depth, wait times and rate-limit rejections for this instance."""
+    return {"scheduler": scheduler.metrics(), "rate_limited": rate_limiter.rejected}
+
+
+@app.get("/api/profiles")
+def list_profiles(http_request: Request):
+    """Saved request profiles, newest first (admin only)."""
+    _require_admin(http_request)
+    return {"profiles": profiling.list_profiles()}
+
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str, http_request: Request):
+    """A profile's input summary and its slowest functions by cumulative time (admin only)."""
+    _require_admin(http_request)
+    try:
+        return profiling.load_profile(profile_id)
+    except profiling.ProfileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/api/profiles/{profile_id}/stats")
+def download_profile_stats(profile_id: str, http_request: Request):
+    """Download a profile's raw cProfile stats, for pstats or snakeviz (admin only)."""
+    _require_admin(http_request)
+    try:
+        path = profiling.stats_path(profile_id)
+    except profiling.ProfileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
 @app.post("/api/pdf-upload", response_model=ExtractResponse)
-async def pdf_upload(file: UploadFile):
-    """Accept a PDF upload, extract Q&A cards, and return them for preview."""
+async def pdf_upload(
+    file: UploadFile,
+    http_request: Request,
+    response: Response,
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    dedup: Optional[DedupMode] = None,
+    dedup_threshold: Optional[float] = Query(None, gt=0, le=1),
+    pages: Optional[str] = None,
+    tags: List[str] = Query([]),
+    detectors: List[DetectorName] = Query([]),
+    question_prefixes: List[str] = Query([]),
+):
+    """Accept a PDF upload, extract Q&A cards, and return them for preview.
+
+    ``pages`` (e.g. ``1-5,8``) and ``tags`` (e.g. ``Pharmacology::*``) limit
+    extraction to part of the document; with an outline, only the pages of
+    matching sections are parsed. ``detectors`` and ``question_prefixes``
+    choose how questions are recognised (default: all-bold lines). Admins
+    can profile the request by sending ``X-Profile-Token``.
+    """
     if file.content_type not in ("application/pdf", "application/octet-stream"):
         raise HTTPException(status_code=400, detail="File must be a PDF")
+    client = _admit(http_request, request_cost(size_bytes=file.size or 0))
 
-    pdf_bytes = await file.read()
-    if len(pdf_bytes) > MAX_PDF_SIZE:
-        raise HTTPException(status_code=400, detail="File exceeds 20 MB limit")
+    try:
+        upload = await spool_upload(file, MAX_PDF_SIZE)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="File exceeds 20 MB limit")
 
-    paragraphs = parse_pdf(pdf_bytes)
-    cards = extract_cards(paragraphs)
+    profile = profiling.start("pdf-upload", http_request.headers)
+    # A profiled request must do the work rather than hit the shared cache.
+    parse = parse_pdf if profile is not None else parse_pdf_cached
+    async with scheduler.slot(client):
+        try:
+            with upload:
+                if profile is not None:
+                    profile.summary["pdf"] = await run_in_threadpool(profiling.summarize_pdf, upload.view)
+                paragraphs = await run_in_threadpool(
+                    profiling.call, profile, parse, upload.view, pages, tags
+                )
+        except InvalidPageRangeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            cards = await run_in_threadpool(
+                profiling.call, profile, _extract, paragraphs, dedup, dedup_threshold, tags,
+                detectors, question_prefixes,
+            )
+        except (InvalidDetectorError, UnsafeMergeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
     for card in cards:
         card.images = []
 
@@ -69,20 +294,174 @@ async def pdf_upload(file: UploadFile):
     logger.info("extract", extra={"event_data": {
         "event": "extract",
         "source": "pdf-upload",
-        "file_size_kb": len(pdf_bytes) // 1024,
+        "file_size_kb": upload.size // 1024,
+        "paragraphs_in": len(paragraphs),
+        "cards_out": len(cards),
+        "tags_out": len(all_tags),
+        "empty_result": len(cards) == 0,
+    }})
+
+    if profile is not None:
+        profile.summary["paragraphs"] = profiling.summarize_paragraphs(paragraphs)
+        profile.summary["cards_out"] = len(cards)
+        await _save_profile(profile, response)
+    return await _extract_response(cards, page_size)
+
+
+@app.post("/api/pdf-upload-batch")
+async def pdf_upload_batch(
+    files: List[UploadFile], http_request: Request, tag_by_filename: bool = Form(False)
+):
+    """Accept many PDFs, extract their cards in parallel, and stream back one merged preview.
+
+    The response has the same shape as /api/extract, plus ``failed`` listing
+    files that could not be parsed. With ``tag_by_filename`` each file's
+    name becomes the top-level tag of its cards.
+    """
+    for file in files:
+        if file.content_type not in ("application/pdf", "application/octet-stream"):
+            raise HTTPException(status_code=400, detail=f"{file.filename} is not a PDF")
+    client = _admit(http_request, request_cost(size_bytes=sum(f.size or 0 for f in files)))
+
+    async def parse_one(path: str) -> list:
+        async with scheduler.slot(client):
+            return await run_in_worker(pdf_file_to_cards, path)
+
+    # Each file is saved to disk and only its path goes to the worker, so the batch is never held in memory.
+    batch_dir = tempfile.mkdtemp(prefix="batch-")
+    tasks = []
+    total = 0
+    try:
+        for file in files:
+            limit = min(MAX_PDF_SIZE, MAX_BATCH_SIZE - total)
+            path, size = await save_upload(file, limit, batch_dir)
+            total += size
+            tasks.append((file.filename or "", asyncio.ensure_future(parse_one(path))))
+    except BaseException as e:
+        for _, task in tasks:
+            task.cancel()
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        if isinstance(e, UploadTooLargeError):
+            raise HTTPException(status_code=413, detail="Upload exceeds size limit")
+        raise
+
+    async def stream():
+        failed = []
+        card_count = 0
+        try:
+            yield '{"cards": ['
+            for filename, task in tasks:
+                try:
+                    cards = await task
+                except Exception:
+                    failed.append(filename)
+                    continue
+                if tag_by_filename:
+                    prefix_tags(cards, sanitize_tag(Path(filename).stem))
+                for card in cards:
+                    card.images = []
+                    yield ("," if card_count else "") + card.model_dump_json()
+                    card_count += 1
+            yield "], " + f'"failed": {json.dumps(failed)}' + "}"
+        finally:
+            for _, task in tasks:
+                task.cancel()
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+        logger.info("extract", extra={"event_data": {
+            "event": "extract",
+            "source": "pdf-upload-batch",
+            "files_in": len(tasks),
+            "files_failed": len(failed),
+            "file_size_kb": total // 1024,
+            "cards_out": card_count,
+            "empty_result": card_count == 0,
+        }})
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+@app.post("/api/file-upload", response_model=ExtractResponse)
+async def file_upload(
+    file: UploadFile,
+    http_request: Request,
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    dedup: Optional[DedupMode] = None,
+    dedup_threshold: Optional[float] = Query(None, gt=0, le=1),
+    pages: Optional[str] = None,
+    tags: List[str] = Query([]),
+    detectors: List[DetectorName] = Query([]),
+    question_prefixes: List[str] = Query([]),
+):
+    """Accept a PDF, Word, Markdown or HTML upload, extract Q&A cards, and return them for preview."""
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext not in FILE_PARSERS:
+        raise HTTPException(status_code=400, detail="File must be a PDF, .docx, Markdown or HTML file")
+    source, parser = FILE_PARSERS[ext]
+    if pages and parser is not parse_pdf_cached:
+        raise HTTPException(status_code=400, detail="Page ranges are only supported for PDFs")
+    client = _admit(http_request, request_cost(size_bytes=file.size or 0))
+
+    try:
+        upload = await spool_upload(file, MAX_PDF_SIZE)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="File exceeds 20 MB limit")
+
+    async with scheduler.slot(client):
+        try:
+            with upload:
+                if parser is parse_pdf_cached:
+                    paragraphs = await run_in_threadpool(parse_pdf_cached, upload.view, pages, tags)
+                else:
+                    paragraphs = await run_in_threadpool(parser, upload.view)
+            cards = await run_in_threadpool(
+                _extract, paragraphs, dedup, dedup_threshold, tags, detectors, question_prefixes
+            )
+        except (InvalidDocxError, InvalidPageRangeError, InvalidDetectorError, UnsafeMergeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    for card in cards:
+        card.images = []
+
+    all_tags = {t for c in cards for t in c.tags}
+    logger.info("extract", extra={"event_data": {
+        "event": "extract",
+        "source": f"{source}-upload",
+        "file_size_kb": upload.size // 1024,
         "paragraphs_in": len(paragraphs),
         "cards_out": len(cards),
         "tags_out": len(all_tags),
         "empty_result": len(cards) == 0,
     }})
 
-    return ExtractResponse(cards=cards)
+    return await _extract_response(cards, page_size)
 
 
 @app.post("/api/extract", response_model=ExtractResponse)
-def extract(request: ExtractRequest):
-    """Parse paragraphs and return extracted Q&A cards for preview."""
-    cards = extract_cards(request.paragraphs)
+async def extract(
+    request: ExtractRequest,
+    http_request: Request,
+    response: Response,
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Parse paragraphs and return extracted Q&A cards for preview.
+
+    Admins can profile the request by sending ``X-Profile-Token``.
+    """
+    client = _admit(http_request, request_cost(
+        paragraphs=len(request.paragraphs),
+        images=sum(len(p.images) for p in request.paragraphs),
+    ))
+    profile = profiling.start("extract", http_request.headers)
+    if profile is not None:
+        profile.summary["paragraphs"] = profiling.summarize_paragraphs(request.paragraphs)
+    async with scheduler.slot(client):
+        try:
+            cards = await run_in_threadpool(
+                profiling.call, profile, _extract, request.paragraphs, request.dedup, request.dedup_threshold,
+                request.tags, request.detectors, request.question_prefixes,
+            )
+        except (InvalidDetectorError, UnsafeMergeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     all_tags = {t for c in cards for t in c.tags}
     logger.info("extract", extra={"event_data": {
@@ -94,27 +473,255 @@ def extract(request: ExtractRequest):
         "empty_result": len(cards) == 0,
     }})
 
-    return ExtractResponse(cards=cards)
+    if profile is not None:
+        profile.summary["cards_out"] = len(cards)
+        await _save_profile(profile, response)
+    return await _extract_response(cards, page_size)
+
+
+@app.post("/api/extract/compact", response_model=ExtractResponse)
+async def extract_compact(
+    http_request: Request,
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    dedup: Optional[DedupMode] = None,
+    dedup_threshold: Optional[float] = Query(None, gt=0, le=1),
+    tags: List[str] = Query([]),
+    detectors: List[DetectorName] = Query([]),
+    question_prefixes: List[str] = Query([]),
+):
+    """Like /api/extract, for a gzipped compact payload (see wire_format.py) from the Docs add-on.
+
+    ``detectors`` and ``question_prefixes`` work as on the other extract paths,
+    but the wire format carries no bold lead-ins or font sizes, so the
+    ``bold-prefix`` and ``font-size`` detectors find nothing here.
+    """
+    body = await http_request.body()
+    # Charge by the compressed size before decoding, so a rate-limited client costs no decode work.
+    client = _admit(http_request, request_cost(size_bytes=len(body)))
+    async with scheduler.slot(client):
+        try:
+            paragraphs = await run_in_threadpool(decode_paragraphs, body, PAYLOAD_LIMITS["/api/extract"])
+        except PayloadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidWireFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            cards = await run_in_threadpool(
+                _extract, paragraphs, dedup, dedup_threshold, tags, detectors, question_prefixes
+            )
+        except (InvalidDetectorError, UnsafeMergeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    all_tags = {t for c in cards for t in c.tags}
+    logger.info("extract", extra={"event_data": {
+        "event": "extract",
+        "source": "google-docs-compact",
+        "body_kb": len(body) // 1024,
+        "paragraphs_in": len(paragraphs),
+        "cards_out": len(cards),
+        "tags_out": len(all_tags),
+        "empty_result": len(cards) == 0,
+    }})
+
+    return await _extract_response(cards, page_size)
+
+
+@app.get("/api/results/{result_id}/cards", response_model=CardPage)
+def search_cards(
+    result_id: str,
+    q: str = "",
+    tag: Optional[str] = None,
+    empty_answer: Optional[bool] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Search and filter the cards of an extraction result, one page at a time.
+
+    ``q`` matches every word by prefix, ``tag`` keeps cards under a tag path
+    (e.g. ``Cardiology`` or ``Cardiology::Valves``) and ``empty_answer``
+    keeps only cards with (or without) an empty back.
+    """
+    try:
+        index = get_result(result_id)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    positions = index.search(q, tag, empty_answer)
+    page = positions[offset:offset + limit]
+    return CardPage(
+        result_id=result_id,
+        total=len(positions),
+        offset=offset,
+        positions=page,
+        cards=[index.cards[i] for i in page],
+    )
 
 
 @app.post("/api/generate")
-def generate(request: GenerateRequest):
-    """Generate an .apkg file from approved cards."""
-    apkg_bytes = build_deck(request.cards, request.deck_name)
+async def generate(request: GenerateRequest, http_request: Request):
+    """Generate an .apkg file from approved cards, or from a version of a stored deck.
 
-    all_tags = list({t for c in request.cards for t in c.tags})
+    Admins can profile the build by sending ``X-Profile-Token``.
+    """
+    cards, deck_name, incremental = request.cards, request.deck_name, request.incremental
+    build_key = request.deck_id or request.result_id
+    if request.deck_id is not None:
+        try:
+            stored_name, _, cards, _ = await run_in_threadpool(load_version, request.deck_id, request.version)
+        except DeckNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        if "deck_name" not in request.model_fields_set:
+            deck_name = stored_name
+        incremental = request.manifest is None
+    incremental = incremental and build_key is not None
+
+    client = _admit(http_request, request_cost(
+        paragraphs=len(cards),
+        images=sum(len(c.images) for c in cards),
+    ))
+    profile = profiling.start("generate", http_request.headers)
+    build = build_deck if profile is not None else build_deck_cached
+    if profile is not None:
+        profile.summary["cards"] = profiling.summarize_cards(cards)
+    async with scheduler.slot(client):
+        if request.manifest is not None:
+            manifest = {n.guid: n.checksum for n in request.manifest}
+            apkg_bytes = await run_in_threadpool(
+                profiling.call, profile, build, cards, deck_name, manifest, request.note_type
+            )
+        elif incremental:
+            apkg_bytes = await run_in_threadpool(
+                profiling.call, profile, build_deck_incremental, cards, deck_name, request.note_type, build_key
+            )
+        else:
+            apkg_bytes = await run_in_threadpool(
+                profiling.call, profile, build, cards, deck_name, None, request.note_type
+            )
+
+    all_tags = list({t for c in cards for t in c.tags})
     logger.info("generate", extra={"event_data": {
         "event": "generate",
-        "cards_submitted": len(request.cards),
+        "cards_submitted": len(cards),
         "cards_original": request.cards_original,
         "cards_edited": request.cards_edited,
         "cards_deleted": request.cards_deleted,
-        "deck_name": request.deck_name,
+        "incremental": incremental,
+        "delta": request.manifest is not None,
+        "from_store": request.deck_id is not None,
+        "note_type": request.note_type,
+        "cloze_cards": sum(1 for c in cards if c.note_type == "cloze"),
+        "deck_name": deck_name,
         "tags": all_tags,
     }})
 
-    return Response(
+    response = Response(
         content=apkg_bytes,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{request.deck_name}.apkg"'},
+        headers={"Content-Disposition": f'attachment; filename="{deck_name}.apkg"'},
+    )
+    await _save_profile(profile, response)
+    return response
+
+
+@app.post("/api/decks", response_model=SaveDeckResponse)
+async def save_deck(request: SaveDeckRequest, http_request: Request):
+    """Save cards as a new deck, or as the next version of an existing one."""
+    cards = [c.hash if isinstance(c, CardRef) else c for c in request.cards]
+    client = _admit(http_request, request_cost(
+        paragraphs=len(cards),
+        images=sum(len(c.images) for c in cards if not isinstance(c, str)),
+    ))
+    try:
+        async with scheduler.slot(client):
+            deck_id, version, card_hashes = await run_in_threadpool(
+                save_version, cards, request.deck_name, request.deck_id, client
+            )
+    except DeckNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (UnknownCardError, InvalidImageError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeckQuotaError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    logger.info("save_deck", extra={"event_data": {
+        "event": "save_deck",
+        "deck_id": deck_id,
+        "version": version,
+        "cards_submitted": len(cards),
+        "cards_by_reference": sum(1 for c in cards if isinstance(c, str)),
+    }})
+
+    return SaveDeckResponse(deck_id=deck_id, version=version, card_hashes=card_hashes)
+
+
+@app.get("/api/decks/{deck_id}", response_model=DeckInfo)
+def get_deck(deck_id: str):
+    """List the saved versions of a deck."""
+    try:
+        deck_name, versions = list_versions(deck_id)
+    except DeckNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return DeckInfo(
+        deck_id=deck_id,
+        deck_name=deck_name,
+        versions=[DeckVersion(version=v, created=created, card_count=n) for v, created, n in versions],
+    )
+
+
+@app.get("/api/decks/{deck_id}/versions/{version}", response_model=DeckVersionResponse)
+def get_deck_version(deck_id: str, version: int):
+    """Load the cards of one saved version of a deck, e.g. to resume a review."""
+    try:
+        deck_name, version, cards, card_hashes = load_version(deck_id, version)
+    except DeckNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return DeckVersionResponse(
+        deck_id=deck_id, deck_name=deck_name, version=version, cards=cards, card_hashes=card_hashes
     )
+
+
+@app.post("/api/manifest", response_model=ManifestResponse)
+async def manifest(file: UploadFile, http_request: Request):
+    """Read the note GUID/checksum manifest of a previously exported .apkg."""
+    client = _admit(http_request, request_cost(size_bytes=file.size or 0))
+    try:
+        upload = await spool_upload(file, MAX_APKG_SIZE)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="File exceeds 100 MB limit")
+
+    try:
+        async with scheduler.slot(client):
+            with upload:
+                notes = await run_in_threadpool(read_manifest, upload.view)
+    except PackageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPackageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ManifestResponse(notes=[NoteChecksum(guid=g, checksum=c) for g, c in notes.items()])
+
+
+@app.post("/api/diff", response_model=DiffResponse)
+async def diff(request: DiffRequest, http_request: Request):
+    """Report which cards are new, changed or unchanged relative to a previous export."""
+    client = _admit(http_request, request_cost(
+        paragraphs=len(request.cards) + len(request.manifest),
+        images=sum(len(c.images) for c in request.cards),
+    ))
+    async with scheduler.slot(client):
+        result = await run_in_threadpool(
+            diff_cards,
+            request.cards, request.deck_name, {n.guid: n.checksum for n in request.manifest}, request.note_type,
+        )
+
+    logger.info("diff", extra={"event_data": {
+        "event": "diff",
+        "cards_submitted": len(request.cards),
+        "notes_in_manifest": len(request.manifest),
+        "new": len(result.new),
+        "changed": len(result.changed),
+        "unchanged": result.unchanged,
+        "removed": len(result.removed),
+    }})
+
+    return result
@@ -0,0 +1,218 @@
+"""Parse Markdown and HTML notes into Paragraph objects."""
+
+import re
+from html.parser import HTMLParser
+
+from models import Paragraph
+from question_detectors import bold_prefix_length
+from tables import table_to_paragraph
+
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_BOLD_LINE_RE = re.compile(r"^(\*\*|__)(.+)\1$")
+_MD_EMPHASIS_RE = re.compile(r"(\*\*|__)(.+?)\1")
+_MD_BOLD_LEAD_RE = re.compile(r"^(\*\*|__)(.+?)\1(?=\s*\S)")
+_MD_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(\s*data:image/[\w.+-]+;base64,([A-Za-z0-9+/=]+)\s*\)")
+_MD_BULLET_RE = re.compile(r"^\s*[*+]\s+")
+_MD_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+_DATA_URI_RE = re.compile(r"^data:image/[\w.+-]+;base64,([A-Za-z0-9+/=\s]+)$")
+_CSS_COLOR_RE = re.compile(r"(?:^|;)\s*color\s*:\s*(#[0-9a-fA-F]{6}|#[0-9a-fA-F]{3})\b")
+_CSS_BOLD_RE = re.compile(r"font-weight\s*:\s*(bold|[6-9]00)")
+
+
+def _split_table_row(line: str) -> list[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def parse_markdown(text: str) -> list[Paragraph]:
+    """Parse Markdown notes: ``#`` headings, whole-line ``**bold**`` questions,
+    pipe tables and base64 data-URI images."""
+    paragraphs: list[Paragraph] = []
+    table_rows: list[list[str]] = []
+
+    def flush_table() -> None:
+        if table_rows:
+            paragraphs.append(table_to_paragraph(table_rows))
+            table_rows.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("|"):
+            if not _MD_TABLE_SEPARATOR_RE.match(line):
+                table_rows.append(_split_table_row(line))
+            continue
+        flush_table()
+
+        images = _MD_IMAGE_RE.findall(line)
+        if images:
+            line = _MD_IMAGE_RE.sub("", line).strip()
+        if not line and not images:
+            continue
+
+        heading = _MD_HEADING_RE.match(line)
+        if heading:
+            paragraphs.append(Paragraph(
+                text=_MD_EMPHASIS_RE.sub(r"\2", heading.group(2)),
+                is_heading=True,
+                heading_level=1 if len(heading.group(1)) == 1 else 2,
+                images=images,
+            ))
+            continue
+
+        bold = _MD_BOLD_LINE_RE.match(line)
+        is_bold = bool(bold) and "**" not in bold.group(2) and "__" not in bold.group(2)
+        lead = None if is_bold else _MD_BOLD_LEAD_RE.match(line)
+        line = _MD_BULLET_RE.sub("- ", line)
+        paragraphs.append(Paragraph(
+            text=_MD_EMPHASIS_RE.sub(r"\2", bold.group(2) if bold else line),
+            is_bold=is_bold,
+            bold_prefix=len(lead.group(2)) if lead else 0,
+            images=images,
+        ))
+
+    flush_table()
+    return paragraphs
+
+
+class _NotesHTMLParser(HTMLParser):
+    """Collect block-level elements as Paragraphs, tracking bold and colour per character run."""
+
+    _BLOCKS = {"p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dt", "dd"}
+    # Elements that never have an end tag, so they must not go on the style stack.
+    _VOID = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "meta", "param",
+        "source", "track", "wbr",
+    }
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: list[Paragraph] = []
+        self._runs: list[tuple[str, bool, str | None]] = []
+        self._images: list[str] = []
+        self._style_stack: list[tuple[str, bool, str | None]] = []
+        self._heading: int | None = None
+        self._list_stack: list[list] = []
+        self._table: list[list[str]] | None = None
+        self._cell: list[str] | None = None
+        self._skip = 0
+
+    def _bold(self) -> bool:
+        return any(bold for _, bold, _ in self._style_stack)
+
+    def _color(self) -> str | None:
+        for _, _, color in reversed(self._style_stack):
+            if color:
+                return color
+        return None
+
+    def _flush(self) -> None:
+        text = "".join(t for t, _, _ in self._runs).strip()
+        text = re.sub(r"[ \t]+", " ", text)
+        if text or self._images:
+            visible = [(t, b, c) for t, b, c in self._runs if t.strip()]
+            color = next((c for _, _, c in visible if c), None)
+            if self._list_stack and text:
+                kind = self._list_stack[-1]
+                if kind[0] == "ol":
+                    kind[1] += 1
+                    text = f"{kind[1]}. {text}"
+                else:
+                    text = f"- {text}"
+            is_bold = bool(visible) and all(b for _, b, _ in visible) and self._heading is None
+            self.paragraphs.append(Paragraph(
+                text=text,
+                is_bold=is_bold,
+                bold_prefix=(
+                    bold_prefix_length(((t, b) for t, b, _ in self._runs), text)
+                    if not is_bold and self._heading is None and not self._list_stack else 0
+                ),
+                is_heading=self._heading is not None,
+                heading_level=self._heading,
+                text_color=color,
+                images=self._images,
+            ))
+        self._runs = []
+        self._images = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attrs = dict(attrs)
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+            return
+        if tag == "table":
+            self._flush()
+            self._table = []
+        elif self._table is not None:
+            if tag == "tr":
+                self._table.append([])
+            elif tag in ("td", "th"):
+                self._cell = []
+            return
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self._list_stack.append([tag, 0])
+        elif tag in self._BLOCKS:
+            self._flush()
+            if tag[0] == "h" and tag[1:].isdigit():
+                self._heading = 1 if tag == "h1" else 2
+        elif tag == "br":
+            self._runs.append(("\n", self._bold(), self._color()))
+        elif tag == "img":
+            m = _DATA_URI_RE.match(attrs.get("src") or "")
+            if m:
+                self._images.append(re.sub(r"\s+", "", m.group(1)))
+
+        if tag not in self._VOID:
+            style = attrs.get("style") or ""
+            color_match = _CSS_COLOR_RE.search(style)
+            color = attrs.get("color") if tag == "font" else None
+            color = (color_match.group(1) if color_match else color) or None
+            bold = tag in ("b", "strong") or bool(_CSS_BOLD_RE.search(style))
+            self._style_stack.append((tag, bold, color.lower() if color else None))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ("script", "style", "head"):
+            self._skip = max(0, self._skip - 1)
+            return
+        if tag == "table" and self._table is not None:
+            rows = [row for row in self._table if row]
+            if rows:
+                self.paragraphs.append(table_to_paragraph(rows))
+            self._table = None
+        elif self._table is not None:
+            if tag in ("td", "th") and self._cell is not None and self._table:
+                self._table[-1].append(" ".join("".join(self._cell).split()))
+                self._cell = None
+            return
+        elif tag in ("ul", "ol"):
+            self._flush()
+            if self._list_stack:
+                self._list_stack.pop()
+        elif tag in self._BLOCKS:
+            self._flush()
+            self._heading = None
+
+        for i in range(len(self._style_stack) - 1, -1, -1):
+            if self._style_stack[i][0] == tag:
+                del self._style_stack[i:]
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self._skip:
+            return
+        if self._cell is not None:
+            self._cell.append(data)
+        elif self._table is None:
+            self._runs.append((data.replace("\n", " "), self._bold(), self._color()))
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+def parse_html(text: str) -> list[Paragraph]:
+    """Parse HTML notes: h1-h6 headings, <b>/<strong> or bold-styled questions,
+    CSS/font colours, tables, lists and base64 data-URI images."""
+    parser = _NotesHTMLParser()
+    parser.feed(text)
+    parser.close()
+    return parser.paragraphs
@@ -1,6 +1,11 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+
+NoteType = Literal["basic", "reversed", "cloze"]
+DedupMode = Literal["flag", "merge"]
+DetectorName = Literal["bold", "bold-prefix", "prefix", "font-size"]
 
 
 class Paragraph(BaseModel):
@@ -13,6 +18,9 @@ class Paragraph(BaseModel):
     is_table: bool = False
     table_html: Optional[str] = None
     images: List[str] = []
+    # Length of a bold lead-in followed by plain text ("**Term:** definition"), else 0.
+    bold_prefix: int = 0
+    font_size: Optional[float] = None
 
 
 class ExtractedCard(BaseModel):
@@ -21,22 +29,138 @@ class ExtractedCard(BaseModel):
     back: str
     tags: List[str] = []
     images: List[str] = []
+    note_type: Optional[NoteType] = None
+    duplicate_of: Optional[int] = None
 
 
 class ExtractRequest(BaseModel):
-    """Request body for the /api/extract endpoint."""
+    """Request body for the /api/extract endpoint.
+
+    ``dedup`` flags near-duplicate questions (``duplicate_of``) or merges them.
+    ``tags`` keeps only cards under those tag paths (``X`` or ``X::*`` for a
+    subtree, or a glob like ``*::Drugs``). ``detectors`` picks how questions
+    are recognised (see question_detectors.py); the default is all-bold lines.
+    """
     paragraphs: List[Paragraph]
+    dedup: Optional[DedupMode] = None
+    dedup_threshold: Optional[float] = Field(None, gt=0, le=1)
+    tags: List[str] = []
+    detectors: List[DetectorName] = []
+    question_prefixes: List[str] = []
 
 
 class ExtractResponse(BaseModel):
-    """Response body for the /api/extract endpoint."""
+    """Response body for the /api/extract endpoint.
+
+    ``result_id`` identifies the indexed result for /api/results searches;
+    with a ``page_size`` only the first page of ``total`` cards is included.
+    """
     cards: List[ExtractedCard]
+    result_id: Optional[str] = None
+    total: Optional[int] = None
 
 
-class GenerateRequest(BaseModel):
-    """Request body for the /api/generate endpoint."""
+class CardPage(BaseModel):
+    """Response body for /api/results/{result_id}/cards; ``positions`` index the full result.
+
+    Cards are returned without their images, which only the extract response carries.
+    """
+    result_id: str
+    total: int
+    offset: int
+    positions: List[int]
     cards: List[ExtractedCard]
+
+
+class NoteChecksum(BaseModel):
+    """A note GUID and the checksum of its fields and tags in an exported deck."""
+    guid: str
+    checksum: str
+
+
+class ManifestResponse(BaseModel):
+    """Response body for the /api/manifest endpoint."""
+    notes: List[NoteChecksum]
+
+
+class GenerateRequest(BaseModel):
+    """Request body for the /api/generate endpoint.
+
+    Either ``cards`` or ``deck_id`` (and optionally ``version``, else the
+    latest) of a deck saved with /api/decks. ``incremental`` builds patch the
+    previous build of the same deck for the same ``result_id`` (the
+    extraction the cards came from) or ``deck_id``; without either, the deck
+    is built in full.
+    """
+    cards: List[ExtractedCard] = []
     deck_name: str = "My Deck"
     cards_original: Optional[int] = None
     cards_edited: Optional[int] = None
     cards_deleted: Optional[int] = None
+    incremental: bool = False
+    result_id: Optional[str] = Field(None, max_length=64)
+    manifest: Optional[List[NoteChecksum]] = None
+    note_type: NoteType = "basic"
+    deck_id: Optional[str] = None
+    version: Optional[int] = None
+
+
+class DiffRequest(BaseModel):
+    """Request body for the /api/diff endpoint."""
+    cards: List[ExtractedCard]
+    deck_name: str = "My Deck"
+    manifest: List[NoteChecksum]
+    note_type: NoteType = "basic"
+
+
+class DiffResponse(BaseModel):
+    """Response body for the /api/diff endpoint; new/changed are indices into the request cards."""
+    new: List[int]
+    changed: List[int]
+    unchanged: int
+    removed: List[str]
+
+
+class CardRef(BaseModel):
+    """A card already in the deck store, referenced by its content hash."""
+    hash: str
+
+
+class SaveDeckRequest(BaseModel):
+    """Request body for /api/decks: a new deck, or a new version of ``deck_id``.
+
+    Cards unchanged since a previous version can be sent as ``{"hash": ...}``.
+    """
+    deck_id: Optional[str] = None
+    deck_name: str = "My Deck"
+    cards: List[Union[ExtractedCard, CardRef]]
+
+
+class SaveDeckResponse(BaseModel):
+    """Response body for /api/decks; ``card_hashes`` line up with the request cards."""
+    deck_id: str
+    version: int
+    card_hashes: List[str]
+
+
+class DeckVersion(BaseModel):
+    """One saved snapshot of a deck."""
+    version: int
+    created: float
+    card_count: int
+
+
+class DeckInfo(BaseModel):
+    """Response body for GET /api/decks/{deck_id}."""
+    deck_id: str
+    deck_name: str
+    versions: List[DeckVersion]
+
+
+class DeckVersionResponse(BaseModel):
+    """Response body for GET /api/decks/{deck_id}/versions/{version}."""
+    deck_id: str
+    deck_name: str
+    version: int
+    cards: List[ExtractedCard]
+    card_hashes: List[str]
@@ -0,0 +1,91 @@
+"""Anki note types (Basic, Basic + Reversed, Cloze) and a cache of their genanki models.
+
+Each model is built once per process and reused by every build. Its model ID
+is derived from a hash of its configuration (fields, templates, CSS), so it
+stays the same across deploys for as long as the configuration does.
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+import genanki
+
+from stable_ids import stable_id
+
+BASIC = "basic"
+REVERSED = "reversed"
+CLOZE = "cloze"
+NOTE_TYPES = (BASIC, REVERSED, CLOZE)
+
+# Decks exported before note types existed use this ID for Basic; keep it so they update in place.
+BASIC_MODEL_ID = 1607392319
+
+CLOZE_RE = re.compile(r"\{\{c(\d+)::(.+?)\}\}", re.DOTALL)
+
+_ANSWER = '{{FrontSide}}<hr id="answer">'
+
+_CONFIGS = {
+    BASIC: {
+        "name": "Docs to Anki - Basic",
+        "fields": ["Front", "Back"],
+        "templates": [("Card 1", "{{Front}}", _ANSWER + "{{Back}}")],
+        "model_type": genanki.Model.FRONT_BACK,
+    },
+    REVERSED: {
+        "name": "Docs to Anki - Basic (and reversed card)",
+        "fields": ["Front", "Back"],
+        "templates": [
+            ("Card 1", "{{Front}}", _ANSWER + "{{Back}}"),
+            ("Card 2", "{{Back}}", _ANSWER + "{{Front}}"),
+        ],
+        "model_type": genanki.Model.FRONT_BACK,
+    },
+    CLOZE: {
+        "name": "Docs to Anki - Cloze",
+        "fields": ["Text", "Back Extra"],
+        "templates": [("Cloze", "{{cloze:Text}}", "{{cloze:Text}}<br>{{Back Extra}}")],
+        "model_type": genanki.Model.CLOZE,
+    },
+}
+
+_models: dict[tuple[str, str], genanki.Model] = {}
+_models_lock = threading.Lock()
+
+
+def _config_hash(note_type: str, css: str) -> str:
+    config = dict(_CONFIGS[note_type], css=css)
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_model(note_type: str, css: str) -> genanki.Model:
+    """Return the cached genanki model for a note type, building it on first use."""
+    model = _models.get((note_type, css))
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get((note_type, css))
+        if model is None:
+            config = _CONFIGS[note_type]
+            model = genanki.Model(
+                BASIC_MODEL_ID if note_type == BASIC else stable_id(_config_hash(note_type, css)),
+                config["name"],
+                fields=[{"name": name} for name in config["fields"]],
+                templates=[
+                    {"name": name, "qfmt": qfmt, "afmt": afmt} for name, qfmt, afmt in config["templates"]
+                ],
+                css=css,
+                model_type=config["model_type"],
+            )
+            _models[(note_type, css)] = model
+        return model
+
+
+def resolve_note_type(note_type: str | None, default: str, front: str) -> str:
+    """Pick a card's note type: its own, else the deck default; cloze needs cloze markers."""
+    chosen = note_type or default
+    if chosen == CLOZE and not CLOZE_RE.search(front):
+        return BASIC
+    return chosen
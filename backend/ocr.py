@@ -0,0 +1,254 @@
+"""OCR fallback for scanned PDF pages using Tesseract through PyMuPDF.
+
+Pages are rendered in the calling process a few at a time, OCR'd in a
+bounded process pool with a per-page timeout, and the recognised lines are
+cached by a hash of the page image so a repeat upload of the same scan skips
+OCR entirely.
+
+A job that times out cannot be cancelled, so its pool is retired rather than
+killed: new work goes to a fresh pool, and the old one's processes are
+terminated once every job still wanted from it has finished. Other
+requests' pages are unaffected.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+
+OCR_ENABLED = os.environ.get("OCR_ENABLED", "1") == "1"
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "2"))
+OCR_PAGE_TIMEOUT = float(os.environ.get("OCR_PAGE_TIMEOUT", "30"))
+OCR_DPI = 300
+OCR_LANGUAGE = os.environ.get("OCR_LANGUAGE", "eng")
+OCR_CACHE_SIZE = 256
+
+# A span counts as bold when its ink density is this much above the page median.
+BOLD_INK_RATIO = 1.3
+
+_DARK = bytes(1 if b < 128 else 0 for b in range(256))
+
+_pool: "_OCRPool | None" = None
+_pool_lock = threading.Lock()
+_cache: "OrderedDict[str, list[list[dict]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_tesseract: bool | None = None
+
+logger = logging.getLogger("docs-anki")
+
+
+def tesseract_available() -> bool:
+    """Check once whether PyMuPDF can find Tesseract language data."""
+    global _tesseract
+    if _tesseract is None:
+        try:
+            fitz.get_tessdata()
+            _tesseract = True
+        except Exception:
+            _tesseract = False
+    return _tesseract
+
+
+def ocr_enabled() -> bool:
+    return OCR_ENABLED and tesseract_available()
+
+
+class _OCRPool:
+    """An executor plus the jobs still wanted from it, so it can be shut down once they are done."""
+
+    def __init__(self, executor: Executor) -> None:
+        self.executor = executor
+        self._wanted: set[Future] = set()
+        self._retired = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args) -> Future:
+        future = self.executor.submit(fn, *args)
+        with self._lock:
+            self._wanted.add(future)
+        future.add_done_callback(self.abandon)
+        return future
+
+    def abandon(self, future: Future) -> None:
+        """Stop waiting for ``future`` (it finished or timed out)."""
+        with self._lock:
+            self._wanted.discard(future)
+        self._close_if_idle()
+
+    def retire(self) -> None:
+        """Take no more work, and close once no wanted job is left."""
+        with self._lock:
+            self._retired = True
+        self._close_if_idle()
+
+    def _close_if_idle(self) -> None:
+        with self._lock:
+            if not self._retired or self._wanted or self._closed:
+                return
+            self._closed = True
+        # Only abandoned (timed-out) jobs can still be running; kill them with their processes.
+        processes = getattr(self.executor, "_processes", None) or {}
+        for process in list(processes.values()):
+            process.terminate()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_pool() -> _OCRPool:
+    return _OCRPool(ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn")))
+
+
+def _get_pool() -> _OCRPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool()
+        return _pool
+
+
+def _retire_pool(pool: _OCRPool) -> None:
+    """Send new work to a fresh pool and close ``pool`` once its remaining jobs are done."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.retire()
+
+
+def _ocr_image(png: bytes, dpi: int, language: str) -> list[list[dict]]:
+    """Worker: OCR a rendered page image and return its text lines as span dicts."""
+    img = fitz.open("png", png)
+    pdf = fitz.open("pdf", img.convert_to_pdf())
+    page = pdf[0]
+    textpage = page.get_textpage_ocr(dpi=dpi, language=language, full=True)
+    lines = []
+    for block in page.get_text("dict", textpage=textpage).get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [
+                {key: span[key] for key in ("text", "bbox", "flags", "font", "color", "size")}
+                for span in line.get("spans", [])
+                if span.get("text", "").strip()
+            ]
+            if spans:
+                lines.append(spans)
+    return lines
+
+
+def _ink_density(pix: fitz.Pixmap, bbox: tuple, scale: float) -> float:
+    """Fraction of dark pixels inside a bbox (in PDF points) of a grayscale pixmap."""
+    x0 = max(0, int(bbox[0] * scale))
+    x1 = min(pix.width, int(bbox[2] * scale))
+    y0 = max(0, int(bbox[1] * scale))
+    y1 = min(pix.height, int(bbox[3] * scale))
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    samples = pix.samples
+    stride = pix.stride
+    dark = sum(samples[y * stride + x0:y * stride + x1].translate(_DARK).count(1) for y in range(y0, y1))
+    return dark / ((x1 - x0) * (y1 - y0))
+
+
+def infer_bold(lines: list[list[dict]], pix: fitz.Pixmap, dpi: int) -> None:
+    """Mark spans as bold (flag 16) when their stroke weight is well above the page's typical text."""
+    scale = dpi / 72
+    spans = [span for line in lines for span in line]
+    densities = [_ink_density(pix, span["bbox"], scale) for span in spans]
+    typical = statistics.median([d for d in densities if d > 0] or [0])
+    if not typical:
+        return
+    for span, density in zip(spans, densities):
+        if density > typical * BOLD_INK_RATIO:
+            span["flags"] = span.get("flags", 0) | 16
+
+
+def _cache_get(key: str) -> list[list[dict]] | None:
+    with _cache_lock:
+        lines = _cache.get(key)
+        if lines is not None:
+            _cache.move_to_end(key)
+        return lines
+
+
+def _cache_put(key: str, lines: list[list[dict]]) -> None:
+    with _cache_lock:
+        _cache[key] = lines
+        while len(_cache) > OCR_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _submit(png: bytes) -> tuple[_OCRPool, Future]:
+    pool = _get_pool()
+    try:
+        return pool, pool.submit(_ocr_image, png, OCR_DPI, OCR_LANGUAGE)
+    except RuntimeError:
+        # Another request's timeout retired the pool and it has already shut down.
+        _retire_pool(pool)
+        pool = _get_pool()
+        return pool, pool.submit(_ocr_image, png, OCR_DPI, OCR_LANGUAGE)
+
+
+def _wait(number: int, png: bytes, pool: _OCRPool, future: Future) -> list[list[dict]] | None:
+    """Wait for one page's OCR; a broken pool (a worker died) is replaced and the page retried once."""
+    for attempt in range(2):
+        try:
+            return future.result(timeout=OCR_PAGE_TIMEOUT)
+        except FutureTimeout:
+            pool.abandon(future)
+            _retire_pool(pool)
+            error = f"timed out after {OCR_PAGE_TIMEOUT:g} s"
+            break
+        except BrokenProcessPool:
+            _retire_pool(pool)
+            error = "OCR worker died"
+            if attempt == 0:
+                pool, future = _submit(png)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            break
+    logger.warning("ocr_failed", extra={"event_data": {"event": "ocr_failed", "page": number + 1, "error": error}})
+    return None
+
+
+def ocr_pages(pages: list[fitz.Page]) -> tuple[dict[int, list[list[dict]]], list[int]]:
+    """OCR scanned pages; returns page number → lines of spans (bold inferred), and the pages that failed.
+
+    Pages are rendered and submitted in a window of ``OCR_WORKERS``, so only
+    the in-flight pages' images are held in memory. Failed pages (timeouts,
+    errors) are logged and left out of the lines.
+    """
+    results: dict[int, list[list[dict]]] = {}
+    failed: list[int] = []
+    in_flight: deque = deque()
+
+    def finish(number, key, pix, png, pool, future) -> None:
+        lines = _wait(number, png, pool, future)
+        if lines is None:
+            failed.append(number)
+            return
+        infer_bold(lines, pix, OCR_DPI)
+        _cache_put(key, lines)
+        results[number] = lines
+
+    for page in pages:
+        pix = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+        key = hashlib.sha256(pix.samples).hexdigest()
+        cached = _cache_get(key)
+        if cached is not None:
+            results[page.number] = cached
+            continue
+        png = pix.tobytes("png")
+        in_flight.append((page.number, key, pix, png, *_submit(png)))
+        if len(in_flight) >= OCR_WORKERS:
+            finish(*in_flight.popleft())
+
+    while in_flight:
+        finish(*in_flight.popleft())
+
+    return results, failed
@@ -0,0 +1,220 @@
+"""Size and complexity limits for JSON request bodies.
+
+``PayloadGuardMiddleware`` scans the body incrementally as it arrives and
+answers 413 as soon as a limit is crossed (too many paragraphs/cards, too
+much text, an oversized image, too much image data, or nesting too deep),
+before FastAPI parses the JSON or pydantic builds any models. The scanner
+only tracks structure and string lengths, so its own memory use is constant.
+"""
+
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+
+from uploads import reject_oversized
+
+_STRING_SPECIAL_RE = re.compile(rb'["\\]')
+_WHITESPACE = frozenset(b" \t\r\n")
+_KEY_LIMIT = 64
+
+
+@dataclass(frozen=True)
+class PayloadLimits:
+    """Caps for one endpoint; ``items_key`` names the top-level list to count."""
+    items_key: str
+    max_items: int = int(os.environ.get("MAX_PAYLOAD_ITEMS", "20000"))
+    max_body_bytes: int = int(os.environ.get("MAX_PAYLOAD_BYTES", str(64 * 1024 * 1024)))
+    max_text_bytes: int = int(os.environ.get("MAX_PAYLOAD_TEXT_BYTES", str(8 * 1024 * 1024)))
+    max_image_bytes: int = int(os.environ.get("MAX_PAYLOAD_IMAGE_BYTES", str(8 * 1024 * 1024)))
+    max_total_image_bytes: int = int(os.environ.get("MAX_PAYLOAD_TOTAL_IMAGE_BYTES", str(48 * 1024 * 1024)))
+    max_depth: int = 16
+
+
+class PayloadTooLargeError(ValueError):
+    """Raised by the scanner when a body crosses one of its limits."""
+
+
+class _Frame:
+    __slots__ = ("is_object", "key", "expect_key", "expect_value")
+
+    def __init__(self, is_object: bool, key: str | None) -> None:
+        self.is_object = is_object
+        # For arrays: the key the array is stored under; for objects: the current member key.
+        self.key = key
+        self.expect_key = is_object
+        self.expect_value = not is_object
+
+
+class JSONBodyScanner:
+    """Incremental JSON tokenizer that counts items, text and image bytes against ``PayloadLimits``.
+
+    It does not validate JSON; malformed bodies are left for FastAPI to reject.
+    """
+
+    def __init__(self, limits: PayloadLimits) -> None:
+        self.limits = limits
+        self.body_bytes = 0
+        self.items = 0
+        self.text_bytes = 0
+        self.image_bytes = 0
+        self._stack: list[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._string_is_image = False
+        self._string_bytes = 0
+        self._key = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        self.body_bytes += len(chunk)
+        if self.body_bytes > self.limits.max_body_bytes:
+            raise PayloadTooLargeError("Request body too large")
+
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._in_string:
+                i = self._scan_string(chunk, i)
+                continue
+            c = chunk[i]
+            i += 1
+            if c in _WHITESPACE:
+                continue
+            if c == 0x22:  # "
+                self._start_string()
+            elif c == 0x7B or c == 0x5B:  # { [
+                self._start_value()
+                self._push(c == 0x7B)
+            elif c == 0x7D or c == 0x5D:  # } ]
+                if self._stack:
+                    self._stack.pop()
+            elif c == 0x3A:  # :
+                if self._stack and self._stack[-1].is_object:
+                    self._stack[-1].expect_value = True
+            elif c == 0x2C:  # ,
+                if self._stack:
+                    frame = self._stack[-1]
+                    frame.expect_key = frame.is_object
+                    frame.expect_value = not frame.is_object
+            else:
+                self._start_value()
+
+    def _push(self, is_object: bool) -> None:
+        parent = self._stack[-1] if self._stack else None
+        key = parent.key if parent is not None and parent.is_object else None
+        self._stack.append(_Frame(is_object, key))
+        if len(self._stack) > self.limits.max_depth:
+            raise PayloadTooLargeError("Request body is nested too deeply")
+
+    def _start_value(self) -> None:
+        """Note that a value begins in the current container (counting top-level items)."""
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        if not frame.expect_value:
+            return
+        frame.expect_value = False
+        if not frame.is_object and len(self._stack) == 2 and frame.key == self.limits.items_key:
+            self.items += 1
+            if self.items > self.limits.max_items:
+                raise PayloadTooLargeError(f"Too many {self.limits.items_key}")
+
+    def _start_string(self) -> None:
+        frame = self._stack[-1] if self._stack else None
+        self._string_is_key = frame is not None and frame.is_object and frame.expect_key
+        if self._string_is_key:
+            frame.expect_key = False
+            self._key.clear()
+        else:
+            self._start_value()
+        self._string_is_image = (
+            not self._string_is_key and frame is not None and not frame.is_object and frame.key == "images"
+        )
+        self._string_bytes = 0
+        self._in_string = True
+
+    def _scan_string(self, chunk: bytes, i: int) -> int:
+        """Consume string content from ``chunk[i:]``; returns the index after what was consumed."""
+        if self._escape:
+            self._escape = False
+            self._count(chunk, i, i + 1)
+            return i + 1
+        match = _STRING_SPECIAL_RE.search(chunk, i)
+        end = match.start() if match else len(chunk)
+        self._count(chunk, i, end)
+        if match is None:
+            return end
+        if chunk[end] == 0x5C:  # backslash
+            self._escape = True
+            self._count(chunk, end, end + 1)
+            return end + 1
+        self._end_string()
+        return end + 1
+
+    def _count(self, chunk: bytes, start: int, end: int) -> None:
+        size = end - start
+        self._string_bytes += size
+        if self._string_is_key:
+            if len(self._key) < _KEY_LIMIT:
+                self._key += chunk[start:min(end, start + _KEY_LIMIT - len(self._key))]
+        elif self._string_is_image:
+            self.image_bytes += size
+            if self._string_bytes > self.limits.max_image_bytes:
+                raise PayloadTooLargeError("Image too large")
+            if self.image_bytes > self.limits.max_total_image_bytes:
+                raise PayloadTooLargeError("Too much image data")
+        else:
+            self.text_bytes += size
+            if self.text_bytes > self.limits.max_text_bytes:
+                raise PayloadTooLargeError("Too much text")
+
+    def _end_string(self) -> None:
+        self._in_string = False
+        if self._string_is_key and self._stack:
+            self._stack[-1].key = self._key.decode("utf-8", errors="replace")
+
+
+class PayloadGuardMiddleware:
+    """ASGI middleware that scans JSON bodies on the given paths and rejects them early with 413.
+
+    The accepted body is buffered as it was received and replayed to the app.
+    """
+
+    def __init__(self, app, limits: dict[str, PayloadLimits]) -> None:
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limits = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limits is None or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers", [])).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limits.max_body_bytes:
+            await reject_oversized(send)
+            return
+
+        scanner = JSONBodyScanner(limits)
+        messages = deque()
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                messages.append(message)
+                break
+            try:
+                scanner.feed(message.get("body", b""))
+            except PayloadTooLargeError as e:
+                await reject_oversized(send, str(e))
+                return
+            messages.append(message)
+            if not message.get("more_body", False):
+                break
+
+        async def replay():
+            if messages:
+                return messages.popleft()
+            return await receive()
+
+        await self.app(scope, replay, send)
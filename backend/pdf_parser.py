@@ -1,14 +1,26 @@
 """Parse PDF files into Paragraph objects using PyMuPDF."""
 
+import base64
 import colorsys
 import re
+from typing import Optional, Sequence
 
 import fitz
 
+import ocr
+from layout import reading_order
 from models import Paragraph
+from qa_parser import sanitize_tag, tag_matches
+from tables import table_to_paragraph
 
 _BULLET_RE = re.compile(r"^(\d{1,2}[.)]\s|[-•·–—]\s)")
 _LONE_BULLET_RE = re.compile(r"^[-•·–—]$|^\d{1,2}[.)]$")
+_PAGE_RANGE_RE = re.compile(r"^\s*(\d*)\s*(-?)\s*(\d*)\s*$")
+
+# A page needs at least this many horizontal/vertical rules before we pay for find_tables().
+_MIN_RULING_LINES = 4
+# Rectangles thinner than this (in points) are drawn rules; wider ones are backgrounds or highlights.
+_MAX_RULE_THICKNESS = 2
 
 
 def _rgb_to_hex(color: int) -> str:
@@ -48,11 +60,17 @@ def _detect_heading_color(hex_color: str) -> int | None:
     return None
 
 
+def _clean_line(text: str) -> str:
+    return re.sub(r" {2,}", " ", text.strip().replace("\u200b", " "))
+
+
 def _line_to_paragraph(spans: list[dict]) -> Paragraph | None:
     """Convert a list of spans from one text line into a Paragraph."""
     text_parts = []
     all_bold = True
+    bold_lead_parts = None
     colors = set()
+    font_size = 0.0
 
     for span in spans:
         text = span.get("text", "")
@@ -60,16 +78,22 @@ def _line_to_paragraph(spans: list[dict]) -> Paragraph | None:
             continue
         if text_parts and text_parts[-1] and not text_parts[-1][-1].isspace() and not text[0].isspace():
             text_parts.append(" ")
-        text_parts.append(text)
         if not _is_bold_span(span):
+            if all_bold:
+                bold_lead_parts = len(text_parts)
             all_bold = False
+        text_parts.append(text)
         colors.add(_rgb_to_hex(span.get("color", 0)))
+        font_size = max(font_size, span.get("size", 0.0))
 
-    full_text = "".join(text_parts).strip()
-    full_text = full_text.replace("\u200b", " ")
-    full_text = re.sub(r" {2,}", " ", full_text)
+    full_text = _clean_line("".join(text_parts))
     if not full_text:
         return None
+    bold_prefix = 0
+    if bold_lead_parts:
+        lead = _clean_line("".join(text_parts[:bold_lead_parts]))
+        if lead and full_text.startswith(lead):
+            bold_prefix = len(lead)
 
     text_color = None
     heading_level = None
@@ -90,6 +114,8 @@ def _line_to_paragraph(spans: list[dict]) -> Paragraph | None:
         is_heading=is_heading,
         text_color=text_color,
         heading_level=heading_level,
+        bold_prefix=0 if is_heading else bold_prefix,
+        font_size=round(font_size, 1) or None,
     )
 
 
@@ -100,7 +126,7 @@ def _merge_continuations(paragraphs: list[Paragraph]) -> list[Paragraph]:
     merged = [paragraphs[0]]
     for para in paragraphs[1:]:
         prev = merged[-1]
-        if not para.text:
+        if not para.text or para.is_table or prev.is_table:
             merged.append(para)
             continue
         if (_LONE_BULLET_RE.match(prev.text)
@@ -108,7 +134,7 @@ def _merge_continuations(paragraphs: list[Paragraph]) -> list[Paragraph]:
                 and not _LONE_BULLET_RE.match(para.text)):
             prev.text = prev.text + " " + para.text.lstrip()
             prev.is_bold = False
-        elif (not para.is_bold and not para.is_heading
+        elif (not para.is_bold and not para.is_heading and not para.bold_prefix
                 and not prev.is_bold and not prev.is_heading
                 and _BULLET_RE.match(prev.text)
                 and not _BULLET_RE.match(para.text)
@@ -122,48 +148,274 @@ def _merge_continuations(paragraphs: list[Paragraph]) -> list[Paragraph]:
     return merged
 
 
-def _extract_images(page: fitz.Page) -> list[str]:
-    """Extract embedded images from a page as base64 strings."""
-    import base64
+def _xref_to_base64(doc: fitz.Document, xref: int) -> str | None:
+    """Extract an embedded image by xref as a base64 PNG, or None if it can't be decoded."""
+    try:
+        pix = fitz.Pixmap(doc, xref)
+        if pix.n > 4:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        return base64.b64encode(pix.tobytes("png")).decode("ascii")
+    except Exception:
+        return None
+
+
+def _extract_images(page: fitz.Page, cache: dict[int, str | None]) -> list[tuple[fitz.Rect, Paragraph]]:
+    """Extract embedded images with their position on the page.
 
+    ``cache`` maps xref to its encoded image for the whole document, so an
+    image repeated on many pages (e.g. a logo) is only decoded once.
+    """
     images = []
-    for img_info in page.get_images(full=True):
-        xref = img_info[0]
-        try:
-            pix = fitz.Pixmap(page.parent, xref)
-            if pix.n > 4:
-                pix = fitz.Pixmap(fitz.csRGB, pix)
-            img_bytes = pix.tobytes("png")
-            images.append(base64.b64encode(img_bytes).decode("ascii"))
-        except Exception:
+    seen: set[int] = set()
+    for info in page.get_image_info(xrefs=True):
+        xref = info.get("xref", 0)
+        if not xref or xref in seen:
             continue
+        seen.add(xref)
+        if xref not in cache:
+            cache[xref] = _xref_to_base64(page.parent, xref)
+        if cache[xref]:
+            images.append((fitz.Rect(info["bbox"]), Paragraph(text="", images=[cache[xref]])))
     return images
 
 
-def parse_pdf(pdf_bytes: bytes) -> list[Paragraph]:
-    """Parse a PDF file into a list of Paragraph objects with formatting metadata."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    paragraphs: list[Paragraph] = []
+def _count_ruling_lines(page: fitz.Page) -> int:
+    """Count horizontal/vertical line segments and thin rectangles drawn on a page."""
+    count = 0
+    for path in page.get_cdrawings():
+        for item in path.get("items", []):
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                if abs(x0 - x1) < 1 or abs(y0 - y1) < 1:
+                    count += 1
+            elif item[0] == "re":
+                x0, y0, x1, y1 = item[1]
+                if min(abs(x1 - x0), abs(y1 - y0)) < _MAX_RULE_THICKNESS:
+                    count += 1
+        if count >= _MIN_RULING_LINES:
+            break
+    return count
+
+
+def _extract_tables(page: fitz.Page) -> list[tuple[fitz.Rect, Paragraph]]:
+    """Detect ruled tables on a page; skips pages without enough ruling lines."""
+    if _count_ruling_lines(page) < _MIN_RULING_LINES:
+        return []
+
+    tables = []
+    for table in page.find_tables(strategy="lines").tables:
+        rows = table.extract()
+        if len(rows) < 2 or max(len(row) for row in rows) < 2:
+            continue
+        tables.append((fitz.Rect(table.bbox), table_to_paragraph(rows)))
+    return tables
 
-    for page in doc:
-        page_dict = page.get_text("dict")
 
-        for block in page_dict.get("blocks", []):
-            if block.get("type") != 0:
-                continue
+def _in_any(rect: fitz.Rect, regions: list[fitz.Rect]) -> bool:
+    """Check whether the centre of a rect falls inside any of the regions."""
+    cx = (rect.x0 + rect.x1) / 2
+    cy = (rect.y0 + rect.y1) / 2
+    return any(r.x0 <= cx <= r.x1 and r.y0 <= cy <= r.y1 for r in regions)
+
 
-            for line in block.get("lines", []):
-                spans = line.get("spans", [])
-                if not spans:
-                    continue
+def _insert_by_y(items: list[tuple[fitz.Rect, Paragraph]], rect: fitz.Rect, para: Paragraph) -> None:
+    """Insert a positioned paragraph before the first text line that starts below it."""
+    pos = next((i for i, (r, _) in enumerate(items) if r.y0 >= rect.y0), len(items))
+    items.insert(pos, (rect, para))
+
+
+def _text_lines(page: fitz.Page) -> list[list[dict]]:
+    """Return the spans of every text line on a page, in PyMuPDF's native order."""
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        for line in block.get("lines", []):
+            spans = line.get("spans", [])
+            if spans:
+                lines.append(spans)
+    return lines
+
+
+def _page_paragraphs(
+    page: fitz.Page,
+    image_cache: dict[int, str | None],
+    ocr_lines: list[list[dict]] | None = None,
+) -> list[Paragraph]:
+    """Convert one page into paragraphs in reading order, with tables and images where they appear.
+
+    For a scanned page, ``ocr_lines`` replaces the (empty) text layer and the
+    scan images themselves are dropped.
+    """
+    if ocr_lines is not None:
+        tables: list[tuple[fitz.Rect, Paragraph]] = []
+        lines = ocr_lines
+    else:
+        tables = _extract_tables(page)
+        lines = _text_lines(page)
+    table_rects = [rect for rect, _ in tables]
+    items: list[tuple[fitz.Rect, Paragraph]] = []
+
+    for spans in lines:
+        rect = fitz.Rect(spans[0]["bbox"])
+        for span in spans[1:]:
+            rect |= span["bbox"]
+        if table_rects and _in_any(rect, table_rects):
+            continue
 
-                para = _line_to_paragraph(spans)
-                if para:
-                    paragraphs.append(para)
+        para = _line_to_paragraph(spans)
+        if para:
+            items.append((rect, para))
 
-        page_images = _extract_images(page)
-        if page_images:
-            paragraphs.append(Paragraph(text="", images=page_images))
+    positioned = tables if ocr_lines is not None else tables + _extract_images(page, image_cache)
+    for rect, para in positioned:
+        _insert_by_y(items, rect, para)
 
-    doc.close()
-    return _merge_continuations(paragraphs)
+    order = reading_order([tuple(rect) for rect, _ in items], page.rect.width)
+    return [items[i][1] for i in order]
+
+
+def _is_scanned(paragraphs: list[Paragraph]) -> bool:
+    """A page with images but no text at all is most likely a scan."""
+    return bool(paragraphs) and not any(p.text for p in paragraphs)
+
+
+class InvalidPageRangeError(ValueError):
+    """Raised when a page range like ``1-5,8`` cannot be parsed."""
+
+
+def parse_page_ranges(spec: str, page_count: int) -> list[int]:
+    """Turn a 1-based, inclusive range list like ``1-5,8,20-`` into sorted 0-based page numbers.
+
+    Pages past the end of the document are ignored.
+    """
+    pages: set[int] = set()
+    for part in spec.split(","):
+        m = _PAGE_RANGE_RE.match(part)
+        if not m or not (m.group(1) or m.group(3)) or (not m.group(2) and m.group(3)):
+            raise InvalidPageRangeError(f"Invalid page range: {part.strip()!r}")
+        start = int(m.group(1)) if m.group(1) else 1
+        end = int(m.group(3)) if m.group(3) else (page_count if m.group(2) else start)
+        if start < 1 or end < start:
+            raise InvalidPageRangeError(f"Invalid page range: {part.strip()!r}")
+        pages.update(range(start - 1, min(end, page_count)))
+    return sorted(pages)
+
+
+def outline_pages(toc: list, page_count: int, patterns: Sequence[str]) -> Optional[set[int]]:
+    """0-based pages spanned by outline (TOC) sections whose tag path matches ``patterns``.
+
+    Section titles become tag paths the way headings do (level 1 and 2). A
+    section runs from its page to the page where the next section at the same
+    or a higher level starts, inclusive, since that one may start mid-page.
+    Returns None when there is no outline or a pattern matches none of it, so
+    the caller falls back to parsing every page.
+    """
+    entries = []
+    titles: list[str] = []
+    for level, title, page, *_ in toc:
+        titles = titles[:level - 1] + [sanitize_tag(title)]
+        entries.append((level, "::".join(titles[:2]), page - 1))
+    if not entries:
+        return None
+
+    selected: set[int] = set()
+    for pattern in patterns:
+        base = pattern[:-3] if pattern.endswith("::*") else pattern
+        matches = [i for i, (_, path, _) in enumerate(entries) if tag_matches(path, pattern)]
+        if not matches:
+            # The outline may stop above the requested depth: use the enclosing section.
+            matches = [i for i, (_, path, _) in enumerate(entries) if base.startswith(path + "::")]
+        if not matches:
+            return None
+        for i in matches:
+            level, _, start = entries[i]
+            if start < 0:
+                continue
+            end = next((p for lvl, _, p in entries[i + 1:] if lvl <= level and p >= 0), page_count)
+            selected.update(range(start, min(max(end, start), page_count - 1) + 1))
+    return selected
+
+
+def _section_context(doc: fitz.Document, toc: list, start: int, end: int) -> list[Paragraph]:
+    """Headings in effect at the top of page ``end`` that were on skipped pages ``start`` to ``end - 1``.
+
+    Taken from the outline when the PDF has one, otherwise from the coloured
+    headings on those pages, read backwards up to the nearest level-1 heading.
+    Returned as heading paragraphs, so ``extract_cards`` tags the next page's
+    cards with their full section path.
+    """
+    if toc:
+        headings = [(level, title) for level, title, page, *_ in toc if level <= 2 and start <= page - 1 < end]
+    else:
+        headings = []
+        for n in range(end - 1, start - 1, -1):
+            paras = (_line_to_paragraph(spans) for spans in _text_lines(doc[n]))
+            page_headings = [(p.heading_level, p.text) for p in paras if p and p.heading_level]
+            headings[:0] = page_headings
+            if any(level == 1 for level, _ in page_headings):
+                break
+
+    context: list[Paragraph] = []
+    for level, title in headings:
+        if level == 1:
+            context = []
+        else:
+            context = [p for p in context if p.heading_level == 1]
+        context.append(Paragraph(text=title, is_heading=True, heading_level=level))
+    return context
+
+
+def parse_pdf(
+    pdf_bytes: bytes | memoryview, page_range: Optional[str] = None, tags: Sequence[str] = ()
+) -> list[Paragraph]:
+    """Parse a PDF file into a list of Paragraph objects with formatting metadata.
+
+    See ``parse_pdf_with_failures``.
+    """
+    return parse_pdf_with_failures(pdf_bytes, page_range, tags)[0]
+
+
+def parse_pdf_with_failures(
+    pdf_bytes: bytes | memoryview, page_range: Optional[str] = None, tags: Sequence[str] = ()
+) -> tuple[list[Paragraph], list[int]]:
+    """Parse a PDF, also returning the 0-based numbers of scanned pages whose OCR failed.
+
+    ``page_range`` (e.g. ``"1-5,8"``) limits parsing to those pages. ``tags``
+    (e.g. ``["Pharmacology::*"]``) limits it to the pages of matching outline
+    sections when the PDF has an outline; cards still need filtering by tag
+    afterwards. Cards after skipped pages keep the section headings those
+    pages set. Scanned pages (images but no text layer) go through the OCR
+    fallback when Tesseract is available; a page whose OCR fails keeps its
+    scan image.
+    """
+    ocr_failures: list[int] = []
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        numbers = range(doc.page_count)
+        if page_range:
+            numbers = parse_page_ranges(page_range, doc.page_count)
+        toc = doc.get_toc()
+        if tags:
+            sections = outline_pages(toc, doc.page_count, tags)
+            if sections is not None:
+                numbers = [n for n in numbers if n in sections]
+
+        image_cache: dict[int, str | None] = {}
+        pages = {n: _page_paragraphs(doc[n], image_cache) for n in numbers}
+
+        scanned = [doc[n] for n, paras in pages.items() if _is_scanned(paras)]
+        if scanned and ocr.ocr_enabled():
+            recognised, ocr_failures = ocr.ocr_pages(scanned)
+            for number, lines in recognised.items():
+                pages[number] = _page_paragraphs(doc[number], image_cache, ocr_lines=lines)
+
+        # After skipped pages, restore the section headings they would have set.
+        previous = -1
+        for number, paras in pages.items():
+            if number > previous + 1 and not (paras and paras[0].heading_level == 1):
+                pages[number] = _section_context(doc, toc, previous + 1, number) + paras
+            previous = number
+    finally:
+        doc.close()
+    return _merge_continuations([para for paras in pages.values() for para in paras]), ocr_failures
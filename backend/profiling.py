@@ -0,0 +1,239 @@
+"""Opt-in, admin-gated profiling of individual requests.
+
+Profiling is off unless ``PROFILE_TOKEN`` is set. A request to a profiled
+endpoint that sends that token in the ``X-Profile-Token`` header runs its
+parsing, extraction or build work under cProfile; the stats are saved under
+``PROFILE_DIR`` with a structural summary of the input (page, span, line and
+image counts, with text and image content reduced to hashes), so a slow
+document can be investigated without keeping the document. Other requests
+only pay for one header lookup.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Mapping, Optional
+
+import fitz
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "anki-scribe-profiles"))
+MAX_PROFILES = int(os.environ.get("MAX_PROFILES", "100"))
+PROFILE_HEADER = "x-profile-token"
+
+_TOP_FUNCTIONS = 30
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Only one cProfile profiler can be active per process on newer Pythons, and
+# profiled requests are rare, so they take turns.
+_profiler_lock = threading.Lock()
+
+
+class ProfileNotFoundError(LookupError):
+    """Raised when a saved profile does not exist."""
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """True when profiling is enabled and ``token`` is the admin token."""
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _digest(data: bytes | str) -> str:
+    """Keyed hash, so short texts cannot be recovered by hashing guesses without the admin token."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hmac.new(PROFILE_TOKEN.encode("utf-8"), data, hashlib.sha256).hexdigest()[:16]
+
+
+class RequestProfile:
+    """cProfile stats and an input summary for one profiled request."""
+
+    def __init__(self, endpoint: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.summary: dict[str, Any] = {}
+        self.started = time.time()
+        self._profiler = cProfile.Profile()
+
+    def run(self, fn: Callable, *args):
+        """Call ``fn(*args)`` under the profiler, in the calling thread."""
+        with _profiler_lock:
+            self._profiler.enable()
+            try:
+                return fn(*args)
+            finally:
+                self._profiler.disable()
+
+    def _top_functions(self) -> list[dict[str, Any]]:
+        if not self._profiler.getstats():
+            return []
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        top = []
+        for func in stats.fcn_list[:_TOP_FUNCTIONS]:
+            _, ncalls, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            top.append({
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": ncalls,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            })
+        return top
+
+    def save(self) -> str:
+        """Write the stats (``<id>.prof``, readable with pstats/snakeviz) and metadata; returns the ID."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self._profiler.dump_stats(os.path.join(PROFILE_DIR, f"{self.id}.prof"))
+        meta = {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "created": self.started,
+            "duration": round(time.time() - self.started, 6),
+            "summary": self.summary,
+            "top": self._top_functions(),
+        }
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.json"), "w") as f:
+            json.dump(meta, f)
+        _prune()
+        return self.id
+
+
+def start(endpoint: str, headers: Mapping[str, str]) -> Optional[RequestProfile]:
+    """Begin profiling a request if profiling is enabled and it carries the admin token."""
+    if not PROFILE_TOKEN:
+        return None
+    if not is_admin(headers.get(PROFILE_HEADER)):
+        return None
+    return RequestProfile(endpoint)
+
+
+def call(profile: Optional[RequestProfile], fn: Callable, *args):
+    """Call ``fn(*args)``, under ``profile`` when there is one."""
+    if profile is None:
+        return fn(*args)
+    return profile.run(fn, *args)
+
+
+def _prune() -> None:
+    """Delete the oldest profiles beyond ``MAX_PROFILES``."""
+    metas = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in metas[:max(0, len(metas) - MAX_PROFILES)]:
+        profile_id = entry.name[:-5]
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _path(profile_id: str, suffix: str) -> str:
+    path = os.path.join(PROFILE_DIR, profile_id + suffix)
+    if not _PROFILE_ID_RE.match(profile_id) or not os.path.exists(path):
+        raise ProfileNotFoundError(f"Profile {profile_id} not found")
+    return path
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """Metadata of saved profiles, newest first, without their function tables."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta.pop("top", None)
+        profiles.append(meta)
+    return sorted(profiles, key=lambda meta: meta["created"], reverse=True)
+
+
+def load_profile(profile_id: str) -> dict[str, Any]:
+    with open(_path(profile_id, ".json")) as f:
+        return json.load(f)
+
+
+def stats_path(profile_id: str) -> str:
+    """Path of a profile's raw cProfile stats file."""
+    return _path(profile_id, ".prof")
+
+
+def summarize_pdf(pdf_bytes: bytes | memoryview) -> dict[str, Any]:
+    """Structure of a PDF without its content: per-page block, line, span and image counts."""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        pages = []
+        for page in doc:
+            blocks = page.get_text("dict")["blocks"]
+            text_blocks = [b for b in blocks if b.get("type") == 0]
+            lines = [line for b in text_blocks for line in b["lines"]]
+            spans = [span for line in lines for span in line["spans"]]
+            text = "".join(span["text"] for span in spans)
+            pages.append({
+                "blocks": len(text_blocks),
+                "lines": len(lines),
+                "spans": len(spans),
+                "chars": len(text),
+                "fonts": len({(span["font"], round(span["size"], 1)) for span in spans}),
+                "images": len(page.get_images(full=True)),
+                "drawings": len(page.get_drawings()),
+                "text_hash": _digest(text),
+            })
+        return {
+            "bytes": len(pdf_bytes),
+            "hash": _digest(bytes(pdf_bytes)),
+            "page_count": doc.page_count,
+            "outline_entries": len(doc.get_toc()),
+            "pages": pages,
+        }
+    finally:
+        doc.close()
+
+
+def summarize_paragraphs(paragraphs: list) -> dict[str, Any]:
+    """Counts and sizes of parsed paragraphs; text and images appear only as hashes."""
+    images = [img for p in paragraphs for img in p.images]
+    return {
+        "paragraphs": len(paragraphs),
+        "bold": sum(1 for p in paragraphs if p.is_bold),
+        "headings": sum(1 for p in paragraphs if p.is_heading),
+        "lines": sum(p.text.count("\n") + 1 for p in paragraphs),
+        "chars": sum(len(p.text) for p in paragraphs),
+        "max_chars": max((len(p.text) for p in paragraphs), default=0),
+        "distinct_texts": len({_digest(p.text) for p in paragraphs}),
+        "images": len(images),
+        "image_bytes": sum(len(img) * 3 // 4 for img in images),
+        "distinct_images": len({_digest(img) for img in images}),
+    }
+
+
+def summarize_cards(cards: list) -> dict[str, Any]:
+    """Counts and sizes of cards sent for a build; text and images appear only as hashes."""
+    images = [img for c in cards for img in c.images]
+    return {
+        "cards": len(cards),
+        "chars": sum(len(c.front) + len(c.back) for c in cards),
+        "max_chars": max((len(c.front) + len(c.back) for c in cards), default=0),
+        "distinct_fronts": len({_digest(c.front) for c in cards}),
+        "tags": len({t for c in cards for t in c.tags}),
+        "note_types": sorted({c.note_type or "default" for c in cards}),
+        "images": len(images),
+        "image_bytes": sum(len(img) * 3 // 4 for img in images),
+        "distinct_images": len({_digest(img) for img in images}),
+    }
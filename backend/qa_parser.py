@@ -1,11 +1,22 @@
+import fnmatch
+import itertools
 import re
 from typing import List, Optional
 
 from models import ExtractedCard, Paragraph
+from note_types import CLOZE, CLOZE_RE
+from question_detectors import QuestionDetector
 
 ORANGE_COLORS = {"#ff6600", "#e69138", "#ff9900", "#f6b26b", "#ce7e00", "#ff8c00"}
 PURPLE_COLORS = {"#800080", "#9900ff", "#674ea7", "#8e7cc3", "#7030a0", "#9933ff"}
 
+# Highlighted text, as marked by the Docs add-on and Markdown's ==highlight== syntax. The markers
+# must hug the text and stand apart from other operators, so comparisons like "x == 1" or "a==b"
+# are not highlights.
+HIGHLIGHT_RE = re.compile(r"(?<![\w=!<>])==(?=[^\s=])(.+?)(?<=[^\s=])==(?![\w=])")
+# Inline code spans are matched first so highlights are never looked for inside them.
+_CODE_OR_HIGHLIGHT_RE = re.compile(r"(`[^`]*`)|" + HIGHLIGHT_RE.pattern)
+
 
 def sanitize_tag(text: str) -> str:
     """Convert heading text to a valid Anki tag."""
@@ -15,6 +26,33 @@ def sanitize_tag(text: str) -> str:
     return text.title() if text else ""
 
 
+def _replace_highlights(text: str, replace) -> str:
+    return _CODE_OR_HIGHLIGHT_RE.sub(lambda m: m.group(1) or replace(m.group(2)), text)
+
+
+def strip_highlights(text: str) -> str:
+    """Remove the ``==`` markers around highlighted spans, keeping their text."""
+    if "==" not in text:
+        return text
+    return _replace_highlights(text, lambda span: span)
+
+
+def to_cloze(text: str, highlights: bool = True) -> Optional[str]:
+    """Return ``text`` as cloze text if it has cloze markers, else None.
+
+    Anki's own ``{{c1::...}}`` markers are kept; each highlighted span
+    becomes the next cloze number after them. With ``highlights`` False only
+    Anki's markers make a cloze.
+    """
+    explicit = "{{c" in text and CLOZE_RE.search(text) is not None
+    if not explicit and not (highlights and "==" in text):
+        return None
+    numbers = [int(n) for n, _ in CLOZE_RE.findall(text)]
+    next_number = itertools.count(max(numbers, default=0) + 1)
+    cloze = _replace_highlights(text, lambda span: f"{{{{c{next(next_number)}::{span}}}}}")
+    return cloze if explicit or CLOZE_RE.search(cloze) else None
+
+
 def _get_heading_level(paragraph: Paragraph) -> Optional[int]:
     """Determine heading level: 1 = orange/top-level, 2 = purple/subsection, None = not a heading."""
     if paragraph.heading_level is not None:
@@ -51,6 +89,7 @@ def _save_card(
     level1_tag: Optional[str],
     level2_tag: Optional[str],
     cards: list[ExtractedCard],
+    note_type: Optional[str] = None,
 ) -> None:
     """Append a completed card to the cards list."""
     if not question:
@@ -58,15 +97,28 @@ def _save_card(
     back = "\n".join(answer_lines).strip()
     tag = _build_tag(level1_tag, level2_tag)
     tags = [tag] if tag else []
-    cards.append(ExtractedCard(front=question.strip(), back=back, tags=tags, images=answer_images))
-
-
-def extract_cards(paragraphs: list[Paragraph]) -> list[ExtractedCard]:
-    """Extract Q&A cards from a list of paragraphs using bold detection."""
+    cards.append(ExtractedCard(
+        front=question.strip(), back=back, tags=tags, images=answer_images, note_type=note_type
+    ))
+
+
+def extract_cards(
+    paragraphs: list[Paragraph], detector: Optional[QuestionDetector] = None
+) -> list[ExtractedCard]:
+    """Extract Q&A cards from a list of paragraphs using bold detection.
+
+    ``detector`` (see ``question_detectors.compile_detector``) replaces bold
+    detection with other ways of spotting questions. A question or answer
+    paragraph containing cloze markers (``{{c1::...}}`` or highlighted
+    ``==text==``) starts a cloze card; the lines after it become its extra
+    back text. Highlights in a question or in the answer of a Q&A card are
+    just emphasis: they are dropped rather than starting a cloze.
+    """
     cards: list[ExtractedCard] = []
     level1_tag: Optional[str] = None
     level2_tag: Optional[str] = None
     current_question: Optional[str] = None
+    current_note_type: Optional[str] = None
     current_answer_lines: list[str] = []
     current_images: list[str] = []
 
@@ -84,10 +136,18 @@ def extract_cards(paragraphs: list[Paragraph]) -> list[ExtractedCard]:
             continue
 
         heading_level = _get_heading_level(paragraph)
+        if detector is None:
+            question = (text, None) if paragraph.is_bold else None
+        else:
+            question = detector.match(paragraph, text) if heading_level is None else None
+        in_answer = current_question is not None and current_note_type is None
+        cloze = to_cloze(text, highlights=not (question or in_answer)) if heading_level is None else None
 
         if heading_level is not None:
-            _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards)
+            _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards,
+                       current_note_type)
             current_question = None
+            current_note_type = None
             current_answer_lines = []
             current_images = []
 
@@ -98,16 +158,46 @@ def extract_cards(paragraphs: list[Paragraph]) -> list[ExtractedCard]:
             else:
                 level2_tag = tag_text
 
-        elif paragraph.is_bold:
-            _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards)
-            current_answer_lines = []
+        elif question or cloze:
+            _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards,
+                       current_note_type)
+            question_text, inline_answer = question if question and not cloze else (text, None)
+            current_answer_lines = [strip_highlights(inline_answer)] if inline_answer else []
             current_images = []
-            current_question = text
+            current_question = cloze or strip_highlights(question_text)
+            current_note_type = CLOZE if cloze else None
 
         else:
-            current_answer_lines.append(text)
+            line = detector.answer_line(text) if detector is not None else text
+            current_answer_lines.append(strip_highlights(line) if in_answer else line)
             current_images.extend(paragraph.images)
 
-    _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards)
+    _save_card(current_question, current_answer_lines, current_images, level1_tag, level2_tag, cards,
+               current_note_type)
+
+    return cards
+
 
+def prefix_tags(cards: list[ExtractedCard], prefix: str) -> list[ExtractedCard]:
+    """Nest every card's tags under ``prefix`` (e.g. a file name); untagged cards get the prefix."""
+    if not prefix:
+        return cards
+    for card in cards:
+        card.tags = [f"{prefix}::{tag}" for tag in card.tags] or [prefix]
     return cards
+
+
+def tag_matches(tag: str, pattern: str) -> bool:
+    """Match a ``Level1::Level2`` tag against a filter such as ``Pharmacology``,
+    ``Pharmacology::*`` or ``Pharmacology::Anti*``; a plain path also matches its subtags."""
+    base = pattern[:-3] if pattern.endswith("::*") else pattern
+    if not any(ch in base for ch in "*?["):
+        return tag == base or tag.startswith(base + "::")
+    return fnmatch.fnmatchcase(tag, pattern)
+
+
+def filter_by_tags(cards: list[ExtractedCard], patterns: list[str]) -> list[ExtractedCard]:
+    """Keep cards with a tag matching any of ``patterns``; no patterns keeps every card."""
+    if not patterns:
+        return cards
+    return [c for c in cards if any(tag_matches(t, p) for t in c.tags for p in patterns)]
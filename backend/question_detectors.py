@@ -0,0 +1,175 @@
+"""Pluggable strategies for deciding which paragraphs are questions.
+
+``extract_cards`` treats an all-bold paragraph as a question by default.
+Notes written differently can opt into other strategies, tried in order:
+
+- ``bold``: the whole paragraph is bold (the default).
+- ``bold-prefix``: a bold lead-in followed by plain text, as in
+  "**Furosemide:** loop diuretic"; the lead-in is the question and the rest
+  of the line the first answer line.
+- ``prefix``: a literal prefix such as ``Q:`` (configurable), or a numbered
+  line ending in "?" such as "3. What is GFR?"; answer lines lose a
+  matching ``A:`` prefix. A prefix must be followed by a space, and only
+  word prefixes such as ``Answer:`` match in any case, so "a) first option"
+  keeps its marker.
+- ``font-size``: a line set noticeably larger than the document's body text
+  that is not a heading.
+
+``compile_detector`` builds a detector once per request: prefix patterns are
+compiled and the body font size measured up front, so checking each
+paragraph is cheap.
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Iterable, Optional, Sequence
+
+BOLD = "bold"
+BOLD_PREFIX = "bold-prefix"
+PREFIX = "prefix"
+FONT_SIZE = "font-size"
+DETECTORS = (BOLD, BOLD_PREFIX, PREFIX, FONT_SIZE)
+
+DEFAULT_QUESTION_PREFIXES = ("Q:", "Q.", "Q)", "Question:")
+DEFAULT_ANSWER_PREFIXES = ("A:", "A.", "A)", "Answer:")
+MAX_PREFIX_LENGTH = 40
+# A line at least this much larger than the body text counts as a question.
+FONT_SIZE_RATIO = 1.15
+
+_NUMBERED_QUESTION_RE = re.compile(r"^\d{1,3}[.)]\s+(.+\?)$")
+_LEAD_SEPARATORS = " \t:–—-"
+
+# A strategy returns (question, first answer line or None) for a question paragraph, else None.
+Match = Optional[tuple[str, Optional[str]]]
+Strategy = Callable[[object, str], Match]
+
+
+class InvalidDetectorError(ValueError):
+    """Raised for an unknown strategy or an unusable question prefix."""
+
+
+def bold_prefix_length(runs: Iterable[tuple[str, bool]], text: str) -> int:
+    """Length of the bold lead-in at the start of ``text``, given its ``(run text, is_bold)`` runs.
+
+    0 when the text does not start bold or is bold throughout.
+    """
+    lead = []
+    for run_text, bold in runs:
+        if run_text.strip() and not bold:
+            break
+        lead.append(run_text)
+    else:
+        return 0
+    lead_text = " ".join("".join(lead).split())
+    if not lead_text or not text.startswith(lead_text):
+        return 0
+    return len(lead_text)
+
+
+def _bold(paragraph, text: str) -> Match:
+    return (text, None) if paragraph.is_bold else None
+
+
+def _bold_prefix(paragraph, text: str) -> Match:
+    length = getattr(paragraph, "bold_prefix", 0)
+    if not length or length >= len(text):
+        return None
+    question = text[:length].rstrip(_LEAD_SEPARATORS)
+    answer = text[length:].lstrip(_LEAD_SEPARATORS)
+    if len(question) < 2 or not answer:
+        return None
+    return question, answer
+
+
+def _prefix_pattern(prefix: str) -> str:
+    """A word prefix ("Answer:") matches in any case; a letter marker ("A.") only as written."""
+    escaped = re.escape(prefix)
+    return f"(?i:{escaped})" if sum(ch.isalpha() for ch in prefix) > 1 else escaped
+
+
+def _prefix_regex(prefixes: Sequence[str]) -> re.Pattern:
+    for prefix in prefixes:
+        if not prefix.strip() or len(prefix) > MAX_PREFIX_LENGTH:
+            raise InvalidDetectorError(f"Invalid question prefix: {prefix!r}")
+    alternatives = "|".join(_prefix_pattern(p.strip()) for p in sorted(prefixes, key=len, reverse=True))
+    # The prefix must be followed by a space, so a line like "A.D. 1066" is left alone.
+    return re.compile(rf"^(?:{alternatives})\s+(.+)$", re.DOTALL)
+
+
+def _prefix_strategy(question_re: re.Pattern) -> Strategy:
+    def match(paragraph, text: str) -> Match:
+        m = question_re.match(text) or _NUMBERED_QUESTION_RE.match(text)
+        return (m.group(1).strip(), None) if m else None
+    return match
+
+
+def body_font_size(paragraphs: Sequence) -> Optional[float]:
+    """The font size covering the most text among non-heading paragraphs, or None if sizes are unknown."""
+    sizes: Counter = Counter()
+    for p in paragraphs:
+        size = getattr(p, "font_size", None)
+        if size and not p.is_heading and not p.is_table:
+            sizes[size] += len(p.text)
+    return sizes.most_common(1)[0][0] if sizes else None
+
+
+def _font_size_strategy(body_size: Optional[float]) -> Optional[Strategy]:
+    if body_size is None:
+        return None
+    threshold = body_size * FONT_SIZE_RATIO
+
+    def match(paragraph, text: str) -> Match:
+        size = getattr(paragraph, "font_size", None)
+        return (text, None) if size and size >= threshold else None
+    return match
+
+
+class QuestionDetector:
+    """The strategies chosen for one request, tried in order."""
+
+    def __init__(self, strategies: list[Strategy], answer_re: Optional[re.Pattern] = None) -> None:
+        self.strategies = strategies
+        self.answer_re = answer_re
+
+    def match(self, paragraph, text: str) -> Match:
+        """``(question, first answer line or None)`` if ``paragraph`` starts a card, else None."""
+        for strategy in self.strategies:
+            found = strategy(paragraph, text)
+            if found is not None:
+                return found
+        return None
+
+    def answer_line(self, text: str) -> str:
+        """An answer line with any answer prefix (``A:``) removed."""
+        if self.answer_re is None:
+            return text
+        m = self.answer_re.match(text)
+        return m.group(1).strip() if m else text
+
+
+def compile_detector(
+    names: Sequence[str], paragraphs: Sequence = (), question_prefixes: Sequence[str] = ()
+) -> Optional[QuestionDetector]:
+    """Build the detector for ``names``, or None for the default all-bold detection.
+
+    ``paragraphs`` is only read by ``font-size``, to measure the body text size.
+    """
+    if not names or list(names) == [BOLD]:
+        return None
+    strategies: list[Strategy] = []
+    answer_re = None
+    for name in dict.fromkeys(names):
+        if name == BOLD:
+            strategies.append(_bold)
+        elif name == BOLD_PREFIX:
+            strategies.append(_bold_prefix)
+        elif name == PREFIX:
+            strategies.append(_prefix_strategy(_prefix_regex(question_prefixes or DEFAULT_QUESTION_PREFIXES)))
+            answer_re = _prefix_regex(DEFAULT_ANSWER_PREFIXES)
+        elif name == FONT_SIZE:
+            strategy = _font_size_strategy(body_font_size(paragraphs))
+            if strategy is not None:
+                strategies.append(strategy)
+        else:
+            raise InvalidDetectorError(f"Unknown question detector: {name!r}")
+    return QuestionDetector(strategies, answer_re)
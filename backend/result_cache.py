@@ -0,0 +1,198 @@
+"""Result cache shared by every worker process on the instance.
+
+Parsed PDFs, built decks and extraction results are stored in one local
+SQLite file (WAL mode, memory-mapped reads), so with several uvicorn workers
+a cache hit does not depend on which worker gets the request. Keys are
+content hashes of the input plus a hash of the code that produced the
+result, so entries from an older build of the parser or deck builder are
+never returned. The least recently used entries are evicted past
+``RESULT_CACHE_MAX_BYTES``. A cache error is logged and treated as a miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Optional, Sequence
+
+from pydantic import TypeAdapter
+
+import ocr
+from anki_builder import build_deck
+from models import ExtractedCard, Paragraph
+from note_types import BASIC
+from pdf_parser import parse_pdf_with_failures
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "anki-scribe-results.sqlite3")
+)
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+# Hits only refresh an entry's LRU position once it is this stale, so most reads do not write.
+_TOUCH_INTERVAL = 60.0
+
+_paragraphs = TypeAdapter(list[Paragraph])
+_cards = TypeAdapter(list[ExtractedCard])
+_indexed_cards = TypeAdapter(tuple[list[ExtractedCard], list[int]])
+
+_initialised: set[str] = set()
+_init_lock = threading.Lock()
+
+logger = logging.getLogger("docs-anki")
+
+
+def _code_version(*module_names: str) -> str:
+    """Hash of the source of the modules that produce a result."""
+    digest = hashlib.sha1()
+    for name in module_names:
+        with open(sys.modules[name].__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+_PARSE_VERSION = _code_version("pdf_parser", "layout", "tables", "ocr", "qa_parser", "models")
+_BUILD_VERSION = _code_version("anki_builder", "note_types", "stable_ids", "models")
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the cache, creating its schema the first time a path is used."""
+    path = RESULT_CACHE_PATH
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute(f"PRAGMA mmap_size={RESULT_CACHE_MAX_BYTES * 2}")
+    with _init_lock:
+        if path not in _initialised:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialised.add(path)
+    return conn
+
+
+def get(key: str) -> Optional[bytes]:
+    """Return the cached value for ``key``, or None on a miss."""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT value, last_used FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > _TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("result_cache_error", extra={"event_data": {"event": "result_cache_error", "error": str(e)}})
+        return None
+    return zlib.decompress(row[0])
+
+
+def put(key: str, value: bytes) -> None:
+    """Store ``value`` under ``key``, evicting the least recently used entries if the cache is full."""
+    if not RESULT_CACHE_ENABLED:
+        return
+    blob = zlib.compress(value, 1)
+    if len(blob) > RESULT_CACHE_MAX_BYTES:
+        return
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > RESULT_CACHE_MAX_BYTES:
+                    _evict(conn, total - RESULT_CACHE_MAX_BYTES)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("result_cache_error", extra={"event_data": {"event": "result_cache_error", "error": str(e)}})
+
+
+def _evict(conn: sqlite3.Connection, excess: int) -> None:
+    freed = 0
+    doomed = []
+    for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+        doomed.append((key,))
+        freed += size
+        if freed >= excess:
+            break
+    conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+
+def _key(kind: str, version: str, *parts: bytes | str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return f"{kind}:{version}:{digest.hexdigest()}"
+
+
+def _cached(key: str, compute: Callable[[], bytes]) -> bytes:
+    value = get(key)
+    if value is None:
+        value = compute()
+        put(key, value)
+    return value
+
+
+def parse_pdf_cached(
+    pdf_bytes: bytes | memoryview, page_range: Optional[str] = None, tags: Sequence[str] = ()
+) -> list[Paragraph]:
+    """``parse_pdf`` through the shared cache.
+
+    A result with failed OCR pages is not cached, so a one-off timeout does
+    not stick to the document.
+    """
+    key = _key("pdf", _PARSE_VERSION, pdf_bytes, page_range or "", json.dumps(list(tags)), str(ocr.ocr_enabled()))
+    value = get(key)
+    if value is not None:
+        return _paragraphs.validate_json(value)
+    paragraphs, ocr_failures = parse_pdf_with_failures(pdf_bytes, page_range, tags)
+    if not ocr_failures:
+        put(key, _paragraphs.dump_json(paragraphs))
+    return paragraphs
+
+
+def build_deck_cached(
+    cards: list[ExtractedCard],
+    deck_name: str = "My Deck",
+    manifest: Optional[dict[str, str]] = None,
+    note_type: str = BASIC,
+) -> bytes:
+    """``build_deck`` through the shared cache."""
+    manifest_json = json.dumps(manifest, sort_keys=True) if manifest is not None else ""
+    key = _key("deck", _BUILD_VERSION, _cards.dump_json(cards), deck_name, manifest_json, note_type)
+    return _cached(key, lambda: build_deck(cards, deck_name, manifest, note_type))
+
+
+def put_cards(key: str, cards: list[ExtractedCard], image_counts: list[int]) -> None:
+    """Store an indexed result's cards (without images) and how many images each had."""
+    put(f"indexed:{key}", _indexed_cards.dump_json((cards, image_counts)))
+
+
+def get_cards(key: str) -> Optional[tuple[list[ExtractedCard], list[int]]]:
+    value = get(f"indexed:{key}")
+    return None if value is None else _indexed_cards.validate_json(value)
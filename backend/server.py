@@ -0,0 +1,56 @@
+"""Production entry point: uvicorn with one worker process per available CPU.
+
+``WEB_CONCURRENCY`` overrides the number of workers. Each worker has its own
+parsing pool and scheduler, so unless ``WORKER_PROCESSES`` is set the CPUs
+are split between them rather than every worker sizing its pool to the whole
+machine. Parse and build results are shared between workers through
+``result_cache``.
+"""
+
+import math
+import os
+
+import uvicorn
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring CPU affinity and a cgroup v2 (container) quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_counts(cpus: int, web_workers: int | None = None, pool_workers: int | None = None) -> tuple[int, int]:
+    """Return ``(uvicorn workers, parsing processes per worker)`` for ``cpus`` CPUs."""
+    web = web_workers or cpus
+    return web, pool_workers or max(1, cpus // web)
+
+
+def main() -> None:
+    web, pool = worker_counts(
+        available_cpus(),
+        int(os.environ["WEB_CONCURRENCY"]) if os.environ.get("WEB_CONCURRENCY") else None,
+        int(os.environ["WORKER_PROCESSES"]) if os.environ.get("WORKER_PROCESSES") else None,
+    )
+    # Inherited by the worker processes, where workers.py reads it.
+    os.environ["WORKER_PROCESSES"] = str(pool)
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8080")),
+        workers=web,
+        log_level=os.environ.get("LOG_LEVEL", "info"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Stable, collision-safe note GUIDs and deck IDs, plus a GUID index for diffs."""
+
+import hashlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+import genanki
+
+from models import ExtractedCard
+
+
+def stable_id(text: str) -> int:
+    """Derive a deterministic positive 63-bit ID (Anki IDs are signed 64-bit) from text."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def assign_guids(cards: list[ExtractedCard]) -> list[str]:
+    """Give every card a GUID that is unique within the deck.
+
+    A card whose question is unique keeps ``guid_for(front)``, as genanki
+    would assign. Cards sharing a question are told apart by their tag path,
+    and only where that also collides by their answer, so editing an answer
+    keeps the GUID whenever the tag path is enough. Nothing depends on
+    position: deleting or reordering a card does not hand its GUID (and
+    review history) to another. Cards identical in all three fall back to a
+    counter.
+    """
+    fronts = Counter(card.front for card in cards)
+    paths = Counter((card.front, card.tags[0] if card.tags else "") for card in cards)
+    guids: list[str] = []
+    seen: set[str] = set()
+
+    for card in cards:
+        tag_path = card.tags[0] if card.tags else ""
+        if fronts[card.front] == 1:
+            guid = genanki.guid_for(card.front)
+        elif paths[(card.front, tag_path)] == 1:
+            guid = genanki.guid_for(card.front, tag_path)
+        else:
+            guid = genanki.guid_for(card.front, tag_path, card.back)
+            n = 1
+            while guid in seen:
+                guid = genanki.guid_for(card.front, tag_path, card.back, n)
+                n += 1
+        seen.add(guid)
+        guids.append(guid)
+    return guids
+
+
+def note_checksum(fields: list[str], tags: list[str], model_id: int | None = None) -> str:
+    """Checksum a note's rendered fields and tags, as stored in an Anki collection.
+
+    ``model_id`` is given for notes that are not the default Basic type, so a
+    note whose type changes counts as changed.
+    """
+    payload = "\x1f".join(fields) + "\x1e" + " ".join(tags)
+    if model_id is not None:
+        payload += f"\x1e{model_id}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class NoteDiff:
+    """GUIDs grouped by how a deck changed relative to a previous version."""
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+
+class NoteIndex:
+    """GUID → checksum index of a deck, built once so later diffs are dict lookups.
+
+    Each entry can carry a payload (e.g. the rendered note) so callers only
+    do further work for the GUIDs a diff reports as added or changed.
+    """
+
+    def __init__(self) -> None:
+        self.checksums: dict[str, str] = {}
+        self.payloads: dict[str, Any] = {}
+        self.duplicates: dict[str, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.checksums)
+
+    def add(self, guid: str, checksum: str, payload: Any = None, question: str | None = None) -> None:
+        """Index one note; ``question`` records notes that share question text."""
+        self.checksums[guid] = checksum
+        self.payloads[guid] = payload
+        if question is not None:
+            self.duplicates.setdefault(question, []).append(guid)
+
+    def duplicate_groups(self) -> list[list[str]]:
+        """Return the GUIDs of notes whose question text occurs more than once."""
+        return [guids for guids in self.duplicates.values() if len(guids) > 1]
+
+    def digest(self) -> str:
+        """Hash the whole index, order-sensitive, to short-circuit identical rebuilds."""
+        h = hashlib.sha256()
+        for guid, checksum in self.checksums.items():
+            h.update(f"{guid}:{checksum};".encode("utf-8"))
+        return h.hexdigest()
+
+    def diff(self, previous: Mapping[str, str]) -> NoteDiff:
+        """Compare against a previous GUID → checksum mapping."""
+        result = NoteDiff()
+        for guid, checksum in self.checksums.items():
+            old = previous.get(guid)
+            if old is None:
+                result.added.append(guid)
+            elif old != checksum:
+                result.changed.append(guid)
+            else:
+                result.unchanged.append(guid)
+        result.removed = [guid for guid in previous if guid not in self.checksums]
+        return result
@@ -0,0 +1,26 @@
+"""Build table paragraphs in the shape the Docs add-on sends them."""
+
+import html
+from typing import Optional, Sequence
+
+from models import Paragraph
+
+
+def table_to_paragraph(rows: Sequence[Sequence[Optional[str]]]) -> Paragraph:
+    """Convert table rows into a table Paragraph, first row as the header.
+
+    ``text`` holds the rows as ``a | b`` lines and ``table_html`` a plain
+    ``<table>`` with ``<th>`` cells for the first row.
+    """
+    html_rows = []
+    text_rows = []
+    for r, row in enumerate(rows):
+        cells = [(cell or "").replace("\n", " ").strip() for cell in row]
+        tag = "th" if r == 0 else "td"
+        html_rows.append("<tr>" + "".join(f"<{tag}>{html.escape(c, quote=False)}</{tag}>" for c in cells) + "</tr>")
+        text_rows.append(" | ".join(cells))
+    return Paragraph(
+        text="\n".join(text_rows),
+        is_table=True,
+        table_html="<table>" + "".join(html_rows) + "</table>",
+    )
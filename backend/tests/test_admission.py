@@ -0,0 +1,86 @@
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import admission
+from admission import FairScheduler, RateLimiter, client_key, request_cost
+
+
+def test_client_key_uses_hop_appended_by_trusted_proxy():
+    headers = {"x-forwarded-for": "6.6.6.6, 1.2.3.4, 10.0.0.1"}
+    # The client wrote 6.6.6.6 itself; only the entries our proxies appended count.
+    assert client_key(headers, "10.0.0.2", trusted_hops=1) == "10.0.0.1"
+    assert client_key(headers, "10.0.0.2", trusted_hops=2) == "1.2.3.4"
+    assert client_key({"x-forwarded-for": "1.2.3.4"}, "10.0.0.2", trusted_hops=2) == "10.0.0.2"
+    assert client_key({}, "5.6.7.8", trusted_hops=1) == "5.6.7.8"
+
+
+def test_client_key_ignores_forwarded_header_without_trusted_proxies():
+    assert client_key({"x-forwarded-for": "1.2.3.4"}, "5.6.7.8", trusted_hops=0) == "5.6.7.8"
+    assert client_key({}, None, trusted_hops=0) == "unknown"
+
+
+def test_request_cost_grows_with_size():
+    assert request_cost() == 1
+    assert request_cost(size_bytes=2 * 1024 * 1024) == 3
+    assert request_cost(paragraphs=1000, images=20) == 5
+
+
+def test_rate_limiter_rejects_when_bucket_empty(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(capacity=3, refill_per_second=1)
+
+    assert limiter.acquire("a", 2) == 0
+    assert limiter.acquire("a", 2) == 1.0
+    assert limiter.rejected == 1
+    # Other clients have their own bucket.
+    assert limiter.acquire("b", 3) == 0
+
+    now[0] += 1
+    assert limiter.acquire("a", 2) == 0
+
+
+def test_rate_limiter_caps_cost_at_capacity(monkeypatch):
+    monkeypatch.setattr(admission.time, "monotonic", lambda: 0.0)
+    limiter = RateLimiter(capacity=5, refill_per_second=1)
+    assert limiter.acquire("a", 50) == 0
+
+
+def test_scheduler_round_robins_between_clients():
+    async def run():
+        scheduler = FairScheduler(1)
+        order = []
+
+        async def job(client, name):
+            async with scheduler.slot(client):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        # "a" queues three jobs before "b" queues one; b must not wait behind all of a's.
+        await asyncio.gather(job("a", "a1"), job("a", "a2"), job("a", "a3"), job("b", "b1"))
+        return order, scheduler.metrics()
+
+    order, metrics = asyncio.run(run())
+    assert order == ["a1", "a2", "b1", "a3"]
+    assert metrics["admitted"] == 4
+    assert metrics["slots_free"] == 1
+    assert metrics["queued"] == 0
+
+
+def test_scheduler_cancelled_waiter_releases_nothing():
+    async def run():
+        scheduler = FairScheduler(1)
+        async with scheduler.slot("a"):
+            waiter = asyncio.ensure_future(scheduler.slot("b").__aenter__())
+            await asyncio.sleep(0)
+            assert scheduler.metrics()["queued"] == 1
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        return scheduler.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics["queued"] == 0
+    assert metrics["slots_free"] == 1
@@ -52,3 +52,56 @@ def test_empty_deck():
     result = build_deck([], "Empty Deck")
     assert isinstance(result, bytes)
     assert len(result) > 0
+
+
+def test_duplicate_questions_get_distinct_notes():
+    import sqlite3
+    import tempfile
+
+    cards = [
+        ExtractedCard(front="Define shock", back="Cardio", tags=["Cardiology"]),
+        ExtractedCard(front="Define shock", back="Renal", tags=["Renal"]),
+    ]
+    z = zipfile.ZipFile(io.BytesIO(build_deck(cards, "Dupes")))
+    with tempfile.NamedTemporaryFile(suffix=".anki2", delete=False) as tmp:
+        tmp.write(z.read("collection.anki2"))
+    conn = sqlite3.connect(tmp.name)
+    guids = [row[0] for row in conn.execute("SELECT guid FROM notes")]
+    conn.close()
+    os.remove(tmp.name)
+    assert len(guids) == 2
+    assert len(set(guids)) == 2
+
+
+def _read_collection(apkg: bytes):
+    import sqlite3
+    import tempfile
+
+    z = zipfile.ZipFile(io.BytesIO(apkg))
+    with tempfile.NamedTemporaryFile(suffix=".anki2", delete=False) as tmp:
+        tmp.write(z.read("collection.anki2"))
+    conn = sqlite3.connect(tmp.name)
+    return conn, tmp.name
+
+
+def test_note_types_per_card_and_per_deck():
+    import json
+
+    cards = [
+        ExtractedCard(front="Capital of France?", back="Paris"),
+        ExtractedCard(front="{{c1::Paris}} is in {{c2::France}}", back="", note_type="cloze"),
+    ]
+    conn, path = _read_collection(build_deck(cards, "Types", note_type="reversed"))
+    models = json.loads(conn.execute("SELECT models FROM col").fetchone()[0])
+    names = {m["name"] for m in models.values()}
+    card_counts = dict(conn.execute(
+        "SELECT notes.flds, count(*) FROM cards JOIN notes ON cards.nid = notes.id GROUP BY notes.id"
+    ).fetchall())
+    conn.close()
+    os.remove(path)
+
+    assert "Docs to Anki - Basic (and reversed card)" in names
+    assert "Docs to Anki - Cloze" in names
+    # Reversed: front->back and back->front; cloze: one card per deletion.
+    assert card_counts["Capital of France?\x1fParis"] == 2
+    assert card_counts["{{c1::Paris}} is in {{c2::France}}\x1f"] == 2
@@ -3,10 +3,15 @@ import os
 import zipfile
 import io
 
+import fitz
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from fastapi.testclient import TestClient
 from main import app
+from models import Paragraph
+from wire_format import encode_paragraphs
+import profiling
 
 client = TestClient(app)
 
@@ -55,3 +60,304 @@ def test_extract_empty():
     response = client.post("/api/extract", json=payload)
     assert response.status_code == 200
     assert response.json()["cards"] == []
+
+
+def test_generate_incremental():
+    payload = {
+        "cards": [{"front": "Q1?", "back": "A1", "tags": ["Test"]}],
+        "deck_name": "Incremental Deck",
+        "incremental": True,
+        "result_id": "api-test-result",
+    }
+    first = client.post("/api/generate", json=payload)
+    payload["cards"].append({"front": "Q2?", "back": "A2", "tags": ["Test"]})
+    second = client.post("/api/generate", json=payload)
+    assert first.status_code == 200
+    assert second.status_code == 200
+    z = zipfile.ZipFile(io.BytesIO(second.content))
+    assert "collection.anki2" in z.namelist()
+
+
+def test_manifest_and_diff():
+    cards = [
+        {"front": "Q1?", "back": "A1", "tags": ["Test"]},
+        {"front": "Q2?", "back": "A2", "tags": ["Test"]},
+    ]
+    apkg = client.post("/api/generate", json={"cards": cards, "deck_name": "Diff"}).content
+    response = client.post(
+        "/api/manifest",
+        files={"file": ("Diff.apkg", apkg, "application/octet-stream")},
+    )
+    assert response.status_code == 200
+    manifest = response.json()["notes"]
+    assert len(manifest) == 2
+
+    cards[1]["back"] = "A2 edited"
+    response = client.post("/api/diff", json={"cards": cards, "deck_name": "Diff", "manifest": manifest})
+    assert response.status_code == 200
+    assert response.json() == {"new": [], "changed": [1], "unchanged": 1, "removed": []}
+
+    response = client.post("/api/generate", json={"cards": cards, "deck_name": "Diff", "manifest": manifest})
+    assert response.status_code == 200
+    delta = client.post(
+        "/api/manifest",
+        files={"file": ("delta.apkg", response.content, "application/octet-stream")},
+    )
+    assert len(delta.json()["notes"]) == 1
+
+
+def test_manifest_invalid_file():
+    response = client.post(
+        "/api/manifest",
+        files={"file": ("bad.apkg", b"not a zip", "application/octet-stream")},
+    )
+    assert response.status_code == 400
+
+
+def test_file_upload_markdown():
+    response = client.post(
+        "/api/file-upload",
+        files={"file": ("notes.md", b"# Renal\n**What is GFR?**\nFiltration rate\n", "text/markdown")},
+    )
+    assert response.status_code == 200
+    cards = response.json()["cards"]
+    assert [(c["front"], c["back"], c["tags"]) for c in cards] == [("What is GFR?", "Filtration rate", ["Renal"])]
+
+
+def test_file_upload_html():
+    response = client.post(
+        "/api/file-upload",
+        files={"file": ("notes.html", b"<p><b>What is X?</b></p><p>X is a thing</p>", "text/html")},
+    )
+    assert response.status_code == 200
+    assert response.json()["cards"][0]["front"] == "What is X?"
+
+
+def test_file_upload_filters_by_tag():
+    markdown = b"# Renal\n**What is GFR?**\nFiltration rate\n# Cardiology\n**What is CO?**\nHR x SV\n"
+    response = client.post(
+        "/api/file-upload", params={"tags": "Cardiology"}, files={"file": ("notes.md", markdown, "text/markdown")}
+    )
+    assert response.status_code == 200
+    assert [c["front"] for c in response.json()["cards"]] == ["What is CO?"]
+
+    response = client.post(
+        "/api/file-upload", params={"pages": "1-2"}, files={"file": ("notes.md", markdown, "text/markdown")}
+    )
+    assert response.status_code == 400
+
+
+def test_question_detectors():
+    markdown = b"**Furosemide:** loop diuretic\nQ: What is GFR?\nA: Filtration rate\n"
+    response = client.post(
+        "/api/file-upload",
+        params={"detectors": ["bold-prefix", "prefix"]},
+        files={"file": ("notes.md", markdown, "text/markdown")},
+    )
+    assert response.status_code == 200
+    assert [(c["front"], c["back"]) for c in response.json()["cards"]] == [
+        ("Furosemide", "loop diuretic"), ("What is GFR?", "Filtration rate"),
+    ]
+
+    payload = {"paragraphs": [{"text": "Q: What is GFR?"}], "detectors": ["prefix"], "question_prefixes": [" "]}
+    assert client.post("/api/extract", json=payload).status_code == 400
+    payload["detectors"] = ["italic"]
+    assert client.post("/api/extract", json=payload).status_code == 422
+
+
+def test_pdf_upload_rejects_invalid_page_range():
+    doc = fitz.open()
+    doc.new_page()
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    response = client.post(
+        "/api/pdf-upload", params={"pages": "5-2"}, files={"file": ("notes.pdf", pdf_bytes, "application/pdf")}
+    )
+    assert response.status_code == 400
+
+
+def test_file_upload_rejects_unknown_and_invalid_files():
+    response = client.post("/api/file-upload", files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+    response = client.post("/api/file-upload", files={"file": ("notes.docx", b"not a zip", "application/octet-stream")})
+    assert response.status_code == 400
+
+
+def test_rate_limited_request_gets_429(monkeypatch):
+    import main
+    from admission import RateLimiter
+
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter(capacity=1, refill_per_second=0.5))
+    payload = {"paragraphs": [{"text": "What is X?", "is_bold": True}, {"text": "X"}]}
+
+    assert client.post("/api/extract", json=payload).status_code == 200
+    response = client.post("/api/extract", json=payload)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_deck_and_diff_endpoints_are_rate_limited(monkeypatch):
+    import main
+    from admission import RateLimiter
+
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter(capacity=1, refill_per_second=0.5))
+    cards = [{"front": "Q", "back": "A"}]
+
+    assert client.post("/api/decks", json={"deck_name": "Limited", "cards": cards}).status_code == 200
+    assert client.post("/api/decks", json={"deck_name": "Limited", "cards": cards}).status_code == 429
+    response = client.post("/api/diff", json={"cards": cards, "deck_name": "Limited", "manifest": []})
+    assert response.status_code == 429
+    response = client.post("/api/manifest", files={"file": ("deck.apkg", b"PK", "application/octet-stream")})
+    assert response.status_code == 429
+
+
+def test_metrics():
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["scheduler"]["slots"] >= 1
+    assert "rate_limited" in data
+
+
+def test_oversized_extract_payload_rejected(monkeypatch):
+    import main
+    from payload_guard import PayloadLimits
+
+    monkeypatch.setitem(main.PAYLOAD_LIMITS, "/api/extract", PayloadLimits(items_key="paragraphs", max_items=2))
+
+    payload = {"paragraphs": [{"text": f"P{i}"} for i in range(3)]}
+    response = client.post("/api/extract", json=payload, headers={"Origin": "https://docs.google.com"})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Too many paragraphs"
+    # The browser can only read the 413 if it carries CORS headers.
+    assert response.headers["access-control-allow-origin"] == "https://docs.google.com"
+
+
+def test_deck_store_generate_by_reference(tmp_path, monkeypatch):
+    import deck_store
+
+    monkeypatch.setattr(deck_store, "DECK_STORE_PATH", str(tmp_path / "decks.sqlite3"))
+    cards = [{"front": "Q1?", "back": "A1", "tags": ["Test"]}, {"front": "Q2?", "back": "A2"}]
+    saved = client.post("/api/decks", json={"deck_name": "Stored", "cards": cards}).json()
+    assert saved["version"] == 1
+
+    update = {"deck_id": saved["deck_id"], "deck_name": "Stored",
+              "cards": [{"hash": saved["card_hashes"][0]}, {"front": "Q3?", "back": "A3"}]}
+    assert client.post("/api/decks", json=update).json()["version"] == 2
+
+    info = client.get(f"/api/decks/{saved['deck_id']}").json()
+    assert [v["card_count"] for v in info["versions"]] == [2, 2]
+    version = client.get(f"/api/decks/{saved['deck_id']}/versions/2").json()
+    assert [c["front"] for c in version["cards"]] == ["Q1?", "Q3?"]
+
+    response = client.post("/api/generate", json={"deck_id": saved["deck_id"]})
+    assert response.status_code == 200
+    assert 'filename="Stored.apkg"' in response.headers["content-disposition"]
+
+    assert client.post("/api/generate", json={"deck_id": "missing"}).status_code == 404
+    bad_ref = {"deck_name": "X", "cards": [{"hash": "nope"}]}
+    assert client.post("/api/decks", json=bad_ref).status_code == 400
+    bad_image = {"deck_name": "X", "cards": [{"front": "Q?", "back": "A", "images": ["not base64!"]}]}
+    assert client.post("/api/decks", json=bad_image).status_code == 400
+
+
+def test_extract_page_and_search():
+    paragraphs = []
+    for i in range(30):
+        paragraphs.append({"text": f"Question {i}?", "is_bold": True})
+        if i % 10:
+            paragraphs.append({"text": f"Answer {i}"})
+    data = client.post("/api/extract?page_size=5", json={"paragraphs": paragraphs}).json()
+    assert data["total"] == 30
+    assert len(data["cards"]) == 5
+
+    url = f"/api/results/{data['result_id']}/cards"
+    page = client.get(url, params={"offset": 5, "limit": 10}).json()
+    assert page["positions"] == list(range(5, 15))
+    assert page["total"] == 30
+
+    empty = client.get(url, params={"empty_answer": "true"}).json()
+    assert empty["positions"] == [0, 10, 20]
+
+    found = client.get(url, params={"q": "question 2"}).json()
+    assert found["positions"] == [2] + list(range(20, 30))
+
+    assert client.get("/api/results/missing/cards").status_code == 404
+
+
+def test_extract_dedup_merge():
+    paragraphs = [
+        {"text": "What is cardiac output?", "is_bold": True},
+        {"text": "HR x SV"},
+        {"text": "what is cardiac-output", "is_bold": True},
+        {"text": "About 5 L/min"},
+    ]
+    data = client.post("/api/extract", json={"paragraphs": paragraphs, "dedup": "merge"}).json()
+    assert len(data["cards"]) == 1
+    assert data["cards"][0]["back"] == "HR x SV\nAbout 5 L/min"
+
+    flagged = client.post("/api/extract", json={"paragraphs": paragraphs, "dedup": "flag"}).json()
+    assert [c["duplicate_of"] for c in flagged["cards"]] == [None, 0]
+
+    unsafe = {"paragraphs": paragraphs, "dedup": "merge", "dedup_threshold": 0.5}
+    assert client.post("/api/extract", json=unsafe).status_code == 400
+
+
+def test_profiling_is_admin_gated(tmp_path, monkeypatch):
+    paragraphs = [{"text": "What is X?", "is_bold": True}, {"text": "X is a thing"}]
+
+    response = client.get("/api/profiles")
+    assert response.status_code == 404
+    response = client.post("/api/extract", json={"paragraphs": paragraphs}, headers={"X-Profile-Token": "secret"})
+    assert "x-profile-id" not in response.headers
+
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    assert client.get("/api/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
+
+    response = client.post("/api/extract", json={"paragraphs": paragraphs}, headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    admin = {"X-Profile-Token": "secret"}
+    assert [p["id"] for p in client.get("/api/profiles", headers=admin).json()["profiles"]] == [profile_id]
+    profile = client.get(f"/api/profiles/{profile_id}", headers=admin).json()
+    assert profile["summary"]["paragraphs"]["bold"] == 1
+    assert profile["summary"]["cards_out"] == 1
+    stats = client.get(f"/api/profiles/{profile_id}/stats", headers=admin)
+    assert stats.status_code == 200 and stats.content
+
+
+def test_extract_compact():
+    paragraphs = [
+        Paragraph(text="Renal", is_heading=True, heading_level=1),
+        Paragraph(text="What is GFR?", is_bold=True),
+        Paragraph(text="Filtration rate"),
+    ]
+    response = client.post(
+        "/api/extract/compact", content=encode_paragraphs(paragraphs), headers={"Content-Type": "application/gzip"}
+    )
+    assert response.status_code == 200
+    cards = response.json()["cards"]
+    assert [(c["front"], c["back"], c["tags"]) for c in cards] == [("What is GFR?", "Filtration rate", ["Renal"])]
+
+    prefixed = encode_paragraphs([Paragraph(text="Q: What is GFR?"), Paragraph(text="A: Filtration rate")])
+    response = client.post("/api/extract/compact?detectors=prefix", content=prefixed)
+    assert [(c["front"], c["back"]) for c in response.json()["cards"]] == [("What is GFR?", "Filtration rate")]
+
+    response = client.post("/api/extract/compact", content=b"not gzip")
+    assert response.status_code == 400
+
+
+def test_extract_compact_rate_limited_before_decoding(monkeypatch):
+    import main
+    from admission import RateLimiter
+
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter(capacity=1, refill_per_second=0.5))
+    decoded = []
+    monkeypatch.setattr(main, "decode_paragraphs", lambda body, limits: decoded.append(body) or [])
+    body = encode_paragraphs([Paragraph(text="Q: What is GFR?"), Paragraph(text="A: Filtration rate")])
+
+    assert client.post("/api/extract/compact?detectors=prefix", content=body).status_code == 200
+    assert client.post("/api/extract/compact?detectors=prefix", content=body).status_code == 429
+    assert len(decoded) == 1
@@ -0,0 +1,78 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+import card_search
+import result_cache
+from card_search import CardIndex, ResultNotFoundError, get_result, index_result
+from models import ExtractedCard
+
+CARDS = [
+    ExtractedCard(front="What is cardiac output?", back="HR x SV", tags=["Cardiology"]),
+    ExtractedCard(front="Name the heart valves", back="", tags=["Cardiology::Valves"]),
+    ExtractedCard(front="What is GFR?", back="Glomerular filtration rate", tags=["Renal"]),
+    ExtractedCard(front="Draw the nephron", back="", tags=["Renal"], images=["aW1n"]),
+    ExtractedCard(front="Cardiology-Renal link?", back="Cardiorenal syndrome", tags=["Cardiology-Renal"]),
+]
+
+
+def test_search_by_word_prefix():
+    index = CardIndex(CARDS)
+    assert index.search("card") == [0, 4]
+    assert index.search("what is") == [0, 2]
+    assert index.search("filtr GLOM") == [2]
+    assert index.search("nothing") == []
+    assert index.search("") == [0, 1, 2, 3, 4]
+
+
+def test_tag_path_filter_includes_subtags_only():
+    index = CardIndex(CARDS)
+    assert index.search(tag="Cardiology") == [0, 1]
+    assert index.search(tag="Cardiology::Valves") == [1]
+    assert index.search("what", tag="Renal") == [2]
+
+
+def test_empty_answer_filter():
+    index = CardIndex(CARDS)
+    # A card whose answer is only an image is not empty.
+    assert index.search(empty_answer=True) == [1]
+    assert index.search(empty_answer=False) == [0, 2, 3, 4]
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_PATH", str(tmp_path / "results.sqlite3"))
+
+
+def test_results_are_evicted_least_recently_used(monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(card_search, "_results", card_search.OrderedDict())
+    monkeypatch.setattr(card_search, "_results_chars", 0)
+    monkeypatch.setattr(card_search, "MAX_INDEXED_CHARS", 2 * CardIndex(CARDS).chars)
+    first = index_result(CARDS)
+    second = index_result(CARDS)
+    get_result(first)
+    index_result(CARDS)
+    assert [c.front for c in get_result(first).cards] == [c.front for c in CARDS]
+    with pytest.raises(ResultNotFoundError):
+        get_result(second)
+
+
+def test_indexed_cards_drop_images():
+    index = CardIndex(CARDS)
+    assert all(not c.images for c in index.cards)
+    assert index.image_counts == [0, 0, 0, 1, 0]
+    assert CARDS[3].images == ["aW1n"]
+
+
+def test_result_indexed_by_another_worker_is_loaded_from_shared_cache(monkeypatch):
+    result_id = index_result(CARDS)
+    # Another worker process has its own, empty in-memory index.
+    monkeypatch.setattr(card_search, "_results", card_search.OrderedDict())
+    assert get_result(result_id).search("gfr") == [2]
+    assert get_result(result_id).search(empty_answer=True) == [1]
+    with pytest.raises(ResultNotFoundError):
+        get_result("missing")
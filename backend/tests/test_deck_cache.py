@@ -0,0 +1,164 @@
+import sys
+import os
+import base64
+import io
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import deck_cache
+from deck_cache import build_deck_incremental
+from models import ExtractedCard
+
+
+PNG_A = base64.b64encode(b"\x89PNG first image").decode("ascii")
+PNG_B = base64.b64encode(b"\x89PNG second image").decode("ascii")
+
+
+def _read_apkg(apkg: bytes):
+    """Return (notes as {guid: flds}, media manifest, deck names) from an .apkg."""
+    z = zipfile.ZipFile(io.BytesIO(apkg))
+    with tempfile.NamedTemporaryFile(suffix=".anki2", delete=False) as tmp:
+        tmp.write(z.read("collection.anki2"))
+    conn = sqlite3.connect(tmp.name)
+    notes = dict(conn.execute("SELECT guid, flds FROM notes").fetchall())
+    card_count, = conn.execute("SELECT count(*) FROM cards").fetchone()
+    decks_json, = conn.execute("SELECT decks FROM col").fetchone()
+    conn.close()
+    os.remove(tmp.name)
+    deck_names = {d["name"] for d in json.loads(decks_json).values()}
+    assert card_count == len(notes)
+    return notes, json.loads(z.read("media")), deck_names
+
+
+def _cards():
+    return [
+        ExtractedCard(front="Q1?", back="A1", tags=["Cardiology"], images=[PNG_A]),
+        ExtractedCard(front="Q2?", back="A2", tags=["Cardiology"]),
+        ExtractedCard(front="Q3?", back="A3", tags=["Renal"], images=[PNG_B]),
+    ]
+
+
+def test_incremental_matches_full_content():
+    notes, media, decks = _read_apkg(build_deck_incremental(_cards(), "Inc Full"))
+    assert len(notes) == 3
+    assert len(media) == 2
+    assert {"Inc Full::Cardiology", "Inc Full::Renal"} <= decks
+
+
+def test_unchanged_card_set_returns_cached_package():
+    first = build_deck_incremental(_cards(), "Inc Same")
+    second = build_deck_incremental(_cards(), "Inc Same")
+    assert first == second
+
+
+def test_edit_rewrites_only_changed_notes(monkeypatch):
+    build_deck_incremental(_cards(), "Inc Edit")
+
+    written = []
+    original = deck_cache._make_note
+    monkeypatch.setattr(deck_cache, "_make_note", lambda card, *args: written.append(card.front) or original(card, *args))
+
+    cards = _cards()
+    cards[1].back = "A2 edited"
+    notes, media, _ = _read_apkg(build_deck_incremental(cards, "Inc Edit"))
+
+    assert written == ["Q2?"]
+    assert len(notes) == 3
+    assert any("A2 edited" in flds for flds in notes.values())
+    assert len(media) == 2
+
+
+def test_deleted_cards_drop_notes_media_and_subdecks():
+    build_deck_incremental(_cards(), "Inc Delete")
+    notes, media, decks = _read_apkg(build_deck_incremental(_cards()[:2], "Inc Delete"))
+    assert len(notes) == 2
+    assert len(media) == 1
+    assert "Inc Delete::Renal" not in decks
+    artifact = deck_cache._artifacts[("", "Inc Delete")]
+    assert len(os.listdir(artifact.media_dir)) == 1
+
+
+def test_added_card():
+    build_deck_incremental(_cards(), "Inc Add")
+    cards = _cards() + [ExtractedCard(front="Q4?", back="A4", tags=["Neuro"])]
+    notes, _, decks = _read_apkg(build_deck_incremental(cards, "Inc Add"))
+    assert len(notes) == 4
+    assert "Inc Add::Neuro" in decks
+
+
+def test_duplicate_questions_both_survive_incremental_build():
+    cards = [
+        ExtractedCard(front="Define shock", back="Cardio answer", tags=["Cardiology"]),
+        ExtractedCard(front="Define shock", back="Renal answer", tags=["Renal"]),
+    ]
+    notes, _, _ = _read_apkg(build_deck_incremental(cards, "Inc Dupes"))
+    assert len(notes) == 2
+
+
+def test_incremental_adds_note_types_as_they_are_used():
+    build_deck_incremental(_cards(), "Inc Types")
+    cards = _cards() + [ExtractedCard(front="The {{c1::heart}} pumps", back="", note_type="cloze")]
+    apkg = build_deck_incremental(cards, "Inc Types")
+
+    z = zipfile.ZipFile(io.BytesIO(apkg))
+    with tempfile.NamedTemporaryFile(suffix=".anki2", delete=False) as tmp:
+        tmp.write(z.read("collection.anki2"))
+    conn = sqlite3.connect(tmp.name)
+    models = json.loads(conn.execute("SELECT models FROM col").fetchone()[0])
+    mids = {mid for mid, in conn.execute("SELECT DISTINCT mid FROM notes")}
+    conn.close()
+    os.remove(tmp.name)
+
+    assert {str(mid) for mid in mids} <= set(models)
+    assert "Docs to Anki - Cloze" in {m["name"] for m in models.values()}
+
+
+def test_same_deck_name_with_different_build_keys_kept_apart():
+    other = [ExtractedCard(front="Other user's card?", back="B")]
+    first = build_deck_incremental(_cards(), "My Deck", build_key="user-a")
+    build_deck_incremental(other, "My Deck", build_key="user-b")
+    assert build_deck_incremental(_cards(), "My Deck", build_key="user-a") == first
+    assert deck_cache._artifacts[("user-a", "My Deck")] is not deck_cache._artifacts[("user-b", "My Deck")]
+
+
+def test_eviction_waits_for_running_build(monkeypatch):
+    monkeypatch.setattr(deck_cache, "MAX_CACHED_DECKS", 1)
+    build_deck_incremental(_cards(), "Inc Evicted")
+    artifact = deck_cache._artifacts[("", "Inc Evicted")]
+
+    with artifact.lock:  # a build of the deck is in progress
+        other = threading.Thread(target=build_deck_incremental, args=(_cards(), "Inc Evictor"))
+        other.start()
+        time.sleep(0.2)
+        assert os.path.exists(artifact.db_path)
+    other.join(5)
+    assert artifact.removed
+    assert not os.path.exists(artifact.directory)
+    # A later build of the evicted deck starts from a fresh artifact.
+    notes, _, _ = _read_apkg(build_deck_incremental(_cards(), "Inc Evicted"))
+    assert len(notes) == 3
+
+
+def test_build_dirs_of_exited_processes_swept(tmp_path, monkeypatch):
+    monkeypatch.setattr(deck_cache, "BUILD_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(deck_cache, "_process_dir", None)
+    monkeypatch.setattr(deck_cache, "_process_dir_lock", None)
+    monkeypatch.setattr(deck_cache, "_artifacts", deck_cache.OrderedDict())
+    dead = tmp_path / "123-dead"
+    (dead / "media").mkdir(parents=True)
+    (dead / ".lock").touch()
+    alive = tmp_path / "456-alive"
+    alive.mkdir()
+    with open(alive / ".lock", "w") as lock:
+        deck_cache.fcntl.flock(lock, deck_cache.fcntl.LOCK_EX)
+        build_deck_incremental(_cards(), "Inc Sweep")
+        assert not dead.exists()
+        assert alive.exists()
+    assert deck_cache._artifacts[("", "Inc Sweep")].directory.startswith(str(tmp_path))
+
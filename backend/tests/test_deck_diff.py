@@ -0,0 +1,75 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import io
+import zipfile
+
+import pytest
+
+import deck_diff
+from anki_builder import build_deck
+from deck_diff import InvalidPackageError, PackageTooLargeError, diff_cards, read_manifest
+from models import ExtractedCard
+
+
+def _cards():
+    return [
+        ExtractedCard(front="Q1?", back="A1", tags=["Cardiology"]),
+        ExtractedCard(front="Q2?", back="- one\n- two", tags=["Cardiology"]),
+        ExtractedCard(front="Q3?", back="A3", tags=["Renal"]),
+    ]
+
+
+def test_manifest_round_trips_unchanged_cards():
+    manifest = read_manifest(build_deck(_cards(), "Diff Deck"))
+    assert len(manifest) == 3
+    result = diff_cards(_cards(), "Diff Deck", manifest)
+    assert result.new == []
+    assert result.changed == []
+    assert result.unchanged == 3
+    assert result.removed == []
+
+
+def test_diff_reports_new_changed_and_removed():
+    manifest = read_manifest(build_deck(_cards(), "Diff Deck"))
+    cards = _cards()
+    cards[0].back = "A1 edited"
+    del cards[2]
+    cards.append(ExtractedCard(front="Q4?", back="A4"))
+
+    result = diff_cards(cards, "Diff Deck", manifest)
+    assert result.changed == [0]
+    assert result.new == [2]
+    assert result.unchanged == 1
+    assert len(result.removed) == 1
+
+
+def test_delta_deck_contains_only_changed_notes():
+    manifest = read_manifest(build_deck(_cards(), "Diff Deck"))
+    cards = _cards()
+    cards[1].tags = ["Renal"]
+    delta = read_manifest(build_deck(cards, "Diff Deck", manifest=manifest))
+    assert len(delta) == 1
+
+
+def test_invalid_package():
+    with pytest.raises(InvalidPackageError):
+        read_manifest(b"not a zip")
+
+
+def test_newer_export_format_rejected():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("collection.anki2", b"placeholder")
+        z.writestr("collection.anki21b", b"zstd data")
+    with pytest.raises(InvalidPackageError, match="newer Anki export format"):
+        read_manifest(buf.getvalue())
+
+
+def test_oversized_collection_rejected_before_unpacking(monkeypatch):
+    apkg = build_deck(_cards(), "Diff Deck")
+    monkeypatch.setattr(deck_diff, "MAX_COLLECTION_BYTES", 1024)
+    with pytest.raises(PackageTooLargeError):
+        read_manifest(apkg)
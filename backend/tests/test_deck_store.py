@@ -0,0 +1,145 @@
+import sys
+import os
+import base64
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+import deck_store
+from deck_store import (
+    DeckNotFoundError,
+    DeckQuotaError,
+    InvalidImageError,
+    UnknownCardError,
+    collect_garbage,
+    list_versions,
+    load_version,
+    save_version,
+)
+from models import ExtractedCard
+
+PNG = base64.b64encode(b"\x89PNG image").decode("ascii")
+
+
+@pytest.fixture(autouse=True)
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(deck_store, "DECK_STORE_PATH", str(tmp_path / "decks.sqlite3"))
+
+
+def _cards():
+    return [
+        ExtractedCard(front="Q1?", back="A1", tags=["Cardiology"], images=[PNG]),
+        ExtractedCard(front="Q2?", back="A2", tags=["Renal"], note_type="reversed"),
+    ]
+
+
+def test_round_trip():
+    deck_id, version, hashes = save_version(_cards(), "Med")
+    assert version == 1
+    name, loaded_version, cards, loaded_hashes = load_version(deck_id)
+    assert (name, loaded_version, loaded_hashes) == ("Med", 1, hashes)
+    assert cards == _cards()
+
+
+def test_new_version_by_reference():
+    deck_id, _, hashes = save_version(_cards(), "Med")
+    edited = ExtractedCard(front="Q2?", back="A2 edited", tags=["Renal"])
+    _, version, new_hashes = save_version([hashes[0], edited], "Med", deck_id)
+
+    assert version == 2
+    assert new_hashes[0] == hashes[0]
+    _, _, cards, _ = load_version(deck_id, 2)
+    assert cards[0].images == [PNG]
+    assert cards[1].back == "A2 edited"
+    # Earlier versions stay intact.
+    assert load_version(deck_id, 1)[2] == _cards()
+    assert [v for v, _, _ in list_versions(deck_id)[1]] == [1, 2]
+
+
+def test_unchanged_save_reuses_latest_version():
+    deck_id, _, hashes = save_version(_cards(), "Med")
+    assert save_version(hashes, "Med", deck_id)[1] == 1
+
+
+def test_content_addressed_storage_is_shared():
+    save_version(_cards(), "One")
+    save_version(_cards(), "Two")
+    conn = deck_store._connect()
+    counts = [conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("cards", "media")]
+    conn.close()
+    assert counts == [2, 1]
+
+
+def test_errors():
+    with pytest.raises(UnknownCardError):
+        save_version(["0" * 64], "Med")
+    with pytest.raises(DeckNotFoundError):
+        save_version(_cards(), "Med", "missing")
+    with pytest.raises(DeckNotFoundError):
+        load_version("missing")
+    deck_id, _, _ = save_version(_cards(), "Med")
+    with pytest.raises(DeckNotFoundError):
+        load_version(deck_id, 5)
+    with pytest.raises(InvalidImageError):
+        save_version([ExtractedCard(front="Q?", back="A", images=["not base64!"])], "Med")
+
+
+def test_concurrent_saves_get_consecutive_versions():
+    deck_id, _, hashes = save_version(_cards(), "Med")
+    errors = []
+
+    def save(i):
+        try:
+            # By reference only, so nothing is written before the latest version is read.
+            save_version([hashes[0]] * (i + 1), "Med", deck_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [v for v, _, _ in list_versions(deck_id)[1]] == list(range(1, 10))
+
+
+def test_deck_quota_per_client(monkeypatch):
+    monkeypatch.setattr(deck_store, "MAX_DECKS_PER_CLIENT", 2)
+    save_version(_cards(), "One", client="a")
+    deck_id, _, _ = save_version(_cards(), "Two", client="a")
+    with pytest.raises(DeckQuotaError):
+        save_version(_cards(), "Three", client="a")
+    # New versions of an owned deck and other clients' decks are not affected.
+    save_version(_cards()[:1], "Two", deck_id, client="a")
+    save_version(_cards(), "Other", client="b")
+
+
+def test_old_versions_pruned(monkeypatch):
+    monkeypatch.setattr(deck_store, "MAX_DECK_VERSIONS", 2)
+    deck_id, _, _ = save_version(_cards(), "Med")
+    for i in range(3):
+        save_version([ExtractedCard(front=f"Q{i}?", back="A")], "Med", deck_id)
+    assert [v for v, _, _ in list_versions(deck_id)[1]] == [3, 4]
+    with pytest.raises(DeckNotFoundError):
+        load_version(deck_id, 1)
+
+
+def test_garbage_collection_drops_stale_decks_and_orphans():
+    stale_id, _, _ = save_version(_cards(), "Old")
+    fresh_id, _, _ = save_version(_cards()[1:], "New")
+    conn = deck_store._connect()
+    with conn:
+        conn.execute("UPDATE versions SET created = 0 WHERE deck_id = ?", (stale_id,))
+    conn.close()
+
+    assert collect_garbage() == 1
+    with pytest.raises(DeckNotFoundError):
+        load_version(stale_id)
+    assert load_version(fresh_id)[2] == _cards()[1:]
+    conn = deck_store._connect()
+    counts = [conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("cards", "media")]
+    conn.close()
+    assert counts == [1, 0]
@@ -0,0 +1,75 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from dedup import UnsafeMergeError, deduplicate, find_near_duplicates, lsh_params
+from models import ExtractedCard
+
+QUESTIONS = [
+    "What is cardiac output?",
+    "What is GFR?",
+    "What is the cardiac output?",
+    "Name the heart valves",
+    "what is  cardiac-output",
+    "Name the heart valves.",
+]
+
+
+def test_groups_reworded_questions():
+    assert find_near_duplicates(QUESTIONS) == [[0, 4], [3, 5]]
+    assert find_near_duplicates(["What are the side effects of lithium?", "What are side effects of lithium?"]) == [
+        [0, 1]
+    ]
+
+
+def test_templated_questions_about_different_things_kept_apart():
+    questions = [
+        "What is the function of the liver?",
+        "What is the function of the kidney?",
+        "mechanism of action of furosemide",
+        "mechanism of action of bumetanide",
+    ]
+    assert find_near_duplicates(questions) == []
+    cards = [ExtractedCard(front=q, back=str(i)) for i, q in enumerate(questions)]
+    assert len(deduplicate(cards, "merge")) == 4
+
+
+def test_threshold_is_tunable():
+    assert find_near_duplicates(QUESTIONS, threshold=0.6) == [[0, 2, 4], [3, 5]]
+    assert find_near_duplicates(QUESTIONS, threshold=0.95) == [[0, 4], [3, 5]]
+    assert find_near_duplicates(["Define shock", "Define sepsis"], threshold=0.3) == [[0, 1]]
+
+
+def test_lsh_params_track_threshold():
+    bands, rows = lsh_params(0.6)
+    assert abs((1 / bands) ** (1 / rows) - 0.6) < 0.1
+    assert lsh_params(0.9)[1] > lsh_params(0.5)[1]
+
+
+def test_flag_and_merge():
+    def cards():
+        return [
+            ExtractedCard(front="What is cardiac output?", back="HR x SV", tags=["Cardio"]),
+            ExtractedCard(front="What is GFR?", back="Filtration rate"),
+            ExtractedCard(front="what is cardiac-output", back="HR x SV\nAbout 5 L/min", tags=["Physio"]),
+        ]
+
+    flagged = deduplicate(cards(), "flag")
+    assert [c.duplicate_of for c in flagged] == [None, None, 0]
+
+    merged = deduplicate(cards(), "merge")
+    assert [c.front for c in merged] == ["What is cardiac output?", "What is GFR?"]
+    assert merged[0].back == "HR x SV\nAbout 5 L/min"
+    assert merged[0].tags == ["Cardio", "Physio"]
+
+    assert len(deduplicate(cards(), None)) == 3
+
+
+def test_merge_refused_below_safe_threshold():
+    cards = [ExtractedCard(front="Define shock", back="a"), ExtractedCard(front="Define sepsis", back="b")]
+    with pytest.raises(UnsafeMergeError):
+        deduplicate(cards, "merge", 0.3)
+    assert [c.duplicate_of for c in deduplicate(cards, "flag", 0.3)] == [None, 0]
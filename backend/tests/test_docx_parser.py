@@ -0,0 +1,120 @@
+import sys
+import os
+import base64
+import io
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from docx_parser import InvalidDocxError, parse_docx
+from qa_parser import extract_cards
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+PNG = b"\x89PNG\r\n\x1a\nfake image"
+
+
+def _run(text, bold=False, color=None):
+    props = ""
+    if bold or color:
+        props = "<w:rPr>" + ("<w:b/>" if bold else "") + (f'<w:color w:val="{color}"/>' if color else "") + "</w:rPr>"
+    return f'<w:r>{props}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _para(*runs, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{ppr}{''.join(runs)}</w:p>"
+
+
+def _image_para():
+    return (
+        '<w:p><w:r><w:drawing><a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+        '<a:graphicData><a:blip xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+        'r:embed="rIdImg1"/></a:graphicData></a:graphic></w:drawing></w:r></w:p>'
+    )
+
+
+def _table(rows):
+    xml = "<w:tbl>"
+    for row in rows:
+        xml += "<w:tr>" + "".join(f"<w:tc>{_para(_run(cell))}</w:tc>" for cell in row) + "</w:tr>"
+    return xml + "</w:tbl>"
+
+
+def _make_docx(body_xml):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{W_NS}"><w:body>{body_xml}</w:body></w:document>')
+        z.writestr("word/styles.xml", (
+            f'<w:styles xmlns:w="{W_NS}">'
+            '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>'
+            '<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/></w:style>'
+            "</w:styles>"
+        ))
+        z.writestr("word/_rels/document.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rIdImg1" Type="image" Target="media/image1.png"/></Relationships>'
+        ))
+        z.writestr("word/media/image1.png", PNG)
+    return buf.getvalue()
+
+
+def test_bold_question_and_answer():
+    paragraphs = parse_docx(_make_docx(
+        _para(_run("What is X?", bold=True)) + _para(_run("X is "), _run("a thing", bold=True))
+    ))
+    assert [(p.text, p.is_bold) for p in paragraphs] == [("What is X?", True), ("X is a thing", False)]
+
+
+def test_bold_lead_in_and_font_size():
+    sized = '<w:r><w:rPr><w:sz w:val="28"/></w:rPr><w:t>Big line</w:t></w:r>'
+    paragraphs = parse_docx(_make_docx(
+        _para(_run("Furosemide:", bold=True), _run(" loop diuretic")) + _para(sized)
+    ))
+    assert [(p.text, p.is_bold, p.bold_prefix) for p in paragraphs] == [
+        ("Furosemide: loop diuretic", False, 11),
+        ("Big line", False, 0),
+    ]
+    assert paragraphs[1].font_size == 14.0
+
+
+def test_heading_styles_and_colour():
+    paragraphs = parse_docx(_make_docx(
+        _para(_run("CARDIOLOGY"), style="Heading1")
+        + _para(_run("Arrhythmias"), style="Heading2")
+        + _para(_run("PHARMACOLOGY", color="800080"))
+    ))
+    assert [(p.is_heading, p.heading_level) for p in paragraphs[:2]] == [(True, 1), (True, 2)]
+    assert paragraphs[2].text_color == "#800080"
+
+
+def test_table_and_image():
+    paragraphs = parse_docx(_make_docx(
+        _para(_run("Compare drugs", bold=True))
+        + _table([["Drug", "Class"], ["Aspirin", "NSAID"]])
+        + _image_para()
+    ))
+    assert paragraphs[1].is_table
+    assert paragraphs[1].table_html == "<table><tr><th>Drug</th><th>Class</th></tr><tr><td>Aspirin</td><td>NSAID</td></tr></table>"
+    assert paragraphs[2].images == [base64.b64encode(PNG).decode("ascii")]
+    assert len(paragraphs) == 3
+
+
+def test_docx_end_to_end():
+    cards = extract_cards(parse_docx(_make_docx(
+        _para(_run("Cardiology"), style="Heading1")
+        + _para(_run("Define cardiac output", bold=True))
+        + _para(_run("- CO = HR x SV"))
+        + _image_para()
+    )))
+    assert len(cards) == 1
+    assert cards[0].front == "Define cardiac output"
+    assert cards[0].back == "- CO = HR x SV"
+    assert cards[0].tags == ["Cardiology"]
+    assert len(cards[0].images) == 1
+
+
+def test_invalid_docx():
+    with pytest.raises(InvalidDocxError):
+        parse_docx(b"not a zip")
@@ -0,0 +1,80 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from layout import detect_columns, reading_order
+
+PAGE_WIDTH = 612
+
+
+def test_single_column_keeps_native_order():
+    boxes = [(72, 300, 500, 320), (72, 100, 500, 120), (90, 200, 480, 220)]
+    assert reading_order(boxes, PAGE_WIDTH) == [0, 1, 2]
+
+
+def test_two_columns_read_left_then_right():
+    # Interleaved the way PDF content streams often draw two-column pages.
+    boxes = [
+        (72, 100, 290, 120),   # left 1
+        (320, 100, 540, 120),  # right 1
+        (72, 140, 290, 160),   # left 2
+        (320, 140, 540, 160),  # right 2
+    ]
+    assert detect_columns(boxes, PAGE_WIDTH) == [0, 1, 0, 1]
+    assert reading_order(boxes, PAGE_WIDTH) == [0, 2, 1, 3]
+
+
+def test_spanning_title_splits_bands():
+    boxes = [
+        (72, 400, 290, 420),   # left, lower band
+        (72, 60, 540, 80),     # full-width title
+        (320, 100, 540, 120),  # right, upper band
+        (72, 100, 290, 120),   # left, upper band
+        (72, 360, 540, 380),   # full-width divider
+        (320, 400, 540, 420),  # right, lower band
+    ]
+    assert detect_columns(boxes, PAGE_WIDTH)[1] == -1
+    assert reading_order(boxes, PAGE_WIDTH) == [1, 3, 2, 4, 0, 5]
+
+
+def test_empty_and_single_box():
+    assert reading_order([], PAGE_WIDTH) == []
+    assert reading_order([(72, 72, 100, 80)], PAGE_WIDTH) == [0]
+
+
+def test_centred_headings_on_single_column_page():
+    boxes = [
+        (270, 60, 340, 78),    # centred heading
+        (72, 100, 140, 115),   # question
+        (72, 120, 130, 135),   # answer
+        (285, 160, 325, 178),  # centred heading
+        (72, 200, 145, 215),   # question
+        (72, 220, 135, 235),   # answer
+    ]
+    assert max(detect_columns(boxes, PAGE_WIDTH)) <= 0
+    assert reading_order(boxes, PAGE_WIDTH) == [0, 1, 2, 3, 4, 5]
+
+
+def test_figure_beside_text_is_not_a_column():
+    boxes = [
+        (72, 100, 200, 115),   # question
+        (72, 120, 180, 135),   # answer
+        (72, 140, 190, 155),   # answer
+        (400, 100, 500, 200),  # figure to the right
+        (72, 220, 160, 235),   # next question
+    ]
+    assert max(detect_columns(boxes, PAGE_WIDTH)) <= 0
+    assert reading_order(boxes, PAGE_WIDTH) == [0, 1, 2, 3, 4]
+
+
+def test_centred_heading_between_columns_spans():
+    boxes = [
+        (250, 60, 360, 78),    # heading over the gutter
+        (72, 100, 290, 120),
+        (320, 100, 540, 120),
+        (72, 140, 290, 160),
+        (320, 140, 540, 160),
+    ]
+    assert detect_columns(boxes, PAGE_WIDTH) == [-1, 0, 1, 0, 1]
+    assert reading_order(boxes, PAGE_WIDTH) == [0, 1, 3, 2, 4]
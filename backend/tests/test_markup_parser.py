@@ -0,0 +1,107 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from markup_parser import parse_html, parse_markdown
+from qa_parser import extract_cards
+
+IMG_B64 = "iVBORw0KGgo="
+
+
+def test_markdown_headings_bold_and_lists():
+    paragraphs = parse_markdown(
+        "# Cardiology\n"
+        "## Heart failure\n"
+        "**What are the signs?**\n"
+        "* Oedema\n"
+        "- **Crackles** on auscultation\n"
+    )
+    assert [(p.text, p.is_heading, p.heading_level) for p in paragraphs[:2]] == [
+        ("Cardiology", True, 1),
+        ("Heart failure", True, 2),
+    ]
+    assert paragraphs[2].is_bold
+    assert paragraphs[2].text == "What are the signs?"
+    assert [p.text for p in paragraphs[3:]] == ["- Oedema", "- Crackles on auscultation"]
+    assert not paragraphs[4].is_bold
+
+
+def test_markdown_table_and_image():
+    paragraphs = parse_markdown(
+        "**Compare drugs**\n"
+        "| Drug | Class |\n"
+        "|------|-------|\n"
+        "| Aspirin | NSAID |\n"
+        f"![diagram](data:image/png;base64,{IMG_B64})\n"
+    )
+    assert paragraphs[1].is_table
+    assert "<td>Aspirin</td>" in paragraphs[1].table_html
+    assert paragraphs[2].images == [IMG_B64]
+
+
+def test_markdown_end_to_end():
+    cards = extract_cards(parse_markdown("# Renal\n**What is GFR?**\nFiltration rate\n"))
+    assert [(c.front, c.back, c.tags) for c in cards] == [("What is GFR?", "Filtration rate", ["Renal"])]
+
+
+def test_bold_lead_in():
+    md = parse_markdown("**Furosemide:** loop diuretic\n**What is GFR?**\n- **Bold** item\n")
+    assert [(p.text, p.bold_prefix) for p in md] == [
+        ("Furosemide: loop diuretic", 11), ("What is GFR?", 0), ("- Bold item", 0),
+    ]
+    html = parse_html("<p><b>Furosemide:</b> loop diuretic</p><ul><li><b>Bold</b> item</li></ul>")
+    assert [(p.text, p.bold_prefix) for p in html] == [("Furosemide: loop diuretic", 11), ("- Bold item", 0)]
+
+
+def test_html_bold_colour_and_headings():
+    paragraphs = parse_html(
+        "<h1>Cardiology</h1>"
+        '<p><span style="color: #800080">Arrhythmias</span></p>'
+        "<p><strong>What is AF?</strong></p>"
+        "<p>Irregularly <b>irregular</b> rhythm</p>"
+        '<p><span style="font-weight:700">Bold via CSS</span></p>'
+    )
+    assert (paragraphs[0].is_heading, paragraphs[0].heading_level) == (True, 1)
+    assert paragraphs[1].text_color == "#800080"
+    assert [(p.text, p.is_bold) for p in paragraphs[2:]] == [
+        ("What is AF?", True),
+        ("Irregularly irregular rhythm", False),
+        ("Bold via CSS", True),
+    ]
+
+
+def test_html_void_elements_do_not_leak_style():
+    paragraphs = parse_html(
+        "<p><strong>What is AF?</strong></p>"
+        '<hr style="color: #ff6600">'
+        '<p>Irregular<wbr style="font-weight:bold"> rhythm<input type="checkbox" style="font-weight:700"></p>'
+        "<p>No P waves</p>"
+    )
+    assert [(p.text, p.is_bold, p.text_color) for p in paragraphs] == [
+        ("What is AF?", True, None),
+        ("Irregular rhythm", False, None),
+        ("No P waves", False, None),
+    ]
+
+
+def test_html_lists_tables_and_images():
+    paragraphs = parse_html(
+        "<p><b>Compare drugs</b></p>"
+        "<ol><li>First</li><li>Second</li></ol>"
+        "<ul><li>Point</li></ul>"
+        "<table><tr><th>Drug</th><th>Class</th></tr><tr><td>Aspirin</td><td>NSAID</td></tr></table>"
+        f'<p><img src="data:image/png;base64,{IMG_B64}"></p>'
+        '<p><img src="https://example.com/remote.png"></p>'
+    )
+    assert [p.text for p in paragraphs[1:4]] == ["1. First", "2. Second", "- Point"]
+    assert paragraphs[4].table_html.startswith("<table><tr><th>Drug</th>")
+    assert paragraphs[5].images == [IMG_B64]
+    assert len(paragraphs) == 6
+
+
+def test_html_end_to_end():
+    cards = extract_cards(parse_html(
+        "<h2>Renal</h2><p><b>What is GFR?</b></p><ul><li>Filtration rate</li></ul>"
+    ))
+    assert [(c.front, c.back, c.tags) for c in cards] == [("What is GFR?", "- Filtration rate", ["Renal"])]
@@ -0,0 +1,28 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from note_types import BASIC, BASIC_MODEL_ID, CLOZE, REVERSED, get_model, resolve_note_type
+
+
+def test_models_are_cached():
+    assert get_model(CLOZE, "css") is get_model(CLOZE, "css")
+    assert get_model(CLOZE, "css") is not get_model(CLOZE, "other css")
+
+
+def test_model_ids():
+    assert get_model(BASIC, "css").model_id == BASIC_MODEL_ID
+    ids = {get_model(t, "css").model_id for t in (BASIC, REVERSED, CLOZE)}
+    assert len(ids) == 3
+    # IDs follow the configuration, so a CSS change gives a new note type.
+    assert get_model(CLOZE, "css").model_id != get_model(CLOZE, "other css").model_id
+
+
+def test_resolve_note_type():
+    assert resolve_note_type(None, BASIC, "Q") == BASIC
+    assert resolve_note_type(None, REVERSED, "Q") == REVERSED
+    assert resolve_note_type(REVERSED, BASIC, "Q") == REVERSED
+    assert resolve_note_type(None, CLOZE, "{{c1::Q}}") == CLOZE
+    # Cloze without markers would produce no cards.
+    assert resolve_note_type(CLOZE, BASIC, "Q") == BASIC
@@ -0,0 +1,161 @@
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import fitz
+import pytest
+
+import ocr
+from pdf_parser import parse_pdf
+
+
+def _text_page():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text(fitz.Point(72, 72), "What is the answer?", fontname="hebo", fontsize=14)
+    for i in range(4):
+        page.insert_text(fitz.Point(72, 100 + i * 22), f"plain answer line {i}", fontname="helv", fontsize=14)
+    return doc, page
+
+
+def _scanned_pdf():
+    """A PDF whose only page is an image of text, like a scanned handout."""
+    doc, page = _text_page()
+    png = page.get_pixmap(dpi=150).tobytes("png")
+    scan = fitz.open()
+    scan_page = scan.new_page()
+    scan_page.insert_image(scan_page.rect, stream=png)
+    pdf_bytes = scan.tobytes()
+    scan.close()
+    doc.close()
+    return pdf_bytes
+
+
+def test_infer_bold_from_glyph_weight():
+    doc, page = _text_page()
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block["lines"]:
+            spans = [dict(span, flags=0) for span in line["spans"]]
+            lines.append(spans)
+    pix = page.get_pixmap(dpi=ocr.OCR_DPI, colorspace=fitz.csGRAY)
+    ocr.infer_bold(lines, pix, ocr.OCR_DPI)
+    bold = [line[0]["text"] for line in lines if line[0]["flags"] & 16]
+    assert bold == ["What is the answer?"]
+    doc.close()
+
+
+def test_scanned_page_goes_through_ocr(monkeypatch):
+    lines = [
+        [{"text": "What is X?", "bbox": (72, 60, 200, 76), "flags": 16, "font": "GlyphLessFont", "color": 0, "size": 14}],
+        [{"text": "X is a thing", "bbox": (72, 90, 200, 106), "flags": 0, "font": "GlyphLessFont", "color": 0, "size": 14}],
+    ]
+    monkeypatch.setattr(ocr, "ocr_enabled", lambda: True)
+    monkeypatch.setattr(ocr, "ocr_pages", lambda pages: ({page.number: lines for page in pages}, []))
+
+    paragraphs = parse_pdf(_scanned_pdf())
+    assert [(p.text, p.is_bold) for p in paragraphs] == [("What is X?", True), ("X is a thing", False)]
+
+
+def test_scanned_page_without_ocr_keeps_image(monkeypatch):
+    monkeypatch.setattr(ocr, "ocr_enabled", lambda: False)
+    paragraphs = parse_pdf(_scanned_pdf())
+    assert len(paragraphs) == 1
+    assert paragraphs[0].images
+
+
+def test_ocr_results_cached_by_page_image(monkeypatch):
+    calls = []
+
+    def fake_ocr(png, dpi, language):
+        calls.append(1)
+        return [[{"text": "Q?", "bbox": (72, 60, 120, 76), "flags": 0, "font": "", "color": 0, "size": 12}]]
+
+    monkeypatch.setattr(ocr, "_ocr_image", fake_ocr)
+    monkeypatch.setattr(ocr, "_new_pool", lambda: ocr._OCRPool(ThreadPoolExecutor(max_workers=1)))
+    monkeypatch.setattr(ocr, "_pool", None)
+    monkeypatch.setattr(ocr, "_cache", type(ocr._cache)())
+
+    doc = fitz.open(stream=_scanned_pdf(), filetype="pdf")
+    first = ocr.ocr_pages([doc[0]])
+    second = ocr.ocr_pages([doc[0]])
+    doc.close()
+    assert first == second
+    assert first[1] == []
+    assert len(calls) == 1
+
+
+def test_timeout_retires_pool_without_failing_other_pages(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def fake_ocr(png, dpi, language):
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+        return [[{"text": "Q?", "bbox": (72, 60, 120, 76), "flags": 0, "font": "", "color": 0, "size": 12}]]
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(ocr, "_ocr_image", fake_ocr)
+    monkeypatch.setattr(ocr, "_new_pool", lambda: ocr._OCRPool(executor))
+    monkeypatch.setattr(ocr, "_pool", None)
+    monkeypatch.setattr(ocr, "_cache", type(ocr._cache)())
+    monkeypatch.setattr(ocr, "OCR_PAGE_TIMEOUT", 0.2)
+
+    scan = fitz.open(stream=_scanned_pdf(), filetype="pdf")
+    doc = fitz.open()
+    doc.insert_pdf(scan)
+    doc.insert_pdf(scan)
+    doc[1].draw_rect(fitz.Rect(0, 0, 10, 10), fill=(0, 0, 0))
+    lines, failed = ocr.ocr_pages([doc[0], doc[1]])
+    # The slow page failed, the other page on the retired pool still finished,
+    # and then the pool was shut down.
+    assert failed == [0]
+    assert list(lines) == [1]
+    assert ocr._pool is None
+    assert executor._shutdown
+    release.set()
+    executor.shutdown(wait=True)
+    doc.close()
+    scan.close()
+
+
+def test_pages_submitted_in_window_of_workers(monkeypatch):
+    submitted, waited, in_flight = [], [], []
+    submit, wait = ocr._submit, ocr._wait
+
+    def counting_submit(png):
+        submitted.append(1)
+        in_flight.append(len(submitted) - len(waited))
+        return submit(png)
+
+    def counting_wait(*args):
+        waited.append(1)
+        return wait(*args)
+
+    monkeypatch.setattr(ocr, "_ocr_image", lambda png, dpi, language: [])
+    monkeypatch.setattr(ocr, "_new_pool", lambda: ocr._OCRPool(ThreadPoolExecutor(max_workers=2)))
+    monkeypatch.setattr(ocr, "_pool", None)
+    monkeypatch.setattr(ocr, "_cache", type(ocr._cache)())
+    monkeypatch.setattr(ocr, "OCR_WORKERS", 2)
+    monkeypatch.setattr(ocr, "_submit", counting_submit)
+    monkeypatch.setattr(ocr, "_wait", counting_wait)
+
+    doc = fitz.open()
+    for i in range(5):
+        page = doc.new_page(width=100, height=100)
+        page.draw_rect(fitz.Rect(i * 10, 0, i * 10 + 5, 5), fill=(0, 0, 0))
+    lines, failed = ocr.ocr_pages(list(doc))
+    doc.close()
+    assert (sorted(lines), failed) == ([0, 1, 2, 3, 4], [])
+    assert len(submitted) == 5
+    assert max(in_flight) == 2
+
+
+@pytest.mark.skipif(not ocr.tesseract_available(), reason="Tesseract is not installed")
+def test_real_ocr_extracts_text():
+    paragraphs = parse_pdf(_scanned_pdf())
+    assert any("answer" in p.text.lower() for p in paragraphs)
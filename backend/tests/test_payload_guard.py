@@ -0,0 +1,65 @@
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from payload_guard import JSONBodyScanner, PayloadLimits, PayloadTooLargeError
+
+
+def _scan(body: bytes, limits: PayloadLimits, chunk_size: int = 7) -> JSONBodyScanner:
+    scanner = JSONBodyScanner(limits)
+    for i in range(0, len(body), chunk_size):
+        scanner.feed(body[i:i + chunk_size])
+    return scanner
+
+
+def test_counts_items_text_and_images_across_chunks():
+    body = json.dumps({
+        "paragraphs": [
+            {"text": "What is \"X\"?", "is_bold": True, "images": []},
+            {"text": "X", "is_bold": False, "images": ["QUJD", "REVGRw=="]},
+            {"text": "[not, a, list]", "heading_level": None},
+        ]
+    }).encode()
+    scanner = _scan(body, PayloadLimits(items_key="paragraphs"))
+    assert scanner.items == 3
+    assert scanner.image_bytes == len("QUJD") + len("REVGRw==")
+    # Text counts raw string bytes, escapes included.
+    assert scanner.text_bytes == len('What is \\"X\\"?') + len("X") + len("[not, a, list]")
+
+
+def test_nested_lists_are_not_counted_as_items():
+    body = json.dumps({"cards": [{"front": "Q", "back": "A", "tags": ["a", "b", "c"]}]}).encode()
+    assert _scan(body, PayloadLimits(items_key="cards")).items == 1
+
+
+@pytest.mark.parametrize("limits, message", [
+    (PayloadLimits(items_key="paragraphs", max_items=1), "Too many paragraphs"),
+    (PayloadLimits(items_key="paragraphs", max_text_bytes=5), "Too much text"),
+    (PayloadLimits(items_key="paragraphs", max_image_bytes=3), "Image too large"),
+    (PayloadLimits(items_key="paragraphs", max_total_image_bytes=6), "Too much image data"),
+    (PayloadLimits(items_key="paragraphs", max_body_bytes=10), "Request body too large"),
+])
+def test_limits(limits, message):
+    body = json.dumps({"paragraphs": [
+        {"text": "abc", "images": ["QUJD"]},
+        {"text": "def", "images": ["QUJD"]},
+    ]}).encode()
+    with pytest.raises(PayloadTooLargeError, match=message):
+        _scan(body, limits)
+
+
+def test_depth_limit():
+    body = b'{"paragraphs": ' + b"[" * 20 + b"]" * 20 + b"}"
+    with pytest.raises(PayloadTooLargeError, match="nested"):
+        _scan(body, PayloadLimits(items_key="paragraphs"))
+
+
+def test_rejects_early_without_reading_rest():
+    scanner = JSONBodyScanner(PayloadLimits(items_key="cards", max_items=2))
+    with pytest.raises(PayloadTooLargeError):
+        scanner.feed(b'{"cards": [{}, {}, {}')
+    assert scanner.body_bytes < 30
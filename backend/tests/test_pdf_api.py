@@ -53,3 +53,117 @@ def test_pdf_upload_empty_pdf():
     )
     assert response.status_code == 200
     assert response.json()["cards"] == []
+
+
+def _make_pdf(question, answer):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text(fitz.Point(72, 72), question, fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 92), answer, fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_pdf_upload_batch_merges_files_in_order():
+    response = client.post(
+        "/api/pdf-upload-batch",
+        files=[
+            ("files", ("Lecture 1.pdf", _make_pdf("What is X?", "X is a thing"), "application/pdf")),
+            ("files", ("Lecture 2.pdf", _make_pdf("What is Y?", "Y is another"), "application/pdf")),
+            ("files", ("broken.pdf", b"%PDF-1.4 garbage", "application/pdf")),
+        ],
+        data={"tag_by_filename": "true"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["front"] for c in data["cards"]] == ["What is X?", "What is Y?"]
+    assert data["cards"][0]["tags"] == ["Lecture-1"]
+    assert data["failed"] == ["broken.pdf"]
+
+
+def test_pdf_upload_batch_hands_workers_file_paths(monkeypatch):
+    import main
+    from starlette.concurrency import run_in_threadpool
+
+    paths = []
+
+    async def run_inline(fn, path):
+        paths.append(path)
+        assert os.path.isfile(path)
+        return await run_in_threadpool(fn, path)
+
+    monkeypatch.setattr(main, "run_in_worker", run_inline)
+    response = client.post(
+        "/api/pdf-upload-batch",
+        files=[("files", ("a.pdf", _make_pdf("What is X?", "X is a thing"), "application/pdf"))],
+    )
+    assert [c["front"] for c in response.json()["cards"]] == ["What is X?"]
+    assert len(paths) == 1
+    # The batch's temp files are removed once the response has been sent.
+    assert not os.path.exists(os.path.dirname(paths[0]))
+
+
+def test_pdf_upload_batch_size_limit(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 1500)
+    pdf_bytes = _make_pdf("What is X?", "X is a thing")
+    assert len(pdf_bytes) < 1500 < 2 * len(pdf_bytes)
+    response = client.post(
+        "/api/pdf-upload-batch",
+        files=[
+            ("files", ("a.pdf", pdf_bytes, "application/pdf")),
+            ("files", ("b.pdf", pdf_bytes, "application/pdf")),
+        ],
+    )
+    assert response.status_code == 413
+
+
+def test_pdf_upload_batch_rejects_non_pdf():
+    response = client.post(
+        "/api/pdf-upload-batch",
+        files=[("files", ("notes.txt", b"hello", "text/plain"))],
+    )
+    assert response.status_code == 400
+
+
+def test_pdf_upload_large_file_memory_mapped():
+    """Uploads above the spool threshold are parsed straight from the mapped temp file."""
+    import random
+
+    rng = random.Random(0)
+    noise = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 700, 700), False)
+    noise.set_rect(noise.irect, (0, 0, 0))
+    samples = bytes(rng.getrandbits(8) for _ in range(len(noise.samples)))
+    noise = fitz.Pixmap(fitz.csRGB, 700, 700, samples, False)
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text(fitz.Point(72, 72), "What is X?", fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 92), "X is a thing", fontname="helv", fontsize=12)
+    page.insert_image(fitz.Rect(72, 120, 300, 348), pixmap=noise)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    assert len(pdf_bytes) > 1024 * 1024
+
+    response = client.post(
+        "/api/pdf-upload",
+        files={"file": ("big.pdf", pdf_bytes, "application/pdf")},
+    )
+    assert response.status_code == 200
+    assert response.json()["cards"][0]["front"] == "What is X?"
+
+
+def test_pdf_upload_rejects_oversized_body_from_content_length(monkeypatch):
+    import main
+
+    response = client.post(
+        "/api/pdf-upload",
+        content=b"x" * 10,
+        headers={
+            "Content-Type": "multipart/form-data; boundary=abc",
+            "Content-Length": str(main.MAX_PDF_SIZE * 2),
+        },
+    )
+    assert response.status_code == 413
@@ -4,7 +4,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import fitz
 
-from pdf_parser import parse_pdf
+import pytest
+
+from pdf_parser import InvalidPageRangeError, outline_pages, parse_page_ranges, parse_pdf
 
 
 def _make_pdf(blocks):
@@ -143,3 +145,268 @@ def test_end_to_end_with_qa_parser():
     assert cards[0].back == "A painkiller"
     assert "Pharmacology" in cards[0].tags
     assert cards[1].front == "What is ibuprofen?"
+
+
+def _make_table_pdf(question="What are the drug classes?", rows=None):
+    """Create a PDF with a bold question followed by a ruled 3x3 table and a trailing line."""
+    rows = rows or [["Drug", "Class", "Use"], ["Aspirin", "NSAID", "Pain"], ["Warfarin", "VKA", "Clots"]]
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text(fitz.Point(72, 72), question, fontname="hebo", fontsize=12)
+    x0, y0, w, h = 72, 100, 120, 20
+    for r in range(len(rows) + 1):
+        page.draw_line((x0, y0 + r * h), (x0 + w * 3, y0 + r * h))
+    for c in range(4):
+        page.draw_line((x0 + c * w, y0), (x0 + c * w, y0 + h * len(rows)))
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            page.insert_text(fitz.Point(x0 + c * w + 4, y0 + r * h + 14), cell, fontname="helv", fontsize=10)
+    page.insert_text(fitz.Point(72, y0 + h * len(rows) + 30), "- after the table", fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_table_extracted_as_html():
+    paragraphs = parse_pdf(_make_table_pdf())
+    tables = [p for p in paragraphs if p.is_table]
+    assert len(tables) == 1
+    assert tables[0].table_html.startswith("<table><tr><th>Drug</th>")
+    assert "<td>Warfarin</td>" in tables[0].table_html
+    assert not any("Aspirin" in p.text for p in paragraphs if not p.is_table)
+    texts = [p.text for p in paragraphs]
+    assert texts.index(tables[0].text) == 1
+    assert texts[-1] == "- after the table"
+
+
+def test_only_thin_rectangles_count_as_ruling_lines():
+    from pdf_parser import _count_ruling_lines
+
+    doc = fitz.open()
+    page = doc.new_page()
+    # A highlight and a background box are not rules, however many there are.
+    page.draw_rect(fitz.Rect(50, 50, 300, 100), fill=(1, 1, 0), color=None)
+    page.draw_rect(fitz.Rect(0, 0, 595, 842), fill=(0.95, 0.95, 0.95), color=None)
+    assert _count_ruling_lines(page) == 0
+    for i in range(4):
+        page.draw_rect(fitz.Rect(50, 120 + i * 20, 300, 120.5 + i * 20), fill=(0, 0, 0), color=None)
+    assert _count_ruling_lines(page) == 4
+    doc.close()
+
+
+def test_table_end_to_end():
+    from qa_parser import extract_cards
+
+    cards = extract_cards(parse_pdf(_make_table_pdf()))
+    assert len(cards) == 1
+    assert "<table>" in cards[0].back
+    assert "- after the table" in cards[0].back
+
+
+def test_page_without_rules_skips_table_detection(monkeypatch):
+    called = []
+    monkeypatch.setattr(fitz.Page, "find_tables", lambda self, **kw: called.append(1))
+    parse_pdf(_make_pdf([("Q?", "hebo", 12, (0, 0, 0), True), ("A", "helv", 12, (0, 0, 0), False)]))
+    assert called == []
+
+
+def test_two_column_reading_order():
+    """Questions and answers in two columns are not interleaved across columns."""
+    from qa_parser import extract_cards
+
+    doc = fitz.open()
+    page = doc.new_page()
+    rows = [
+        ("Left question?", "Right question?", "hebo"),
+        ("Left answer", "Right answer", "helv"),
+    ]
+    y = 100
+    for left, right, font in rows:
+        page.insert_text(fitz.Point(72, y), left, fontname=font, fontsize=12)
+        page.insert_text(fitz.Point(330, y), right, fontname=font, fontsize=12)
+        y += 20
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    cards = extract_cards(parse_pdf(pdf_bytes))
+    assert [(c.front, c.back) for c in cards] == [
+        ("Left question?", "Left answer"),
+        ("Right question?", "Right answer"),
+    ]
+
+
+def _png_bytes(color=(255, 0, 0)):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+    pix.set_rect(pix.irect, color)
+    return pix.tobytes("png")
+
+
+def test_centred_headings_and_side_figure_on_single_column_page():
+    from qa_parser import extract_cards
+
+    doc = fitz.open()
+    page = doc.new_page()
+    orange = (1, 0.4, 0)
+
+    def centred(text, y):
+        width = fitz.get_text_length(text, fontname="hebo", fontsize=16)
+        page.insert_text(fitz.Point((page.rect.width - width) / 2, y), text, fontname="hebo", fontsize=16, color=orange)
+
+    centred("Cardiology", 72)
+    page.insert_text(fitz.Point(72, 110), "What is HR?", fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 130), "Beats per minute", fontname="helv", fontsize=12)
+    page.insert_image(fitz.Rect(400, 100, 500, 200), stream=_png_bytes())
+    centred("Renal", 240)
+    page.insert_text(fitz.Point(72, 280), "What is GFR?", fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 300), "Filtration rate", fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    cards = extract_cards(parse_pdf(pdf_bytes))
+    assert [(c.front, c.tags, len(c.images)) for c in cards] == [
+        ("What is HR?", ["Cardiology"], 1),
+        ("What is GFR?", ["Renal"], 0),
+    ]
+
+
+def test_image_attached_to_card_it_appears_under():
+    from qa_parser import extract_cards
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text(fitz.Point(72, 72), "What does X look like?", fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 92), "Like this", fontname="helv", fontsize=12)
+    page.insert_image(fitz.Rect(72, 100, 136, 164), stream=_png_bytes())
+    page.insert_text(fitz.Point(72, 190), "What is Y?", fontname="hebo", fontsize=12)
+    page.insert_text(fitz.Point(72, 210), "Y is text only", fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    paragraphs = parse_pdf(pdf_bytes)
+    image_index = next(i for i, p in enumerate(paragraphs) if p.images)
+    assert [p.text for p in paragraphs[:image_index]] == ["What does X look like?", "Like this"]
+
+    cards = extract_cards(paragraphs)
+    assert len(cards) == 2
+    assert len(cards[0].images) == 1
+    assert cards[1].images == []
+
+
+def test_repeated_image_decoded_once(monkeypatch):
+    import pdf_parser
+
+    doc = fitz.open()
+    png = _png_bytes()
+    for _ in range(3):
+        page = doc.new_page()
+        page.insert_text(fitz.Point(72, 72), "Q?", fontname="hebo", fontsize=12)
+        page.insert_image(fitz.Rect(72, 100, 136, 164), stream=png)
+    pdf_bytes = doc.tobytes(garbage=3)
+    doc.close()
+
+    calls = []
+    original = pdf_parser._xref_to_base64
+    monkeypatch.setattr(pdf_parser, "_xref_to_base64", lambda d, x: calls.append(x) or original(d, x))
+    paragraphs = parse_pdf(pdf_bytes)
+    assert sum(1 for p in paragraphs if p.images) == 3
+    assert len(calls) == 1
+
+
+def _make_sectioned_pdf():
+    """Four pages, each with an orange heading and one card, plus a matching outline."""
+    orange = (1, 102 / 255, 0)
+    doc = fitz.open()
+    for topic in ["Cardiology", "Pharmacology", "Pharmacology", "Renal"]:
+        page = doc.new_page()
+        page.insert_text((72, 72), topic.upper(), fontname="helv", fontsize=14, color=orange)
+        page.insert_text((72, 100), f"{topic} question {doc.page_count}?", fontname="hebo", fontsize=12)
+        page.insert_text((72, 120), "Answer", fontname="helv", fontsize=12)
+    doc.set_toc([[1, "Cardiology", 1], [1, "Pharmacology", 2], [2, "Antibiotics", 3], [1, "Renal", 4]])
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-3,7", 10) == [0, 1, 2, 6]
+    assert parse_page_ranges("8-", 10) == [7, 8, 9]
+    assert parse_page_ranges("-2, 2", 10) == [0, 1]
+    assert parse_page_ranges("9-20", 10) == [8, 9]
+    for spec in ["", "a", "3-1", "0", "1-2-3"]:
+        with pytest.raises(InvalidPageRangeError):
+            parse_page_ranges(spec, 10)
+
+
+def test_page_range_limits_parsing():
+    paragraphs = parse_pdf(_make_sectioned_pdf(), page_range="2-3")
+    texts = [p.text for p in paragraphs]
+    assert "Pharmacology question 2?" in texts
+    assert "Pharmacology question 3?" in texts
+    assert not any("Cardiology" in t or "Renal" in t for t in texts)
+
+
+def test_outline_pages_selects_sections():
+    toc = [[1, "Cardiology", 1], [1, "Pharmacology", 2], [2, "Antibiotics", 3], [1, "Renal", 5]]
+    # A section ends on the page where the next one starts, which it may share.
+    assert outline_pages(toc, 6, ["Pharmacology::*"]) == {1, 2, 3, 4}
+    assert outline_pages(toc, 6, ["Pharmacology::Antibiotics"]) == {2, 3, 4}
+    # Deeper than the outline goes: fall back to the enclosing section.
+    assert outline_pages(toc, 6, ["Renal::Dialysis"]) == {4, 5}
+    assert outline_pages(toc, 6, ["Neurology"]) is None
+    assert outline_pages([], 6, ["Renal"]) is None
+
+
+def test_tags_parse_only_matching_sections():
+    paragraphs = parse_pdf(_make_sectioned_pdf(), tags=["Renal"])
+    texts = [p.text for p in paragraphs]
+    assert "Renal question 4?" in texts
+    assert not any("Cardiology" in t for t in texts)
+
+
+def test_bold_lead_in_and_font_size():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Furosemide:", fontname="hebo", fontsize=11)
+    lead_width = fitz.get_text_length("Furosemide: ", fontname="hebo", fontsize=11)
+    page.insert_text((72 + lead_width, 72), "loop diuretic", fontname="helv", fontsize=11)
+    page.insert_text((72, 110), "Big question?", fontname="helv", fontsize=16)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    paragraphs = parse_pdf(pdf_bytes)
+    assert [(p.text, p.is_bold, p.bold_prefix, p.font_size) for p in paragraphs] == [
+        ("Furosemide: loop diuretic", False, 11, 11.0),
+        ("Big question?", False, 0, 16.0),
+    ]
+
+
+def _make_nested_pdf(outline=True):
+    """Pharmacology > Antibiotics on pages 1-2, then Cardiology on page 3."""
+    orange, purple = (1, 102 / 255, 0), (128 / 255, 0, 128 / 255)
+    doc = fitz.open()
+    for heading, color, question in [
+        ("PHARMACOLOGY", orange, "What is a drug?"),
+        ("ANTIBIOTICS", purple, "What does penicillin target?"),
+        ("CARDIOLOGY", orange, "What is AF?"),
+    ]:
+        page = doc.new_page()
+        page.insert_text((72, 72), heading, fontname="helv", fontsize=14, color=color)
+        page.insert_text((72, 100), question, fontname="hebo", fontsize=12)
+        page.insert_text((72, 120), "Answer", fontname="helv", fontsize=12)
+    if outline:
+        doc.set_toc([[1, "Pharmacology", 1], [2, "Antibiotics", 2], [1, "Cardiology", 3]])
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_nested_section_keeps_parent_heading():
+    from qa_parser import extract_cards, filter_by_tags
+
+    tags = ["Pharmacology::Antibiotics"]
+    cards = filter_by_tags(extract_cards(parse_pdf(_make_nested_pdf(), tags=tags)), tags)
+    assert [(c.front, c.tags) for c in cards] == [("What does penicillin target?", ["Pharmacology::Antibiotics"])]
+
+    for pdf_bytes in (_make_nested_pdf(), _make_nested_pdf(outline=False)):
+        cards = extract_cards(parse_pdf(pdf_bytes, page_range="2"))
+        assert [(c.front, c.tags) for c in cards] == [("What does penicillin target?", ["Pharmacology::Antibiotics"])]
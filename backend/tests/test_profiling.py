@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import fitz
+import pytest
+
+import profiling
+from models import ExtractedCard, Paragraph
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    return tmp_path
+
+
+def test_start_requires_admin_token(monkeypatch):
+    assert profiling.start("extract", {}) is None
+    assert profiling.start("extract", {"x-profile-token": "wrong"}) is None
+    assert profiling.start("extract", {"x-profile-token": "secret"}) is not None
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert profiling.start("extract", {"x-profile-token": ""}) is None
+
+
+def test_call_without_profile_runs_directly():
+    assert profiling.call(None, sum, [1, 2]) == 3
+
+
+def test_saved_profile_lists_top_functions(profile_dir):
+    profile = profiling.RequestProfile("extract")
+    assert profiling.call(profile, sorted, [3, 1, 2]) == [1, 2, 3]
+    profile.summary["cards_out"] = 3
+    profile_id = profile.save()
+
+    assert (profile_dir / f"{profile_id}.prof").exists()
+    meta = profiling.load_profile(profile_id)
+    assert meta["endpoint"] == "extract"
+    assert meta["summary"] == {"cards_out": 3}
+    assert any("sorted" in f["function"] for f in meta["top"])
+    assert [p["id"] for p in profiling.list_profiles()] == [profile_id]
+
+
+def test_unknown_or_malformed_profile_id():
+    with pytest.raises(profiling.ProfileNotFoundError):
+        profiling.load_profile("0" * 32)
+    with pytest.raises(profiling.ProfileNotFoundError):
+        profiling.stats_path("../secrets")
+
+
+def test_old_profiles_pruned(monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_PROFILES", 2)
+    for _ in range(4):
+        profiling.RequestProfile("extract").save()
+    assert len(profiling.list_profiles()) == 2
+
+
+def test_summaries_do_not_contain_content():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Confidential question?", fontname="hebo", fontsize=12)
+    page.insert_text((72, 90), "Confidential answer", fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    summary = profiling.summarize_pdf(pdf_bytes)
+    assert summary["page_count"] == 1
+    assert summary["pages"][0]["lines"] == 2
+    assert summary["pages"][0]["fonts"] == 2
+
+    paragraphs = [Paragraph(text="Confidential question?", is_bold=True), Paragraph(text="a\nb")]
+    cards = [ExtractedCard(front="Confidential question?", back="Confidential answer")]
+    for s in (summary, profiling.summarize_paragraphs(paragraphs), profiling.summarize_cards(cards)):
+        assert "Confidential" not in str(s)
+    assert profiling.summarize_paragraphs(paragraphs)["lines"] == 3
@@ -2,8 +2,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from models import Paragraph
-from qa_parser import extract_cards, sanitize_tag
+from models import ExtractedCard, Paragraph
+from qa_parser import extract_cards, filter_by_tags, sanitize_tag, tag_matches
 
 
 BIPOLAR_PARAGRAPHS = [
@@ -253,3 +253,73 @@ def test_images_across_multiple_answer_lines():
     ]
     cards = extract_cards(paragraphs)
     assert cards[0].images == ["img1", "img2"]
+
+
+def test_to_cloze():
+    from qa_parser import to_cloze
+
+    assert to_cloze("no markers here") is None
+    assert to_cloze("a == b") is None
+    assert to_cloze("The ==heart== has ==four== chambers") == "The {{c1::heart}} has {{c2::four}} chambers"
+    assert to_cloze("{{c1::Paris}} is in ==France==") == "{{c1::Paris}} is in {{c2::France}}"
+    assert to_cloze("{{c1::Paris}} is in ==France==", highlights=False) == "{{c1::Paris}} is in {{c2::France}}"
+    assert to_cloze("The ==heart==", highlights=False) is None
+
+
+def test_to_cloze_ignores_comparisons_and_code():
+    from qa_parser import to_cloze
+
+    assert to_cloze("x == 1 and y == 2") is None
+    assert to_cloze("a==b and c==d") is None
+    assert to_cloze("x === y and z === w") is None
+    assert to_cloze("Use `==x==` in Markdown") is None
+    assert to_cloze("Use `==x==` to mark ==terms==") == "Use `==x==` to mark {{c1::terms}}"
+
+
+def test_highlighted_paragraph_becomes_cloze_card():
+    paragraphs = [
+        Paragraph(text="CARDIO", is_heading=True, heading_level=1),
+        Paragraph(text="The ==heart== has four chambers"),
+        Paragraph(text="Extra context"),
+        Paragraph(text="The ==aorta== leaves the left ventricle"),
+        Paragraph(text="Name the {{c1::aorta}}", is_bold=True),
+    ]
+    cards = extract_cards(paragraphs)
+    assert [c.note_type for c in cards] == ["cloze", "cloze", "cloze"]
+    assert cards[0].front == "The {{c1::heart}} has four chambers"
+    assert cards[0].back == "Extra context"
+    assert cards[0].tags == ["Cardio"]
+    assert cards[1].front == "The {{c1::aorta}} leaves the left ventricle"
+    assert cards[2].front == "Name the {{c1::aorta}}"
+
+
+def test_highlights_in_qa_cards_stay_qa():
+    paragraphs = [
+        Paragraph(text="What is ==GFR==?", is_bold=True),
+        Paragraph(text="X is a thing"),
+        Paragraph(text="The ==heart== has four chambers"),
+        Paragraph(text="x == 1 and y == 2"),
+    ]
+    cards = extract_cards(paragraphs)
+    assert [(c.front, c.back, c.note_type) for c in cards] == [
+        ("What is GFR?", "X is a thing\nThe heart has four chambers\nx == 1 and y == 2", None),
+    ]
+
+
+def test_tag_matches():
+    assert tag_matches("Pharmacology", "Pharmacology")
+    assert tag_matches("Pharmacology::Antibiotics", "Pharmacology")
+    assert tag_matches("Pharmacology::Antibiotics", "Pharmacology::*")
+    assert tag_matches("Pharmacology::Antibiotics", "*::Anti*")
+    assert not tag_matches("Pharmacology-Basics", "Pharmacology")
+    assert not tag_matches("Cardiology", "Pharmacology::*")
+
+
+def test_filter_by_tags():
+    cards = [
+        ExtractedCard(front="A?", back="a", tags=["Cardiology"]),
+        ExtractedCard(front="B?", back="b", tags=["Pharmacology::Antibiotics"]),
+        ExtractedCard(front="C?", back="c", tags=[]),
+    ]
+    assert [c.front for c in filter_by_tags(cards, ["Pharmacology::*"])] == ["B?"]
+    assert filter_by_tags(cards, []) == cards
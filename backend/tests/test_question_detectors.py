@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from models import Paragraph
+from qa_parser import extract_cards
+from question_detectors import (
+    InvalidDetectorError,
+    body_font_size,
+    bold_prefix_length,
+    compile_detector,
+)
+
+
+def _cards(paragraphs, names, question_prefixes=()):
+    detector = compile_detector(names, paragraphs, question_prefixes)
+    return [(c.front, c.back) for c in extract_cards(paragraphs, detector)]
+
+
+def test_default_detection_compiles_to_none():
+    assert compile_detector([]) is None
+    assert compile_detector(["bold"]) is None
+
+
+def test_unknown_detector_and_bad_prefix_rejected():
+    with pytest.raises(InvalidDetectorError):
+        compile_detector(["italic"])
+    with pytest.raises(InvalidDetectorError):
+        compile_detector(["prefix"], question_prefixes=["  "])
+    with pytest.raises(InvalidDetectorError):
+        compile_detector(["prefix"], question_prefixes=["Q" * 41])
+
+
+def test_bold_prefix_length():
+    assert bold_prefix_length([("Furosemide:", True), (" loop diuretic", False)], "Furosemide: loop diuretic") == 11
+    assert bold_prefix_length([("All", True), (" bold", True)], "All bold") == 0
+    assert bold_prefix_length([("plain ", False), ("bold", True)], "plain bold") == 0
+
+
+def test_bold_prefix_splits_question_and_inline_answer():
+    paragraphs = [
+        Paragraph(text="Furosemide: loop diuretic", bold_prefix=11),
+        Paragraph(text="-  causes hypokalaemia"),
+        Paragraph(text="Spironolactone – K-sparing", bold_prefix=14),
+    ]
+    assert _cards(paragraphs, ["bold-prefix"]) == [
+        ("Furosemide", "loop diuretic\n-  causes hypokalaemia"),
+        ("Spironolactone", "K-sparing"),
+    ]
+    # Without the detector the lines are answers to no question.
+    assert _cards(paragraphs, []) == []
+
+
+def test_bold_and_bold_prefix_combined():
+    paragraphs = [
+        Paragraph(text="What is GFR?", is_bold=True),
+        Paragraph(text="Filtration rate"),
+        Paragraph(text="Creatinine: marker of GFR", bold_prefix=11),
+    ]
+    assert _cards(paragraphs, ["bold", "bold-prefix"]) == [
+        ("What is GFR?", "Filtration rate"),
+        ("Creatinine", "marker of GFR"),
+    ]
+
+
+def test_prefix_detector_strips_question_and_answer_prefixes():
+    paragraphs = [
+        Paragraph(text="Q: What is GFR?"),
+        Paragraph(text="A: Filtration rate"),
+        Paragraph(text="question: Normal GFR?"),
+        Paragraph(text="Answer: ~120 ml/min"),
+        Paragraph(text="3. Which drug is a loop diuretic?"),
+        Paragraph(text="Furosemide"),
+        Paragraph(text="4. Not a question line"),
+    ]
+    assert _cards(paragraphs, ["prefix"]) == [
+        ("What is GFR?", "Filtration rate"),
+        ("Normal GFR?", "~120 ml/min"),
+        ("Which drug is a loop diuretic?", "Furosemide\n4. Not a question line"),
+    ]
+
+
+def test_prefix_markers_need_a_space_and_matching_case():
+    paragraphs = [
+        Paragraph(text="Q: Which options apply?"),
+        Paragraph(text="a) first option"),
+        Paragraph(text="A.D. 1066"),
+        Paragraph(text="q: not a question"),
+        Paragraph(text="ANSWER: both"),
+    ]
+    assert _cards(paragraphs, ["prefix"]) == [
+        ("Which options apply?", "a) first option\nA.D. 1066\nq: not a question\nboth"),
+    ]
+
+
+def test_prefix_detector_custom_prefixes():
+    paragraphs = [Paragraph(text="Ask >> Define GFR"), Paragraph(text="Filtration rate")]
+    assert _cards(paragraphs, ["prefix"], [">>", "Ask >>"]) == [("Define GFR", "Filtration rate")]
+
+
+def test_font_size_detector():
+    paragraphs = [
+        Paragraph(text="Renal", is_heading=True, heading_level=1, font_size=20.0),
+        Paragraph(text="What is GFR?", font_size=14.0),
+        Paragraph(text="Filtration rate across the glomerulus", font_size=11.0),
+        Paragraph(text="Usually estimated from creatinine", font_size=11.0),
+    ]
+    assert body_font_size(paragraphs) == 11.0
+    assert _cards(paragraphs, ["font-size"]) == [
+        ("What is GFR?", "Filtration rate across the glomerulus\nUsually estimated from creatinine"),
+    ]
+
+
+def test_font_size_detector_without_sizes_finds_nothing():
+    paragraphs = [Paragraph(text="What is GFR?"), Paragraph(text="Filtration rate")]
+    assert body_font_size(paragraphs) is None
+    assert _cards(paragraphs, ["font-size"]) == []
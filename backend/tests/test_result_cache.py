@@ -0,0 +1,103 @@
+import sys
+import os
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import fitz
+import pytest
+
+import result_cache
+from models import ExtractedCard
+from result_cache import build_deck_cached, parse_pdf_cached
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.sqlite3")
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_PATH", path)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", True)
+    return path
+
+
+def _pdf():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "What is X?", fontname="hebo", fontsize=12)
+    page.insert_text((72, 90), "X is a thing", fontname="helv", fontsize=12)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_get_and_put():
+    assert result_cache.get("k") is None
+    result_cache.put("k", b"value")
+    assert result_cache.get("k") == b"value"
+
+
+def test_least_recently_used_evicted(monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_MAX_BYTES", 2500)
+    for i in range(3):
+        result_cache.put(f"k{i}", os.urandom(1000))
+    assert result_cache.get("k0") is None
+    assert result_cache.get("k2") is not None
+
+
+def test_parse_pdf_cached_parses_once(monkeypatch):
+    calls = []
+    original = result_cache.parse_pdf_with_failures
+    monkeypatch.setattr(result_cache, "parse_pdf_with_failures", lambda *args: calls.append(args) or original(*args))
+    pdf_bytes = _pdf()
+
+    first = parse_pdf_cached(pdf_bytes)
+    assert parse_pdf_cached(memoryview(pdf_bytes)) == first
+    assert len(calls) == 1
+    parse_pdf_cached(pdf_bytes, "1")
+    assert len(calls) == 2
+    assert [p.text for p in first] == ["What is X?", "X is a thing"]
+
+
+def test_parse_with_failed_ocr_not_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        result_cache, "parse_pdf_with_failures", lambda *args: calls.append(args) or ([], [0])
+    )
+    pdf_bytes = _pdf()
+    parse_pdf_cached(pdf_bytes)
+    parse_pdf_cached(pdf_bytes)
+    assert len(calls) == 2
+
+
+def test_build_deck_cached_keys_on_content(monkeypatch):
+    calls = []
+    monkeypatch.setattr(result_cache, "build_deck", lambda *args: calls.append(args) or b"apkg")
+    cards = [ExtractedCard(front="Q", back="A")]
+    assert build_deck_cached(cards, "Deck") == b"apkg"
+    build_deck_cached([ExtractedCard(front="Q", back="A")], "Deck")
+    assert len(calls) == 1
+    build_deck_cached(cards, "Other deck")
+    build_deck_cached(cards, "Deck", {"guid": "checksum"})
+    assert len(calls) == 3
+
+
+def test_disabled_cache_always_misses(monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", False)
+    result_cache.put("k", b"value")
+    assert result_cache.get("k") is None
+
+
+def test_entries_shared_across_processes(cache_path):
+    pdf_bytes = _pdf()
+    paragraphs = parse_pdf_cached(pdf_bytes)
+    key = result_cache._key(
+        "pdf", result_cache._PARSE_VERSION, pdf_bytes, "", "[]", str(result_cache.ocr.ocr_enabled())
+    )
+    script = "import sys, result_cache; sys.exit(0 if result_cache.get(sys.argv[1]) is not None else 3)"
+    other_worker = subprocess.run(
+        [sys.executable, "-c", script, key],
+        cwd=BACKEND_DIR, env=dict(os.environ, RESULT_CACHE_PATH=cache_path), capture_output=True,
+    )
+    assert paragraphs
+    assert other_worker.returncode == 0
@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server import available_cpus, worker_counts
+
+
+def test_worker_counts_split_cpus_between_workers():
+    assert worker_counts(4) == (4, 1)
+    assert worker_counts(8, web_workers=2) == (2, 4)
+    assert worker_counts(2, web_workers=4) == (4, 1)
+    assert worker_counts(8, web_workers=2, pool_workers=1) == (2, 1)
+
+
+def test_available_cpus_is_positive():
+    assert 1 <= available_cpus() <= (os.cpu_count() or 1)
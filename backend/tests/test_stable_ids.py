@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import genanki
+
+from models import ExtractedCard
+from stable_ids import NoteIndex, assign_guids, note_checksum, stable_id
+
+
+def test_stable_id_is_full_width_and_positive():
+    ids = [stable_id(f"Deck {i}") for i in range(200)]
+    assert all(0 < i < 2 ** 63 for i in ids)
+    assert max(ids) > 2 ** 32
+    assert len(set(ids)) == len(ids)
+
+
+def test_unique_questions_keep_legacy_guid():
+    cards = [ExtractedCard(front="Q1?", back="A"), ExtractedCard(front="Q2?", back="B")]
+    assert assign_guids(cards) == [genanki.guid_for("Q1?"), genanki.guid_for("Q2?")]
+
+
+def test_duplicate_questions_disambiguated_by_tag_and_answer():
+    cards = [
+        ExtractedCard(front="Define shock", back="A", tags=["Cardiology"]),
+        ExtractedCard(front="Define shock", back="B", tags=["Renal"]),
+        ExtractedCard(front="Define shock", back="C", tags=["Renal"]),
+    ]
+    guids = assign_guids(cards)
+    assert guids == [
+        genanki.guid_for("Define shock", "Cardiology"),
+        genanki.guid_for("Define shock", "Renal", "B"),
+        genanki.guid_for("Define shock", "Renal", "C"),
+    ]
+
+
+def test_editing_answer_keeps_guid_when_tag_disambiguates():
+    from anki_builder import build_deck
+    from deck_diff import diff_cards, read_manifest
+
+    cards = [
+        ExtractedCard(front="Mechanism?", back="Loop", tags=["Diuretics"]),
+        ExtractedCard(front="Mechanism?", back="COX", tags=["NSAIDs"]),
+    ]
+    manifest = read_manifest(build_deck(cards, "Pharm"))
+    cards[0].back = "Blocks NKCC2"
+    result = diff_cards(cards, "Pharm", manifest)
+    assert (result.new, result.changed, result.removed) == ([], [0], [])
+
+
+def test_duplicate_guids_survive_deleting_and_reordering():
+    cards = [ExtractedCard(front="Q?", back=str(i), tags=["T"]) for i in range(3)]
+    guids = dict(zip((c.back for c in cards), assign_guids(cards)))
+    remaining = [cards[2], cards[1]]
+    assert assign_guids(remaining) == [guids["2"], guids["1"]]
+
+
+def test_identical_duplicates_are_unique_and_deterministic():
+    cards = [ExtractedCard(front="Q?", back="A", tags=["T"]) for _ in range(4)]
+    guids = assign_guids(cards)
+    assert len(set(guids)) == 4
+    assert guids == assign_guids(cards)
+
+
+def test_index_diff():
+    index = NoteIndex()
+    index.add("a", "1")
+    index.add("b", "2")
+    index.add("c", "3")
+    diff = index.diff({"a": "1", "b": "old", "d": "4"})
+    assert diff.unchanged == ["a"]
+    assert diff.changed == ["b"]
+    assert diff.added == ["c"]
+    assert diff.removed == ["d"]
+
+
+def test_index_duplicate_groups():
+    index = NoteIndex()
+    index.add("a", "1", question="Q?")
+    index.add("b", "2", question="Q?")
+    index.add("c", "3", question="Other?")
+    assert index.duplicate_groups() == [["a", "b"]]
+
+
+def test_note_checksum_covers_fields_and_tags():
+    base = note_checksum(["Q", "A"], ["T"])
+    assert base == note_checksum(["Q", "A"], ["T"])
+    assert base != note_checksum(["Q", "A2"], ["T"])
+    assert base != note_checksum(["Q", "A"], ["T2"])
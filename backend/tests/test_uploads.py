@@ -0,0 +1,70 @@
+import sys
+import os
+import asyncio
+import io
+import mmap
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+from fastapi import UploadFile
+
+import uploads
+from uploads import UploadTooLargeError, spool_upload
+
+
+def _spool(data: bytes, limit: int, size_known: bool = True):
+    file = UploadFile(io.BytesIO(data), size=len(data) if size_known else None)
+    return asyncio.run(spool_upload(file, limit))
+
+
+def test_small_upload_kept_in_memory():
+    with _spool(b"hello", limit=100) as upload:
+        assert upload.size == 5
+        assert upload.view.tobytes() == b"hello"
+        assert not isinstance(upload._data, mmap.mmap)
+
+
+def test_large_upload_memory_mapped(monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_THRESHOLD", 10)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+    with _spool(b"x" * 50, limit=100, size_known=False) as upload:
+        assert isinstance(upload._data, mmap.mmap)
+        assert upload.view.tobytes() == b"x" * 50
+
+
+def test_declared_size_rejected_before_reading():
+    with pytest.raises(UploadTooLargeError):
+        _spool(b"x" * 50, limit=10)
+
+
+def test_streamed_size_rejected_while_reading(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+    with pytest.raises(UploadTooLargeError):
+        _spool(b"x" * 50, limit=10, size_known=False)
+
+
+def test_chunked_body_over_limit_gets_413():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile):
+        return {"size": len(await file.read())}
+
+    client = TestClient(uploads.BodySizeLimitMiddleware(app, limits={"/upload": 1000}))
+
+    def chunked(size):
+        # A generator body is sent chunked, without a Content-Length.
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n'
+        for _ in range(size // 100):
+            yield b"x" * 100
+        yield b"\r\n--b--\r\n"
+
+    headers = {"content-type": "multipart/form-data; boundary=b"}
+    response = client.post("/upload", content=chunked(5000), headers=headers)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+    assert client.post("/upload", content=chunked(500), headers=headers).json() == {"size": 500}
@@ -0,0 +1,66 @@
+import sys
+import os
+import gzip
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from models import Paragraph
+from payload_guard import PayloadLimits, PayloadTooLargeError
+from qa_parser import extract_cards
+from wire_format import InvalidWireFormatError, decode_paragraphs, encode_paragraphs
+
+LIMITS = PayloadLimits(items_key="paragraphs")
+
+PARAGRAPHS = [
+    Paragraph(text="Cardiology", is_heading=True, text_color="#ff6600"),
+    Paragraph(text="Valves", is_heading=True, heading_level=2),
+    Paragraph(text="What is this?", is_bold=True, images=["aW1hZ2U="]),
+    Paragraph(text="A valve", images=["aW1hZ2U=", "b3RoZXI="]),
+    Paragraph(text="A | B", is_table=True, table_html="<table><tr><th>A</th><th>B</th></tr></table>"),
+    Paragraph(text="A valve"),
+]
+
+
+def _gzip(doc) -> bytes:
+    return gzip.compress(json.dumps(doc).encode("utf-8"))
+
+
+def test_round_trip_matches_paragraphs():
+    decoded = decode_paragraphs(encode_paragraphs(PARAGRAPHS), LIMITS)
+    assert [Paragraph(**{name: getattr(p, name) for name in p.__slots__}) for p in decoded] == PARAGRAPHS
+    assert extract_cards(decoded) == extract_cards(PARAGRAPHS)
+
+
+def test_strings_and_images_are_deduplicated():
+    doc = json.loads(gzip.decompress(encode_paragraphs(PARAGRAPHS)))
+    assert doc["strings"].count("A valve") == 1
+    assert doc["blobs"] == ["aW1hZ2U=", "b3RoZXI="]
+    assert doc["image_refs"] == [0, 0, 1]
+    decoded = decode_paragraphs(encode_paragraphs(PARAGRAPHS), LIMITS)
+    assert decoded[2].images[0] is decoded[3].images[0]
+
+
+def test_invalid_payloads_rejected():
+    for body in [b"not gzip", gzip.compress(b"not json"), gzip.compress(b"[1]"), gzip.compress(b"[1]")[:-4]]:
+        with pytest.raises(InvalidWireFormatError):
+            decode_paragraphs(body, LIMITS)
+    base = {"v": 1, "strings": ["a"], "blobs": [], "text": [0], "flags": [0], "color": [-1], "table": [-1],
+            "image_counts": [0], "image_refs": []}
+    decode_paragraphs(_gzip(base), LIMITS)
+    for change in [{"v": 2}, {"text": [1]}, {"flags": [0, 0]}, {"color": ["a"]}, {"image_counts": [1]},
+                   {"image_refs": [0]}, {"strings": [1]}]:
+        with pytest.raises(InvalidWireFormatError):
+            decode_paragraphs(_gzip(dict(base, **change)), LIMITS)
+
+
+def test_limits_enforced():
+    with pytest.raises(PayloadTooLargeError, match="Too many paragraphs"):
+        decode_paragraphs(encode_paragraphs(PARAGRAPHS), PayloadLimits(items_key="paragraphs", max_items=5))
+    with pytest.raises(PayloadTooLargeError, match="Too much image data"):
+        decode_paragraphs(encode_paragraphs(PARAGRAPHS), PayloadLimits(items_key="paragraphs", max_total_image_bytes=20))
+    # A gzip bomb is refused once the decompressed size passes the cap.
+    bomb = gzip.compress(b" " * 1_000_000)
+    with pytest.raises(PayloadTooLargeError, match="Request body too large"):
+        decode_paragraphs(bomb, PayloadLimits(items_key="paragraphs", max_body_bytes=10_000))
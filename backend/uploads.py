@@ -0,0 +1,187 @@
+"""Size-limited upload handling.
+
+``BodySizeLimitMiddleware`` rejects oversized request bodies before they are
+parsed: from Content-Length when the client sends one, otherwise as soon as
+the streamed body passes the limit. ``spool_upload`` then hands an uploaded
+file to a parser without another in-memory copy: small files are read in
+chunks, large ones are memory-mapped from the temp file they were spooled to.
+``save_upload`` and ``map_file`` do the same through a named file, for work
+handed to another process.
+"""
+
+import io
+import json
+import mmap
+import os
+import tempfile
+
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SPOOL_THRESHOLD = 1024 * 1024
+# Allowance for multipart boundaries and form fields on top of the file limit.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload is bigger than the allowed limit."""
+
+
+class SpooledUpload:
+    """An upload's bytes, either in memory or memory-mapped; ``view`` avoids copying either."""
+
+    def __init__(self, data: bytes | mmap.mmap) -> None:
+        self._data = data
+        self.view = memoryview(data)
+        self.size = len(self.view)
+
+    def close(self) -> None:
+        self.view.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _fileno(f) -> int | None:
+    try:
+        return f.fileno()
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return None
+
+
+async def spool_upload(file: UploadFile, limit: int) -> SpooledUpload:
+    """Read an upload, failing as soon as it is known to exceed ``limit`` bytes."""
+    if file.size is not None and file.size > limit:
+        raise UploadTooLargeError(f"Upload exceeds {limit // (1024 * 1024)} MB limit")
+    await file.seek(0)
+
+    # The multipart parser already spooled large files to disk: map that file directly.
+    fd = _fileno(file.file) if (file.size or 0) >= SPOOL_THRESHOLD else None
+    if fd is not None:
+        return SpooledUpload(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+
+    buffer = bytearray()
+    spool = None
+    size = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLargeError(f"Upload exceeds {limit // (1024 * 1024)} MB limit")
+            if spool is None and size > SPOOL_THRESHOLD:
+                spool = tempfile.TemporaryFile()
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buffer += chunk
+
+        if spool is None:
+            return SpooledUpload(bytes(buffer))
+        spool.flush()
+        return SpooledUpload(mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ))
+    finally:
+        if spool is not None:
+            spool.close()
+
+
+async def save_upload(file: UploadFile, limit: int, directory: str) -> tuple[str, int]:
+    """Copy an upload to a new file in ``directory`` chunk by chunk; returns ``(path, size)``.
+
+    Fails as soon as the upload is known to exceed ``limit`` bytes, leaving
+    the partial file for the caller to remove with ``directory``.
+    """
+    if file.size is not None and file.size > limit:
+        raise UploadTooLargeError(f"Upload exceeds {limit // (1024 * 1024)} MB limit")
+    await file.seek(0)
+
+    fd, path = tempfile.mkstemp(dir=directory)
+    size = 0
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLargeError(f"Upload exceeds {limit // (1024 * 1024)} MB limit")
+            out.write(chunk)
+    return path, size
+
+
+def map_file(path: str) -> SpooledUpload:
+    """Memory-map a saved upload read-only."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return SpooledUpload(b"")
+        return SpooledUpload(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware enforcing a maximum request body size per path.
+
+    A body without a Content-Length (chunked) is counted as it arrives. Once
+    it passes the limit the app sees the client disconnect, anything it
+    tries to send is dropped, and the middleware answers 413 itself.
+    """
+
+    def __init__(self, app, limits: dict[str, int]) -> None:
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers", [])).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await reject_oversized(send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if too_large and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not response_started:
+            await reject_oversized(send)
+
+
+async def reject_oversized(send, detail: str = "Request body too large") -> None:
+    """Send a 413 JSON response straight from ASGI middleware."""
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,181 @@
+"""Compact, gzipped columnar encoding of paragraphs, used by the Docs add-on.
+
+The JSON body of /api/extract repeats every field name, boolean and null
+per paragraph and inlines each image as often as it appears. This format
+sends one gzipped JSON object of parallel columns instead:
+
+    {"v": 1,
+     "strings": [...],         # string table: paragraph texts, colours, table HTML
+     "text":    [int, ...],    # per paragraph: index into "strings"
+     "flags":   [int, ...],    # per paragraph: BOLD | HEADING | TABLE bits
+     "color":   [int, ...],    # per paragraph: index into "strings", or -1
+     "table":   [int, ...],    # per paragraph: index of the table HTML, or -1
+     "level":   [int, ...],    # optional, per paragraph: heading level, 0 for none
+     "image_counts": [int, ...],  # per paragraph: number of images
+     "image_refs":   [int, ...],  # all paragraphs' images in order, as indices into "blobs"
+     "blobs":   [str, ...]}    # distinct images, base64
+
+It is decoded straight into lightweight paragraph objects for
+``extract_cards``, without building a pydantic model per paragraph, and
+every distinct image is a single string however often it is referenced.
+Decoding enforces the same ``PayloadLimits`` as the JSON endpoint,
+including a cap on the decompressed size.
+"""
+
+import gzip
+import json
+import zlib
+from typing import Optional
+
+from payload_guard import PayloadLimits, PayloadTooLargeError
+
+WIRE_VERSION = 1
+
+BOLD = 1
+HEADING = 2
+TABLE = 4
+
+
+class InvalidWireFormatError(ValueError):
+    """Raised when a compact payload is not valid gzip or not a well-formed version 1 document."""
+
+
+class WireParagraph:
+    """A decoded paragraph, with the attributes ``extract_cards`` reads from ``models.Paragraph``."""
+
+    __slots__ = ("text", "is_bold", "is_heading", "text_color", "heading_level", "is_table", "table_html", "images")
+
+    def __init__(
+        self,
+        text: str,
+        is_bold: bool,
+        is_heading: bool,
+        text_color: Optional[str],
+        heading_level: Optional[int],
+        is_table: bool,
+        table_html: Optional[str],
+        images: list[str],
+    ) -> None:
+        self.text = text
+        self.is_bold = is_bold
+        self.is_heading = is_heading
+        self.text_color = text_color
+        self.heading_level = heading_level
+        self.is_table = is_table
+        self.table_html = table_html
+        self.images = images
+
+
+def _decompress(body: bytes, max_bytes: int) -> bytes:
+    """Gunzip ``body``, refusing output larger than ``max_bytes`` without inflating all of it."""
+    inflater = zlib.decompressobj(wbits=31)
+    try:
+        data = inflater.decompress(body, max_bytes + 1)
+    except zlib.error as e:
+        raise InvalidWireFormatError(f"Body is not valid gzip: {e}") from None
+    if len(data) > max_bytes or inflater.unconsumed_tail:
+        raise PayloadTooLargeError("Request body too large")
+    if not inflater.eof:
+        raise InvalidWireFormatError("Body is not valid gzip: truncated")
+    return data
+
+
+def _int_column(doc: dict, name: str, n: Optional[int], lo: int, hi: int) -> list[int]:
+    column = doc.get(name)
+    if not isinstance(column, list) or (n is not None and len(column) != n):
+        raise InvalidWireFormatError(f"Column {name!r} must be a list with one entry per paragraph")
+    for value in column:
+        if type(value) is not int or not lo <= value < hi:
+            raise InvalidWireFormatError(f"Column {name!r} has an out-of-range value")
+    return column
+
+
+def _str_column(doc: dict, name: str) -> list[str]:
+    column = doc.get(name)
+    if not isinstance(column, list) or not all(type(s) is str for s in column):
+        raise InvalidWireFormatError(f"{name!r} must be a list of strings")
+    return column
+
+
+def decode_paragraphs(body: bytes, limits: PayloadLimits) -> list[WireParagraph]:
+    """Decode a gzipped compact payload into paragraphs, enforcing ``limits``."""
+    data = _decompress(body, limits.max_body_bytes)
+    try:
+        doc = json.loads(data)
+    except ValueError:
+        raise InvalidWireFormatError("Body is not valid JSON") from None
+    if not isinstance(doc, dict) or doc.get("v") != WIRE_VERSION:
+        raise InvalidWireFormatError(f"Expected a version {WIRE_VERSION} compact payload")
+
+    strings = _str_column(doc, "strings")
+    blobs = _str_column(doc, "blobs")
+    if sum(len(s) for s in strings) > limits.max_text_bytes:
+        raise PayloadTooLargeError("Too much text")
+    if any(len(b) > limits.max_image_bytes for b in blobs):
+        raise PayloadTooLargeError("Image too large")
+
+    texts = doc.get("text")
+    if not isinstance(texts, list):
+        raise InvalidWireFormatError("Column 'text' must be a list with one entry per paragraph")
+    n = len(texts)
+    if n > limits.max_items:
+        raise PayloadTooLargeError(f"Too many {limits.items_key}")
+    texts = _int_column(doc, "text", n, 0, len(strings))
+    flags = _int_column(doc, "flags", n, 0, (BOLD | HEADING | TABLE) + 1)
+    colors = _int_column(doc, "color", n, -1, len(strings))
+    tables = _int_column(doc, "table", n, -1, len(strings))
+    levels = _int_column(doc, "level", n, 0, 7) if "level" in doc else None
+    image_counts = _int_column(doc, "image_counts", n, 0, limits.max_total_image_bytes + 1)
+    image_refs = _int_column(doc, "image_refs", None, 0, len(blobs))
+    if sum(image_counts) != len(image_refs):
+        raise InvalidWireFormatError("'image_counts' does not add up to the number of 'image_refs'")
+    if sum(len(blobs[i]) for i in image_refs) > limits.max_total_image_bytes:
+        raise PayloadTooLargeError("Too much image data")
+
+    paragraphs = []
+    ref = 0
+    for i in range(n):
+        flag = flags[i]
+        count = image_counts[i]
+        paragraphs.append(WireParagraph(
+            text=strings[texts[i]],
+            is_bold=bool(flag & BOLD),
+            is_heading=bool(flag & HEADING),
+            text_color=strings[colors[i]] if colors[i] >= 0 else None,
+            heading_level=(levels[i] or None) if levels is not None else None,
+            is_table=bool(flag & TABLE),
+            table_html=strings[tables[i]] if tables[i] >= 0 else None,
+            images=[blobs[j] for j in image_refs[ref:ref + count]],
+        ))
+        ref += count
+    return paragraphs
+
+
+def encode_paragraphs(paragraphs: list) -> bytes:
+    """Encode paragraphs (anything with ``models.Paragraph``'s attributes) as a gzipped compact payload.
+
+    This is what addon/Code.gs does; it is used by tests and benchmarks.
+    """
+    strings: dict[str, int] = {}
+    blobs: dict[str, int] = {}
+
+    def intern(table: dict[str, int], value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        return table.setdefault(value, len(table))
+
+    doc = {"v": WIRE_VERSION, "text": [], "flags": [], "color": [], "table": [], "level": [],
+           "image_counts": [], "image_refs": []}
+    for p in paragraphs:
+        doc["text"].append(intern(strings, p.text))
+        doc["flags"].append((BOLD if p.is_bold else 0) | (HEADING if p.is_heading else 0) | (TABLE if p.is_table else 0))
+        doc["color"].append(intern(strings, p.text_color))
+        doc["table"].append(intern(strings, p.table_html))
+        doc["level"].append(p.heading_level or 0)
+        doc["image_counts"].append(len(p.images))
+        doc["image_refs"] += [intern(blobs, img) for img in p.images]
+    if not any(doc["level"]):
+        del doc["level"]
+    doc["strings"] = list(strings)
+    doc["blobs"] = list(blobs)
+    return gzip.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
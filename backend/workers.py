@@ -0,0 +1,41 @@
+"""Process pool for CPU-bound parsing work, shared by the upload endpoints."""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from models import ExtractedCard
+from qa_parser import extract_cards
+from result_cache import parse_pdf_cached
+from uploads import map_file
+
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+async def run_in_worker(fn, *args):
+    """Run a picklable function in the worker pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), functools.partial(fn, *args))
+
+
+def pdf_file_to_cards(path: str) -> list[ExtractedCard]:
+    """Worker task: parse the PDF saved at ``path`` (memory-mapped, not read) and extract its cards."""
+    with map_file(path) as upload:
+        return extract_cards(parse_pdf_cached(upload.view))
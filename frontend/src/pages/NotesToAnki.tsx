@@ -8,6 +8,7 @@ interface Card {
   back: string
   tags: string[]
   images: string[]
+  note_type?: 'basic' | 'reversed' | 'cloze' | null
 }
 
 type AppState = 'idle' | 'uploading' | 'preview' | 'generating'
@@ -20,6 +21,7 @@ export default function NotesToAnki() {
   const [dragOver, setDragOver] = useState(false)
   const [editingIdx, setEditingIdx] = useState<number | null>(null)
   const [metrics, setMetrics] = useState({ original: 0, edited: 0, deleted: 0 })
+  const [resultId, setResultId] = useState<string | null>(null)
   const [downloadSuccess, setDownloadSuccess] = useState(false)
   const fileInputRef = useRef<HTMLInputElement>(null)
 
@@ -50,6 +52,7 @@ export default function NotesToAnki() {
       }
       const data = await res.json()
       setCards(data.cards)
+      setResultId(data.result_id ?? null)
       setMetrics({ original: data.cards.length, edited: 0, deleted: 0 })
       setState('preview')
     } catch (err) {
@@ -94,6 +97,8 @@ export default function NotesToAnki() {
           cards_original: metrics.original,
           cards_edited: metrics.edited,
           cards_deleted: metrics.deleted,
+          incremental: true,
+          result_id: resultId,
         }),
       })
       if (!res.ok) throw new Error(`Generation failed (${res.status})`)
@@ -112,10 +117,11 @@ export default function NotesToAnki() {
       setError(err instanceof Error ? err.message : 'Download failed')
       setState('preview')
     }
-  }, [cards, deckName, metrics])
+  }, [cards, deckName, metrics, resultId])
 
   const reset = useCallback(() => {
     setCards([])
+    setResultId(null)
     setState('idle')
     setError(null)
     setEditingIdx(null)